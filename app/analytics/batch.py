@@ -0,0 +1,243 @@
+# analytics/batch.py
+"""
+Analyse utilisateurs en mode batch (sans Streamlit).
+
+À partir d'un export de logs (ou de la base historique analytics.store) :
+- clustering global (applications) : coude + K-Means au K détecté
+- clustering intra-application pour chaque application, en parallèle (joblib)
+- indicateurs d'engagement (jours actifs, DAU/WAU/MAU, niveaux mensuels)
+
+Résultats écrits dans ANALYTICS_BATCH_DIR/<sha256 de l'export ou empreinte de la base>/ :
+    manifest.json
+    global/                 elbow.joblib, labels.parquet, centers.csv, heatmap.html
+    apps/<application>/     (idem)
+    engagement/             active_days.parquet, rolling.parquet, tier_counts.parquet, period_days.parquet
+
+La page d'analyse charge ces résultats (load_batch) quand ils existent pour les données affichées :
+les modèles du coude sont réutilisés, rien n'est recalculé.
+
+Usage :
+    python -m analytics.batch export.csv [--output /data/analytics_batch] [--workers 4]
+    python -m analytics.batch --store
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import pandas as pd
+
+from analytics.user_behavior import (
+    aggregate_by_application, auto_k_elbow, cluster_all_applications, cluster_centers_mean, cluster_with_k,
+    compute_ratios, elbow_figure, intra_matrix, load_logs_cached,
+)
+
+ANALYTICS_BATCH_DIR = Path(os.getenv("ANALYTICS_BATCH_DIR", "/data/analytics_batch"))
+# Seuils de la page pour l'analyse intra-application
+INTRA_MIN_USERS = 20
+INTRA_MIN_MODULES = 2
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", str(name)).strip("_") or "app"
+
+
+def _centers_heatmap_html(centers: pd.DataFrame, x_label: str, title: str) -> str:
+    import plotly.express as px
+
+    fig = px.imshow(
+        centers,
+        aspect="auto",
+        labels=dict(x=x_label, y="Cluster", color="Proportion d’activité"),
+        color_continuous_scale="Blues",
+        text_auto=".2f",
+        zmin=0, zmax=1,
+    )
+    fig.update_layout(height=300 + 30 * len(centers.index), margin=dict(l=40, r=40, t=40, b=40), title_text=title)
+    return fig.to_html(full_html=False, include_plotlyjs="cdn")
+
+
+def write_scope(out_dir: Path, k_auto: int, viz, df_labeled: pd.DataFrame, centers: pd.DataFrame,
+                x_label: str, title: str) -> None:
+    """Écrit les résultats d'un scope (coude, labels, centres, heatmap) dans out_dir."""
+    import joblib
+    import matplotlib.pyplot as plt
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    plt.close(viz.fig)  # figure reconstruite au chargement (elbow_figure)
+    joblib.dump(
+        {"k_auto": k_auto, "Ks": viz.Ks, "inertias": viz.inertias, "models": viz.models, "sampled": viz.sampled},
+        out_dir / "elbow.joblib",
+    )
+    pd.DataFrame({"User ID": df_labeled.index.astype(str), "cluster": df_labeled["cluster"].to_numpy()}).to_parquet(
+        out_dir / "labels.parquet", index=False
+    )
+    centers = centers.copy()
+    centers.index.name = "Cluster"
+    centers.to_csv(out_dir / "centers.csv")
+    (out_dir / "heatmap.html").write_text(_centers_heatmap_html(centers, x_label, title), encoding="utf-8")
+
+
+def run_scope(X: pd.DataFrame, out_dir: Path, x_label: str, title: str, k_max: int = 10, n_jobs: int = 1) -> Dict:
+    """Coude + clustering au K auto pour une matrice de ratios ; écrit les résultats dans out_dir."""
+    t0 = time.perf_counter()
+    k_max = min(k_max, max(2, X.shape[0] - 1))
+    k_auto, viz = auto_k_elbow(X, k_min=1, k_max=k_max, n_jobs=n_jobs)
+    df_labeled, _ = cluster_with_k(X, k_auto, models=viz.models)
+    write_scope(out_dir, k_auto, viz, df_labeled, cluster_centers_mean(df_labeled), x_label, title)
+    return {"k_auto": int(k_auto), "n_users": int(X.shape[0]), "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def run_batch(
+    df: pd.DataFrame,
+    fingerprint: str,
+    output: Path = ANALYTICS_BATCH_DIR,
+    workers: int = -1,
+    k_max: int = 10,
+    df_days: Optional[pd.DataFrame] = None,
+    source: str = "",
+) -> Path:
+    """Analyse complète ; retourne le dossier de résultats (manifest.json écrit en dernier)."""
+    from analytics.engagement import compute_engagement
+
+    t0 = time.perf_counter()
+    out = Path(output) / fingerprint
+    out.mkdir(parents=True, exist_ok=True)
+
+    df_profiles = compute_ratios(df)
+    ratios_app = aggregate_by_application(df_profiles)
+    print(f"📊 {ratios_app.shape[0]} utilisateurs, {ratios_app.shape[1]} applications")
+
+    # global : balayage K parallèle à l'intérieur du scope
+    global_info = run_scope(ratios_app, out / "global", "Application", "Profils moyens par cluster (Applications)",
+                            k_max=k_max, n_jobs=workers)
+    print(f"✅ Global : K={global_info['k_auto']} ({global_info['seconds']} s)")
+
+    # intra-application : toutes les applications en une passe parallèle (même calcul que la page)
+    t_apps = time.perf_counter()
+    intra = cluster_all_applications(df_profiles, k_max=k_max, n_jobs=workers,
+                                     min_users=INTRA_MIN_USERS, min_modules=INTRA_MIN_MODULES)
+    skipped = sorted({app for app, _ in df_profiles.columns} - set(intra))
+    apps_info = {}
+    for app, res in intra.items():
+        write_scope(out / "apps" / _slug(app), res.k_auto, res.viz, res.df_labeled, res.centers,
+                    "Module", f"Profils moyens par module — {app}")
+        apps_info[app] = {"k_auto": int(res.k_auto), "n_users": int(res.matrix.shape[0]), "dir": f"apps/{_slug(app)}"}
+        print(f"✅ {app} : K={res.k_auto} ({res.matrix.shape[0]} users)")
+    print(f"✅ {len(intra)} applications en {time.perf_counter() - t_apps:.1f} s ({len(skipped)} ignorées)")
+
+    # engagement
+    eng_dir = out / "engagement"
+    eng_dir.mkdir(exist_ok=True)
+    eng = compute_engagement(df if df_days is None else df_days)
+    eng.active_days.to_frame().to_parquet(eng_dir / "active_days.parquet")
+    eng.rolling.to_parquet(eng_dir / "rolling.parquet")
+    eng.tier_counts.to_parquet(eng_dir / "tier_counts.parquet")
+    eng.period_days.to_parquet(eng_dir / "period_days.parquet")
+
+    manifest = {
+        "fingerprint": fingerprint,
+        "source": source,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "n_users": int(ratios_app.shape[0]),
+        "global": {**global_info, "dir": "global"},
+        "apps": apps_info,
+        "skipped_apps": skipped,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"📁 Résultats : {out} ({manifest['seconds']} s)")
+    return out
+
+
+class BatchResults:
+    """Résultats batch d'un jeu de données, au format attendu par la page d'analyse."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.manifest = json.loads((self.root / "manifest.json").read_text(encoding="utf-8"))
+
+    def _scope_dir(self, app: str) -> Optional[Path]:
+        if not app:
+            return self.root / self.manifest["global"]["dir"]
+        info = self.manifest["apps"].get(app)
+        return self.root / info["dir"] if info else None
+
+    def elbow(self, app: str = ""):
+        """(k_auto, viz) comme auto_k_elbow, ou None si l'application n'a pas été traitée."""
+        import joblib
+
+        scope = self._scope_dir(app)
+        if scope is None or not (scope / "elbow.joblib").exists():
+            return None
+        e = joblib.load(scope / "elbow.joblib")
+        fig = elbow_figure(e["Ks"], e["inertias"], e["k_auto"])
+        return e["k_auto"], SimpleNamespace(fig=fig, Ks=e["Ks"], inertias=e["inertias"], models=e["models"],
+                                            sampled=e["sampled"])
+
+    def applications(self, df_profiles: pd.DataFrame) -> Dict[str, SimpleNamespace]:
+        """Clustering intra-application au format de cluster_all_applications (modèles du batch, K auto)."""
+        results = {}
+        for app in self.manifest["apps"]:
+            elbow = self.elbow(app)
+            if elbow is None:
+                continue
+            k_auto, viz = elbow
+            X = intra_matrix(df_profiles, app)
+            df_labeled, _ = cluster_with_k(X, k_auto, models=viz.models)
+            results[app] = SimpleNamespace(matrix=X, k_auto=k_auto, viz=viz, df_labeled=df_labeled,
+                                           centers=cluster_centers_mean(df_labeled))
+        return results
+
+    def engagement(self) -> SimpleNamespace:
+        d = self.root / "engagement"
+        return SimpleNamespace(
+            active_days=pd.read_parquet(d / "active_days.parquet")["distinct_active_days"],
+            rolling=pd.read_parquet(d / "rolling.parquet"),
+            period_days=pd.read_parquet(d / "period_days.parquet"),
+            tier_counts=pd.read_parquet(d / "tier_counts.parquet"),
+        )
+
+
+def load_batch(fingerprint: str, root: Path = ANALYTICS_BATCH_DIR) -> Optional[BatchResults]:
+    """Résultats batch pour ces données (sha256 de l'export / empreinte de la base), sinon None."""
+    path = Path(root) / fingerprint
+    if not (path / "manifest.json").exists():
+        return None
+    try:
+        return BatchResults(path)
+    except Exception as e:
+        print(f"⚠️ Résultats batch illisibles ({path}) : {e}")
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyse utilisateurs en batch (clustering + engagement)")
+    parser.add_argument("csv", type=Path, nargs="?", help="Export CSV MasterControl")
+    parser.add_argument("--store", action="store_true", help="Analyser la base historique (analytics.store)")
+    parser.add_argument("--output", type=Path, default=ANALYTICS_BATCH_DIR)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("KMEANS_N_JOBS", "-1")))
+    parser.add_argument("--k-max", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.store:
+        from analytics.store import AnalyticsStore
+
+        store = AnalyticsStore()
+        run_batch(store.counts(), store.fingerprint(), args.output, args.workers, args.k_max,
+                  df_days=store.active_days(), source=str(store.root))
+    elif args.csv:
+        df, sha = load_logs_cached(args.csv)
+        run_batch(df, sha, args.output, args.workers, args.k_max, source=args.csv.name)
+    else:
+        parser.error("indiquer un export CSV ou --store")
+
+
+if __name__ == "__main__":
+    main()
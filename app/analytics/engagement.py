@@ -0,0 +1,188 @@
+# analytics/engagement.py
+"""
+Indicateurs d'engagement vectorisés (pas de boucle Python par ligne ni par utilisateur).
+
+Les logs (User ID, Date) sont codés une fois : utilisateurs → entiers, dates → ordinaux de jour.
+Les couples (utilisateur, jour) distincts sont obtenus par np.unique sur une clé entière, puis :
+- jours actifs distincts par utilisateur (bincount)
+- utilisateurs actifs glissants DAU / WAU / MAU (tableau de différences + cumsum : chaque
+  utilisateur compte une seule fois par fenêtre, même s'il est actif plusieurs jours)
+- niveaux d'engagement par période (jours actifs par utilisateur × mois / semaine)
+
+Entrée : sortie de load_logs_df, ou couples (User ID, Date) de analytics.store.
+"""
+from types import SimpleNamespace
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOWS = {"DAU": 1, "WAU": 7, "MAU": 30}
+TIER_LABELS = ["Inactif", "Occasionnel", "Régulier", "Intensif"]
+# Seuils (jours actifs dans la période) entre niveaux : [1, a) occasionnel, [a, b) régulier, ≥ b intensif
+TIER_THRESHOLDS = {"M": (1, 4, 12), "W": (1, 2, 4)}
+
+
+def encode_activity(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, pd.Index, int]:
+    """
+    Couples (utilisateur, jour) distincts, triés par utilisateur puis jour.
+    Retour : (codes utilisateurs, ordinaux de jour, User IDs, nb d'utilisateurs).
+    """
+    ids = df["User ID"]
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        codes = ids.cat.codes.to_numpy().astype(np.int64)
+        users = pd.Index(ids.cat.categories.astype(str))
+    else:
+        codes, uniques = pd.factorize(ids)
+        codes = codes.astype(np.int64)
+        users = pd.Index(pd.Index(uniques).astype(str))
+    days = df["Date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+    valid = (codes >= 0) & (days != np.iinfo(np.int64).min)  # NaT
+    codes, days = codes[valid], days[valid]
+    if not len(days):
+        return codes, days, users, len(users)
+    d0 = days.min()
+    span = int(days.max() - d0) + 1
+    key = np.unique(codes * span + (days - d0))
+    return key // span, key % span + d0, users, len(users)
+
+
+def distinct_active_days(df: pd.DataFrame) -> pd.Series:
+    """Jours actifs distincts par utilisateur (tri décroissant), utilisateurs sans activité exclus."""
+    u, _, users, n_users = encode_activity(df)
+    counts = np.bincount(u, minlength=n_users)
+    s = pd.Series(counts, index=pd.Index(users, name="User ID"), name="distinct_active_days")
+    return s[s > 0].sort_values(ascending=False, kind="stable")
+
+
+def rolling_active_users(u: np.ndarray, d: np.ndarray, windows: Dict[str, int] = ROLLING_WINDOWS) -> pd.DataFrame:
+    """
+    Utilisateurs distincts actifs sur les w derniers jours, pour chaque jour de la période.
+    Un jour actif d couvre les fins de fenêtre [d, d + w) ; pour un même utilisateur, la couverture
+    commence après celle de son jour actif précédent → +1 / -1 dans un tableau de différences.
+    """
+    if not len(d):
+        return pd.DataFrame(columns=list(windows), index=pd.DatetimeIndex([], name="Date"))
+    d0, d1 = int(d.min()), int(d.max())
+    n_days = d1 - d0 + 1
+    rel = d - d0
+    same_user = np.r_[False, u[1:] == u[:-1]]
+    prev = np.r_[0, rel[:-1]]
+    out = {}
+    for name, w in windows.items():
+        start = np.where(same_user, np.maximum(rel, prev + w), rel)
+        end = rel + w
+        keep = start < end
+        diff = (np.bincount(start[keep], minlength=n_days + w)
+                - np.bincount(end[keep], minlength=n_days + w))
+        out[name] = np.cumsum(diff)[:n_days]
+    index = pd.DatetimeIndex(np.arange(d0, d1 + 1).astype("datetime64[D]"), name="Date")
+    return pd.DataFrame(out, index=index)
+
+
+def engagement_tiers(
+    u: np.ndarray,
+    d: np.ndarray,
+    users: pd.Index,
+    period: str = "M",
+    thresholds: Optional[Sequence[int]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Niveau d'engagement de chaque utilisateur pour chaque période (M = mois, W = semaine ISO).
+    Retour : (jours actifs users × périodes, effectifs par période × niveau).
+    """
+    thresholds = thresholds or TIER_THRESHOLDS[period]
+    n_users = len(users)
+    dates = d.astype("datetime64[D]")
+    if period == "M":
+        p = dates.astype("datetime64[M]").astype(np.int64)
+    else:  # semaines commençant le lundi (1970-01-01 était un jeudi)
+        p = (d + 3) // 7
+    if not len(p):
+        return pd.DataFrame(index=pd.Index(users, name="User ID")), pd.DataFrame(columns=TIER_LABELS)
+    p0 = p.min()
+    n_periods = int(p.max() - p0) + 1
+    days_per = np.bincount(u * n_periods + (p - p0), minlength=n_users * n_periods)
+    days_per = days_per.reshape(n_users, n_periods).astype(np.int32)
+
+    if period == "M":
+        labels = pd.PeriodIndex(np.arange(p0, p0 + n_periods).astype("datetime64[M]"), freq="M")
+    else:
+        labels = pd.PeriodIndex((np.arange(p0, p0 + n_periods) * 7 - 3).astype("datetime64[D]"), freq="W-SUN")
+    active_days = pd.DataFrame(days_per, index=pd.Index(users, name="User ID"), columns=labels.astype(str))
+
+    tier = np.digitize(days_per, thresholds)  # 0 = inactif … 3 = intensif
+    n_tiers = len(TIER_LABELS)
+    flat = (np.arange(n_periods)[None, :] * n_tiers + tier).ravel()
+    tier_counts = np.bincount(flat, minlength=n_periods * n_tiers).reshape(n_periods, n_tiers)
+    counts = pd.DataFrame(tier_counts, index=pd.Index(labels.astype(str), name="Période"), columns=TIER_LABELS)
+    return active_days, counts
+
+
+def compute_engagement(
+    df: pd.DataFrame,
+    windows: Dict[str, int] = ROLLING_WINDOWS,
+    period: str = "M",
+    thresholds: Optional[Sequence[int]] = None,
+) -> SimpleNamespace:
+    """
+    Tous les indicateurs en une passe (un seul codage des couples utilisateur × jour) :
+      .active_days   Series jours actifs distincts par user (tri décroissant)
+      .rolling       DataFrame Date × {DAU, WAU, MAU}
+      .period_days   DataFrame users × périodes (jours actifs)
+      .tier_counts   DataFrame périodes × niveaux (nb d'utilisateurs)
+    """
+    u, d, users, n_users = encode_activity(df)
+    counts = np.bincount(u, minlength=n_users)
+    active = pd.Series(counts, index=pd.Index(users, name="User ID"), name="distinct_active_days")
+    active = active[active > 0].sort_values(ascending=False, kind="stable")
+    period_days, tier_counts = engagement_tiers(u, d, users, period, thresholds)
+    return SimpleNamespace(
+        active_days=active,
+        rolling=rolling_active_users(u, d, windows),
+        period_days=period_days.loc[active.index.sort_values()],
+        tier_counts=tier_counts,
+    )
+
+
+# ── Agrégats d'affichage (taille bornée, indépendante du nb d'utilisateurs) ──────────
+
+def active_days_histogram(s_days: pd.Series, max_bins: int = 60) -> pd.DataFrame:
+    """Distribution des jours actifs : nb d'utilisateurs par tranche de jours (≤ max_bins tranches)."""
+    values = s_days.to_numpy()
+    if not len(values):
+        return pd.DataFrame(columns=["Jours actifs (min)", "Jours actifs (max)", "Utilisateurs"])
+    lo, hi = int(values.min()), int(values.max())
+    width = max(1, -(-(hi - lo + 1) // max_bins))
+    edges = np.arange(lo, hi + width + 1, width)
+    counts, _ = np.histogram(values, bins=edges)
+    return pd.DataFrame({
+        "Jours actifs (min)": edges[:-1],
+        "Jours actifs (max)": edges[1:] - 1,
+        "Utilisateurs": counts,
+    })
+
+
+def active_days_quantile_profile(s_days: pd.Series, n_points: int = 200) -> pd.DataFrame:
+    """
+    Courbe des jours actifs triés (rang en % des utilisateurs, 0 = plus actif) échantillonnée
+    sur n_points : même allure que le graphique par utilisateur, taille constante.
+    """
+    values = np.sort(s_days.to_numpy())[::-1]
+    if not len(values):
+        return pd.DataFrame(columns=["Rang (%)", "Jours actifs"])
+    ranks = np.linspace(0, 100, min(n_points, len(values)))
+    idx = np.minimum((ranks / 100 * (len(values) - 1)).round().astype(int), len(values) - 1)
+    return pd.DataFrame({"Rang (%)": ranks, "Jours actifs": values[idx]})
+
+
+def active_days_slice(s_days: pd.Series, rank_from: float, rank_to: float, max_users: int = 2000) -> pd.Series:
+    """Utilisateurs entre deux rangs (en % du classement décroissant), au plus max_users (pas régulier)."""
+    n = len(s_days)
+    start = int(np.floor(rank_from / 100 * n))
+    stop = max(start + 1, int(np.ceil(rank_to / 100 * n)))
+    part = s_days.iloc[start:stop]
+    if len(part) > max_users:
+        part = part.iloc[np.linspace(0, len(part) - 1, max_users).round().astype(int)]
+    return part
@@ -0,0 +1,267 @@
+# analytics/store.py
+"""
+Base analytique incrémentale des logs MasterControl (ajout seul).
+
+Chaque export quotidien / hebdomadaire est ingéré une fois (clé = sha256 du fichier) et
+ses comptes journaliers sont écrits dans une partition delta, sans réécrire l'historique :
+- parts/<sha>.parquet : Nb_actions par (User ID, Application, Module, Date) apportés par l'export
+- base-<n>/           : partitions déjà compactées — daily.parquet (même grain), counts.parquet
+                        (Nb_actions par User ID, Application, Module), active_days.parquet (User ID, Date)
+- ingested.json       : génération de la base + exports intégrés (sha256, nom, lignes, période, partition)
+
+Les lectures fusionnent la base et les partitions ; dès ANALYTICS_COMPACT_PARTS partitions (8),
+l'ingestion suivante les compacte dans une nouvelle base (ou `python -m analytics.store compact`).
+compute_ratios et user_active_days_total lisent directement ces agrégats : le coût d'une
+analyse dépend du nombre d'utilisateurs / modules / jours actifs, pas de l'historique brut.
+
+Exports qui se chevauchent : deux extractions du même journal contiennent, pour un
+(User ID, Application, Module, Date), les mêmes actions ou un sur-ensemble (journée partielle
+puis complète). Un export n'apporte donc que l'excédent sur les actions déjà comptées pour ce
+quadruplet : pas de double comptage, et un nouvel utilisateur ou la fin d'une journée déjà
+vue sont bien ajoutés.
+
+Un seul écrivain à la fois (CLI ou page) ; le manifeste est remplacé atomiquement en dernier,
+une partition ou une base non référencée est ignorée.
+
+Usage :
+    python -m analytics.store ingest export_2025-01-06.csv [export_2025-01-07.csv ...]
+    python -m analytics.store compact
+    python -m analytics.store status
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from analytics.user_behavior import CATEGORY_COLUMNS, file_sha256, load_logs_df
+
+ANALYTICS_STORE_DIR = Path(os.getenv("ANALYTICS_STORE_DIR", "/data/analytics_store"))
+ANALYTICS_COMPACT_PARTS = int(os.getenv("ANALYTICS_COMPACT_PARTS", "8"))
+
+DAILY_KEYS = ["User ID", "Application", "Module", "Date"]
+
+_write_lock = threading.Lock()
+
+
+def _categorize(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    for col in columns:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _write_atomic(df: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _empty_counts() -> pd.DataFrame:
+    return pd.DataFrame({
+        "User ID": pd.Categorical([]), "Application": pd.Categorical([]),
+        "Module": pd.Categorical([]), "Nb_actions": pd.Series([], dtype="int64"),
+    })
+
+
+def _empty_days() -> pd.DataFrame:
+    return pd.DataFrame({"User ID": pd.Categorical([]), "Date": pd.to_datetime([])})
+
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    """Clés en str et Date en datetime64[ns] : fusions indépendantes des catégories de chaque fichier."""
+    df = df.astype({c: str for c in CATEGORY_COLUMNS if c in df.columns})
+    if "Date" in df.columns:
+        df["Date"] = df["Date"].astype("datetime64[ns]")
+    return df
+
+
+def _merge_counts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    if not frames:
+        return _empty_counts()
+    counts = pd.concat([_plain(f) for f in frames], ignore_index=True)
+    counts = counts.groupby(["User ID", "Application", "Module"], as_index=False)["Nb_actions"].sum()
+    return _categorize(counts, CATEGORY_COLUMNS)
+
+
+def _merge_days(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    if not frames:
+        return _empty_days()
+    days = pd.concat([_plain(f[["User ID", "Date"]]) for f in frames], ignore_index=True).drop_duplicates()
+    return _categorize(days.sort_values(["User ID", "Date"], ignore_index=True), ["User ID"])
+
+
+def _merge_daily(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    if not frames:
+        return _plain(pd.DataFrame({**{c: [] for c in DAILY_KEYS}, "Nb_actions": pd.Series([], dtype="int64")}))
+    daily = pd.concat([_plain(f) for f in frames], ignore_index=True)
+    return daily.groupby(DAILY_KEYS, as_index=False)["Nb_actions"].sum()
+
+
+class AnalyticsStore:
+    def __init__(self, root: Path = ANALYTICS_STORE_DIR, compact_parts: int = ANALYTICS_COMPACT_PARTS):
+        self.root = Path(root)
+        self.parts_dir = self.root / "parts"
+        self.manifest_path = self.root / "ingested.json"
+        self.compact_parts = max(1, int(compact_parts))
+
+    # ── Manifeste ────────────────────────────────────────────────────────────
+    def _manifest(self) -> Dict:
+        if not self.manifest_path.exists():
+            return {"base": None, "exports": []}
+        return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def _base_file(self, manifest: Dict, name: str) -> Optional[Path]:
+        return self.root / manifest["base"] / name if manifest["base"] else None
+
+    def _part_path(self, part: str) -> Path:
+        return self.parts_dir / f"{part}.parquet"
+
+    def _read(self, manifest: Dict, base_name: str, filters=None) -> List[pd.DataFrame]:
+        """Fichier `base_name` de la base + comptes journaliers des partitions référencées."""
+        paths = [self._base_file(manifest, base_name)]
+        paths += [self._part_path(e["part"]) for e in manifest["exports"] if e.get("part")]
+        return [pd.read_parquet(p, filters=filters) for p in paths if p is not None and p.exists()]
+
+    # ── Lecture ──────────────────────────────────────────────────────────────
+    def ingested(self) -> List[Dict]:
+        return self._manifest()["exports"]
+
+    def fingerprint(self) -> str:
+        """Empreinte de l'état de la base (change à chaque ingestion) : clé de cache des analyses."""
+        return hashlib.sha256("".join(e["sha256"] for e in self.ingested()).encode()).hexdigest()
+
+    def counts(self) -> pd.DataFrame:
+        """Nb_actions par (User ID, Application, Module) — entrée directe de compute_ratios."""
+        return _merge_counts(self._read(self._manifest(), "counts.parquet"))
+
+    def active_days(self) -> pd.DataFrame:
+        """Couples (User ID, Date) distincts — entrée directe de user_active_days_total."""
+        return _merge_days(self._read(self._manifest(), "active_days.parquet"))
+
+    # ── Écriture ─────────────────────────────────────────────────────────────
+    def ingest(self, source, name: Optional[str] = None, sha: Optional[str] = None,
+               logs: Optional[pd.DataFrame] = None) -> Dict:
+        """
+        Ajoute un export (fichier uploadé ou chemin ; `logs` = sortie de load_logs_df si déjà lue).
+        Déjà ingéré (même sha256) → ignoré. Actions déjà comptées par un autre export → écartées.
+        Retour : entrée du manifeste + "new" (bool).
+        """
+        sha = sha or file_sha256(source)
+        name = name or getattr(source, "name", None) or Path(str(source)).name
+        with _write_lock:
+            manifest = self._manifest()
+            for entry in manifest["exports"]:
+                if entry["sha256"] == sha:
+                    return {**entry, "new": False}
+
+            logs = load_logs_df(source) if logs is None else logs
+            daily = _plain(logs.groupby(DAILY_KEYS, observed=True).size().reset_index(name="Nb_actions"))
+            if len(daily):
+                # actions déjà comptées sur la période de l'export (lecture filtrée : pas tout l'historique)
+                period = [("Date", ">=", daily["Date"].min()), ("Date", "<=", daily["Date"].max())]
+                stored = _merge_daily(self._read(manifest, "daily.parquet", filters=period))
+                daily = daily.merge(stored, on=DAILY_KEYS, how="left", suffixes=("", "_stored"))
+                daily["Nb_actions"] = (daily["Nb_actions"] - daily.pop("Nb_actions_stored").fillna(0)).clip(lower=0)
+                daily = daily[daily["Nb_actions"] > 0].astype({"Nb_actions": "int64"})
+            rows = int(daily["Nb_actions"].sum())
+
+            # partition delta : coût ∝ taille de l'export, l'historique n'est pas réécrit
+            part = sha[:16]
+            self.parts_dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(_categorize(daily.reset_index(drop=True), CATEGORY_COLUMNS), self._part_path(part))
+
+            entry = {
+                "sha256": sha,
+                "name": name,
+                "rows": rows,
+                "rows_skipped": int(len(logs)) - rows,
+                "date_min": str(logs["Date"].min().date()) if len(logs) else None,
+                "date_max": str(logs["Date"].max().date()) if len(logs) else None,
+                "ingested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "part": part,
+            }
+            manifest["exports"].append(entry)
+            self._write_manifest(manifest)  # manifeste en dernier : ingestion validée
+
+            if sum(1 for e in manifest["exports"] if e.get("part")) >= self.compact_parts:
+                self._compact(manifest)
+            return {**entry, "new": True}
+
+    def compact(self) -> int:
+        """Fusionne les partitions delta dans une nouvelle base ; retourne le nombre de partitions compactées."""
+        with _write_lock:
+            return self._compact(self._manifest())
+
+    def _compact(self, manifest: Dict) -> int:
+        parts = [e["part"] for e in manifest["exports"] if e.get("part")]
+        if not parts:
+            return 0
+        daily = _merge_daily(self._read(manifest, "daily.parquet"))
+        generation = 1 + max((int(d.name.split("-")[1]) for d in self.root.glob("base-*") if d.is_dir()), default=0)
+        base = self.root / f"base-{generation}"
+        base.mkdir(parents=True)
+        _write_atomic(_categorize(daily, CATEGORY_COLUMNS), base / "daily.parquet")
+        _write_atomic(_merge_counts([daily]), base / "counts.parquet")
+        _write_atomic(_merge_days([daily]), base / "active_days.parquet")
+
+        previous = manifest["base"]
+        manifest["base"] = base.name
+        for e in manifest["exports"]:
+            e["part"] = None
+        self._write_manifest(manifest)
+
+        # nettoyage après validation : anciens fichiers non référencés
+        for part in parts:
+            self._part_path(part).unlink(missing_ok=True)
+        if previous:
+            shutil.rmtree(self.root / previous, ignore_errors=True)
+        return len(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Base analytique incrémentale des logs MasterControl")
+    parser.add_argument("--store", type=Path, default=ANALYTICS_STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="Ajouter un ou plusieurs exports CSV")
+    p_ingest.add_argument("files", type=Path, nargs="+")
+    sub.add_parser("compact", help="Fusionner les partitions delta dans la base")
+    sub.add_parser("status", help="Exports intégrés et taille des agrégats")
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.store)
+    if args.command == "ingest":
+        for path in args.files:
+            entry = store.ingest(path)
+            if not entry["new"]:
+                print(f"↩️ {path.name} : déjà intégré ({entry['sha256'][:12]})")
+                continue
+            print(f"✅ {path.name} : {entry['rows']} lignes ({entry['date_min']} → {entry['date_max']})")
+            if entry["rows_skipped"]:
+                print(f"   ⚠️ {entry['rows_skipped']} lignes ignorées : actions déjà comptées par un autre export")
+    elif args.command == "compact":
+        print(f"🗜️ {store.compact()} partition(s) compactée(s)")
+    else:
+        manifest = store.ingested()
+        n_parts = sum(1 for e in manifest if e.get("part"))
+        print(f"📦 {args.store} : {len(manifest)} export(s) intégré(s), {n_parts} partition(s) non compactée(s)")
+        for e in manifest:
+            print(f"  - {e['name']} : {e['rows']} lignes ({e['date_min']} → {e['date_max']})")
+        if manifest:
+            print(f"  counts : {len(store.counts())} lignes · jours actifs : {len(store.active_days())} couples")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,311 @@
 # analytics/user_behavior.py
+import csv
+import hashlib
+import io
+import os
+import importlib.util
+import warnings
+from pathlib import Path
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from typing import Tuple, Dict, List
-from sklearn.cluster import KMeans
+import scipy.sparse as sp
+from typing import Callable, Tuple, Dict, List, Optional
 from types import SimpleNamespace
 
+# sklearn / matplotlib sont importés dans les fonctions de clustering :
+# le chargement et les statistiques descriptives n'en paient pas le coût.
+
 # Colonnes exigées par l'export consolidé
 REQUIRED_COLUMNS = ["Application", "Module", "User ID", "Date"]
+CATEGORY_COLUMNS = ["Application", "Module", "User ID"]
+
+# Lecture des exports MasterControl
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+# Au-delà de cette taille (ou taille inconnue), lecture par blocs avec le moteur C
+LOGS_CHUNKED_MIN_MB = float(os.getenv("LOGS_CHUNKED_MIN_MB", "512"))
+LOGS_CHUNK_ROWS = int(os.getenv("LOGS_CHUNK_ROWS", "2000000"))
+# Format de date forcé (sinon détecté sur un échantillon parmi DATE_FORMATS)
+LOGS_DATE_FORMAT = os.getenv("LOGS_DATE_FORMAT") or None
+DATE_FORMATS = [
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+    "%d-%m-%Y %H:%M:%S", "%d-%m-%Y", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d", "%d/%m/%y",
+]
+_SAMPLE_BYTES = 256 * 1024
+
+# Clustering : balayage K en parallèle (joblib), MiniBatchKMeans et échantillonnage pour les grands N
+KMEANS_N_JOBS = int(os.getenv("KMEANS_N_JOBS", "-1"))
+KMEANS_MODE = os.getenv("KMEANS_MODE", "auto").lower()          # auto | full | minibatch
+KMEANS_MINIBATCH_MIN_USERS = int(os.getenv("KMEANS_MINIBATCH_MIN_USERS", "100000"))
+ELBOW_SAMPLE_SIZE = int(os.getenv("ELBOW_SAMPLE_SIZE", "50000"))  # 0 = pas d'échantillonnage
+
+# Cache colonnaire des logs déjà parsés (Parquet, clé = sha256 de l'export)
+LOGS_CACHE_DIR = Path(os.getenv("LOGS_CACHE_DIR", "/data/logs_cache"))
+LOGS_CACHE_MAX_FILES = int(os.getenv("LOGS_CACHE_MAX_FILES", "8"))
+
+
+def _read_sample(source) -> Tuple[str, Optional[int]]:
+    """Début du fichier (texte) et taille totale en octets si connue, sans consommer le flux."""
+    if hasattr(source, "read"):
+        pos = source.tell()
+        raw = source.read(_SAMPLE_BYTES)
+        source.seek(pos)
+        size = getattr(source, "size", None)
+    else:
+        with open(source, "rb") as fh:
+            raw = fh.read(_SAMPLE_BYTES)
+        size = os.path.getsize(source)
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8-sig", errors="replace")
+    return raw.lstrip("\ufeff"), size
+
+
+def _sniff_separator(sample: str) -> str:
+    """Séparateur détecté sur l'échantillon (virgule, point-virgule, tabulation, pipe)."""
+    lines = sample.splitlines()[:50]
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=",;\t|").delimiter
+    except csv.Error:
+        header = lines[0] if lines else ""
+        return max([",", ";", "\t", "|"], key=header.count)
+
+
+def _infer_date_format(values: List[str]) -> Optional[str]:
+    """Premier format de DATE_FORMATS qui reconnaît (presque) toutes les dates de l'échantillon."""
+    values = [v.strip() for v in values if v and v.strip()]
+    if not values:
+        return None
+    sample = pd.Series(values[:1000])
+    for fmt in DATE_FORMATS:
+        ok = pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+        if ok >= 0.95:
+            return fmt
+    return None
+
+
+def _as_category(values: pd.Series, normalize_ids: bool = False) -> pd.Categorical:
+    """Colonne texte → catégorielle ; les transformations portent sur les modalités, pas sur les lignes."""
+    cat = values.astype("category")
+    cats = cat.cat.categories.astype(str).str.strip()
+    if normalize_ids:
+        cats = cats.str.upper()
+    # modalités redevenues identiques après normalisation → regroupées
+    new_codes, uniques = pd.factorize(cats)
+    return pd.Categorical.from_codes(new_codes[cat.cat.codes.to_numpy()], categories=uniques)
+
+
+def _parse_dates(values: pd.Series, date_format: Optional[str]) -> pd.Series:
+    """Dates au jour près (datetime64) ; chaque valeur distincte n'est parsée qu'une fois."""
+    codes, uniques = pd.factorize(values.astype(str).str.strip(), use_na_sentinel=False)
+    if date_format:
+        parsed = pd.to_datetime(pd.Index(uniques), format=date_format, errors="coerce")
+    else:
+        parsed = pd.to_datetime(pd.Index(uniques), dayfirst=True, errors="coerce")
+    return pd.Series(parsed.normalize()[codes], index=values.index)
+
+
+def _normalize_logs(chunk: pd.DataFrame, date_format: Optional[str]) -> pd.DataFrame:
+    out = pd.DataFrame(index=chunk.index)
+    out["Application"] = _as_category(chunk["Application"])
+    out["Module"] = _as_category(chunk["Module"])
+    out["User ID"] = _as_category(chunk["User ID"], normalize_ids=True)
+    out["Date"] = _parse_dates(chunk["Date"], date_format)
+    return out.dropna(subset=["Date"])
+
+
+def _concat_logs(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatène les blocs en conservant des colonnes catégorielles (union des modalités)."""
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    from pandas.api.types import union_categoricals
+
+    out = pd.DataFrame({
+        col: union_categoricals([p[col] for p in parts], ignore_order=True) for col in CATEGORY_COLUMNS
+    })
+    out["Date"] = np.concatenate([p["Date"].to_numpy() for p in parts])
+    return out
 
 
 def load_logs_df(uploaded_file) -> pd.DataFrame:
     """
     Charge le CSV consolidé (Application, Module, User ID, Date).
-    Gère séparateurs (comma/semicolon/tab), BOM et espaces.
-    """
-   
-    # Lecture directe avec autodétection du séparateur
-    df = pd.read_csv(
-        uploaded_file,
-        sep=None,
-        engine="python",
-        dtype=str,
-        keep_default_na=False
+    Gère séparateurs (comma/semicolon/tab/pipe), BOM et espaces.
+
+    - séparateur et format de date détectés sur un échantillon (début du fichier)
+    - lecture complète par un moteur rapide (pyarrow si disponible, sinon C), 4 colonnes seulement
+    - gros fichiers (≥ LOGS_CHUNKED_MIN_MB ou taille inconnue) : lecture par blocs de LOGS_CHUNK_ROWS lignes
+    - Application / Module / User ID en catégoriel ; Date en datetime64 (jour)
+    """
+    sample, size = _read_sample(uploaded_file)
+    sep = _sniff_separator(sample)
+
+    sample_rows = list(csv.reader(io.StringIO(sample), delimiter=sep))
+    header = [c.replace("\ufeff", "").strip() for c in (sample_rows[0] if sample_rows else [])]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {missing} — détectées: {header}")
+    positions = [header.index(c) for c in REQUIRED_COLUMNS]
+    # noms tels que lus par pandas (espaces conservés) : le moteur pyarrow refuse usecols en positions
+    usecols = [sample_rows[0][p].replace("\ufeff", "") for p in sorted(positions)]
+
+    date_format = LOGS_DATE_FORMAT or _infer_date_format(
+        [r[positions[3]] for r in sample_rows[1:-1] if len(r) > positions[3]]  # dernière ligne peut être tronquée
     )
 
-    # Nettoyage des noms de colonnes
-    df.columns = (
-        df.columns
-        .str.replace("\ufeff", "", regex=False)  # retire BOM éventuel
-        .str.strip()
+    read_kwargs = dict(
+        sep=sep,
+        header=0,
+        usecols=usecols,
+        dtype=str,
+        keep_default_na=False,
     )
+    chunked = size is None or size >= LOGS_CHUNKED_MIN_MB * 1024 * 1024
+    by_position = {pos: name for name, pos in zip(REQUIRED_COLUMNS, positions)}
 
-    required = ["Application", "Module", "User ID", "Date"]
-    missing = [c for c in required if c not in df.columns]
-    if missing:
-        raise ValueError(f"Colonnes manquantes: {missing} — détectées: {list(df.columns)}")
+    def _rename(frame: pd.DataFrame) -> pd.DataFrame:
+        frame.columns = [by_position[p] for p in sorted(positions)]
+        return frame
+
+    if chunked:
+        reader = pd.read_csv(uploaded_file, engine="c", encoding="utf-8-sig", chunksize=LOGS_CHUNK_ROWS, **read_kwargs)
+        parts = [_normalize_logs(_rename(chunk), date_format) for chunk in reader]
+    else:
+        engine = "pyarrow" if PYARROW_AVAILABLE else "c"
+        frame = pd.read_csv(uploaded_file, engine=engine, encoding="utf-8-sig", **read_kwargs)
+        parts = [_normalize_logs(_rename(frame), date_format)]
+
+    if not parts:
+        return pd.DataFrame({c: pd.Categorical([]) for c in CATEGORY_COLUMNS} | {"Date": pd.to_datetime([])})
+    return _concat_logs(parts)[REQUIRED_COLUMNS]
+
+
+def file_sha256(source, block_size: int = 8 * 1024 * 1024) -> str:
+    """sha256 d'un fichier uploadé (ou d'un chemin), lu par blocs ; la position du flux est conservée."""
+    h = hashlib.sha256()
+    if hasattr(source, "read"):
+        pos = source.tell()
+        source.seek(0)
+        for block in iter(lambda: source.read(block_size), b""):
+            h.update(block)
+        source.seek(pos)
+    else:
+        with open(source, "rb") as fh:
+            for block in iter(lambda: fh.read(block_size), b""):
+                h.update(block)
+    return h.hexdigest()
 
-    # Normalisation
-    df = df[required].copy()
-    df["User ID"] = df["User ID"].astype(str).str.strip().str.upper()
-    df["Date"] = pd.to_datetime(df["Date"], dayfirst=True, errors="coerce").dt.date
-    df = df.dropna(subset=["Date"])
 
-    return df
+def _evict_logs_cache(cache_dir: Path, keep: int) -> None:
+    """Garde les `keep` fichiers Parquet les plus récemment utilisés."""
+    files = sorted(cache_dir.glob("*.parquet"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in files[max(0, keep):]:
+        old.unlink(missing_ok=True)
+
+
+def load_logs_cached(
+    uploaded_file,
+    sha: Optional[str] = None,
+    cache_dir: Path = LOGS_CACHE_DIR,
+    on_warning: Optional[Callable[[str], None]] = None,
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Logs normalisés (voir load_logs_df) via un cache Parquet indexé par sha256 de l'export :
+    un export déjà vu est relu en colonnes (catégories et dates conservées) au lieu d'être re-parsé.
+    Retourne (df, sha256). Le cache est facultatif : en cas d'erreur de lecture / d'écriture, on
+    continue sans et le problème est signalé à on_warning (ex. st.warning), sinon via warnings.warn.
+    """
+    warn = on_warning or (lambda msg: warnings.warn(msg, RuntimeWarning, stacklevel=3))
+    sha = sha or file_sha256(uploaded_file)
+    path = Path(cache_dir) / f"{sha}.parquet"
+    if path.exists():
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # LRU : date d'usage
+            return df, sha
+        except Exception as e:
+            warn(f"Cache logs illisible ({path.name}), relecture du CSV : {e}")
+
+    df = load_logs_df(uploaded_file)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)  # écriture atomique (sessions concurrentes)
+        _evict_logs_cache(path.parent, LOGS_CACHE_MAX_FILES)
+    except Exception as e:
+        warn(f"Cache logs non écrit ({path.parent}) : {e}")
+    return df, sha
+
+
+def _sorted_codes(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Codes entiers + modalités triées (catégoriel : calcul sur les modalités seulement)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        cats = values.cat.categories
+        order = np.argsort(cats.astype(str).to_numpy(), kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        codes = values.cat.codes.to_numpy()
+        used = np.unique(codes)                 # modalités réellement présentes
+        remap = np.full(len(order), -1, dtype=np.int64)
+        kept = used[np.argsort(rank[used])]
+        remap[kept] = np.arange(len(kept))
+        return remap[codes], pd.Index(cats[kept].astype(str))
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, pd.Index(uniques)
+
+
+def _is_sparse_frame(df) -> bool:
+    return isinstance(df, pd.DataFrame) and len(df.columns) > 0 and all(
+        isinstance(t, pd.SparseDtype) for t in df.dtypes
+    )
+
+
+def as_matrix(X):
+    """Matrice pour sklearn : CSR si DataFrame creux / matrice scipy, ndarray sinon."""
+    if _is_sparse_frame(X):
+        return X.sparse.to_coo().tocsr()
+    if sp.issparse(X):
+        return X.tocsr()
+    if isinstance(X, pd.DataFrame):
+        return X.to_numpy(dtype=float)
+    return np.asarray(X)
 
 
 def compute_ratios(df: pd.DataFrame) -> pd.DataFrame:
     """
     1) Compte des actions par (User ID, Application, Module)
-    2) Pivot -> chaque user = ligne; colonnes = MultiIndex (Application, Module)
+    2) Matrice creuse CSR : chaque user = ligne ; colonnes = MultiIndex (Application, Module)
     3) Ratios par ligne (somme ≈ 1)
+
+    Construite directement depuis les codes entiers (pas de pivot dense) ; retournée en
+    DataFrame creux (SparseDtype) : sklearn la reçoit en CSR via as_matrix, la version dense
+    n'est produite que pour l'affichage / l'export.
+    Accepte aussi des comptes déjà agrégés (colonne Nb_actions, cf. analytics.store).
     """
-    df_user_mod = (
-        df.groupby(["User ID", "Application", "Module"])
-          .size()
-          .reset_index(name="Nb_actions")
+    u_codes, users = _sorted_codes(df["User ID"])
+    a_codes, apps = _sorted_codes(df["Application"])
+    m_codes, modules = _sorted_codes(df["Module"])
+
+    # colonne = couple (Application, Module) effectivement observé, dans l'ordre trié
+    pair = a_codes.astype(np.int64) * len(modules) + m_codes
+    col_codes, pairs = pd.factorize(pair, sort=True)
+    columns = pd.MultiIndex.from_arrays(
+        [apps[pairs // len(modules)], modules[pairs % len(modules)]],
+        names=["Application", "Module"],
     )
 
-    df_module = df_user_mod.pivot_table(
-        index="User ID",
-        columns=["Application", "Module"],
-        values="Nb_actions",
-        fill_value=0
+    weights = (
+        df["Nb_actions"].to_numpy(dtype=np.float64) if "Nb_actions" in df.columns
+        else np.ones(len(u_codes), dtype=np.float64)
     )
-
-    totals = df_module.sum(axis=1).replace(0, np.nan)
-    df_profiles = df_module.div(totals, axis=0).fillna(0.0)
-    df_profiles.index.name = "User ID"
+    counts = sp.coo_matrix(
+        (weights, (u_codes, col_codes)),
+        shape=(len(users), len(columns)),
+    ).tocsr()  # doublons sommés = nb d'actions
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    ratios = sp.diags(1.0 / np.where(totals > 0, totals, 1.0)) @ counts
+
+    df_profiles = pd.DataFrame.sparse.from_spmatrix(ratios, index=pd.Index(users, name="User ID"), columns=columns)
     return df_profiles  # ratios ∈ [0,1]
 
 
@@ -76,17 +314,47 @@ def aggregate_by_application(df_profiles: pd.DataFrame) -> pd.DataFrame:
     Agrège les ratios par Application (somme des modules d'une même application).
     Entrée: colonnes MultiIndex (Application, Module)
     Sortie: colonnes = Applications (str)
+    Entrée creuse : produit matriciel ratios @ indicatrice(module → application), résultat creux.
     """
-    if isinstance(df_profiles.columns, pd.MultiIndex):
-        agg = df_profiles.groupby(axis=1, level="Application").sum()
-    else:
+    if not isinstance(df_profiles.columns, pd.MultiIndex):
         # déjà agrégé
         agg = df_profiles.copy()
+    elif _is_sparse_frame(df_profiles):
+        app_codes, apps = pd.factorize(df_profiles.columns.get_level_values("Application"), sort=True)
+        n_cols = len(app_codes)
+        indicator = sp.csr_matrix(
+            (np.ones(n_cols), (np.arange(n_cols), app_codes)), shape=(n_cols, len(apps))
+        )
+        agg = pd.DataFrame.sparse.from_spmatrix(
+            as_matrix(df_profiles) @ indicator, index=df_profiles.index, columns=pd.Index(apps)
+        )
+    else:
+        agg = df_profiles.T.groupby(level="Application").sum().T
     agg.columns = agg.columns.astype(str)
     return agg
 
 
-def auto_k_elbow(X, k_min: int = 1, k_max: int = 10):
+def _make_kmeans(k: int, mode: str, n_samples: int):
+    """KMeans complet, ou MiniBatchKMeans (mode 'minibatch', ou 'auto' au-delà de KMEANS_MINIBATCH_MIN_USERS)."""
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    if mode == "minibatch" or (mode == "auto" and n_samples >= KMEANS_MINIBATCH_MIN_USERS):
+        return MiniBatchKMeans(n_clusters=k, n_init="auto", random_state=42, batch_size=4096)
+    return KMeans(n_clusters=k, n_init="auto", random_state=42)
+
+
+def _fit_kmeans(X, k: int, mode: str):
+    return _make_kmeans(k, mode, X.shape[0]).fit(X)
+
+
+def auto_k_elbow(
+    X,
+    k_min: int = 1,
+    k_max: int = 10,
+    n_jobs: int = KMEANS_N_JOBS,
+    mode: str = KMEANS_MODE,
+    sample_size: int = ELBOW_SAMPLE_SIZE,
+):
     """
     Choisit K automatiquement par la méthode du coude (distorsion/inertia),
     et renvoie (k_auto, viz) où viz.fig est la figure Matplotlib à afficher.
@@ -94,9 +362,14 @@ def auto_k_elbow(X, k_min: int = 1, k_max: int = 10):
     - Trace UNE SEULE courbe: inertie vs K
     - K est borné à [1..min(10, n_samples-1)] (pas de crash si peu d'utilisateurs)
     - Détection du coude = point le plus éloigné de la droite (k_min → k_max)
+    - Les K sont ajustés en parallèle (joblib, n_jobs process) ; au-delà de sample_size
+      utilisateurs, sur un échantillon aléatoire ; MiniBatchKMeans selon `mode`
+    - viz.models = {K: modèle ajusté} : cluster_with_k(..., models=viz.models) les réutilise
     """
-    # Données
-    X = np.asarray(X)
+    from joblib import Parallel, delayed
+
+    # Données (CSR acceptée telle quelle par KMeans)
+    X = as_matrix(X)
     n_samples = X.shape[0]
     if n_samples < 2:
         raise ValueError("Pas assez d'observations pour le clustering (n<2).")
@@ -110,12 +383,18 @@ def auto_k_elbow(X, k_min: int = 1, k_max: int = 10):
         k_min = max(1, min(2, k_max))  # fallback
     Ks = list(range(k_min, k_max + 1))
 
-    # Inerties
-    inertias = []
-    for k in Ks:
-        km = KMeans(n_clusters=k, n_init="auto", random_state=42)
-        km.fit(X)
-        inertias.append(km.inertia_)
+    # Échantillon pour le balayage (la forme de la courbe est conservée)
+    sampled = bool(sample_size) and n_samples > sample_size
+    if sampled:
+        rows = np.sort(np.random.default_rng(42).choice(n_samples, size=int(sample_size), replace=False))
+        X_fit = X[rows]
+    else:
+        X_fit = X
+
+    # Inerties (un K par tâche)
+    fitted = Parallel(n_jobs=n_jobs)(delayed(_fit_kmeans)(X_fit, k, mode) for k in Ks)
+    models = dict(zip(Ks, fitted))
+    inertias = [m.inertia_ for m in fitted]
 
     # Détection du "coude" = point le plus éloigné de la droite (premier → dernier)
     x = np.array(Ks, dtype=float)
@@ -131,46 +410,133 @@ def auto_k_elbow(X, k_min: int = 1, k_max: int = 10):
         distances = np.abs((y1 - y0) * x - (x1 - x0) * y + x1*y0 - y1*x0) / denom
         k_auto = int(x[np.argmax(distances)])
 
-    # Figure compacte
+    # viz.fig pour rester compatible avec st.pyplot(viz.fig)
+    fig = elbow_figure(Ks, inertias, k_auto, sample_size if sampled else 0)
+    viz = SimpleNamespace(fig=fig, Ks=Ks, inertias=inertias, models=models, sampled=sampled)
+    return k_auto, viz
+
+
+def elbow_figure(Ks: List[int], inertias: List[float], k_auto: int, sample_size: int = 0):
+    """Figure compacte du coude (aussi reconstruite à partir des résultats batch)."""
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(6, 4))
     ax.plot(Ks, inertias, marker="D")
     ax.axvline(k_auto, ls="--", color="k", alpha=0.6)
     ax.set_xlabel("K")
     ax.set_ylabel("Distorsion (inertia)")
-    ax.set_title(f"Méthode du coude ({Ks[0]}–{Ks[-1]})")
+    ax.set_title(
+        f"Méthode du coude ({Ks[0]}–{Ks[-1]})" + (f" — échantillon {int(sample_size)}" if sample_size else "")
+    )
     ax.grid(True, alpha=0.15)
     fig.tight_layout()
+    return fig
 
-    # viz.fig pour rester compatible avec st.pyplot(viz.fig)
-    viz = SimpleNamespace(fig=fig)
-    return k_auto, viz
 
-
-def cluster_with_k(ratios_df: pd.DataFrame, k: int) -> Tuple[pd.DataFrame, np.ndarray]:
+def cluster_with_k(
+    ratios_df: pd.DataFrame,
+    k: int,
+    models: Optional[Dict[int, object]] = None,
+    mode: str = KMEANS_MODE,
+) -> Tuple[pd.DataFrame, np.ndarray]:
     """
     KMeans(n_init='auto') sur ratios (Applications ou Modules).
+    Si `models` (viz.models d'auto_k_elbow sur les mêmes données) contient K, le modèle
+    déjà ajusté est réutilisé : labels directs, ou predict si ajusté sur un échantillon.
     Retour:
       - df_clustered = ratios + colonne 'cluster'
       - labels = ndarray des labels
     """
-    X = ratios_df.values
-    km = KMeans(n_clusters=int(k), n_init="auto", random_state=42)
-    labels = km.fit_predict(X)
+    X = as_matrix(ratios_df)
+    km = (models or {}).get(int(k))
+    if km is None:
+        labels = _make_kmeans(int(k), mode, X.shape[0]).fit_predict(X)
+    elif getattr(km, "labels_", None) is not None and len(km.labels_) == X.shape[0]:
+        labels = km.labels_
+    else:
+        labels = km.predict(X)
     out = ratios_df.copy()
     out["cluster"] = labels
     return out, labels
 
 
+def intra_matrix(df_profiles: pd.DataFrame, app: str) -> pd.DataFrame:
+    """Sous-matrice modules d'une application (users et modules actifs seulement)."""
+    df_app_mod = df_profiles[app].copy()
+    df_app_mod = df_app_mod.loc[df_app_mod.sum(axis=1) > 0, :]
+    return df_app_mod.loc[:, df_app_mod.sum(axis=0) > 0]
+
+
+def _cluster_application(X: pd.DataFrame, k_max: int, mode: str) -> Dict:
+    """Tâche d'une application (worker joblib) : coude séquentiel + clustering au K auto."""
+    import matplotlib.pyplot as plt
+
+    k_auto, viz = auto_k_elbow(X, k_min=1, k_max=k_max, n_jobs=1, mode=mode)
+    plt.close(viz.fig)  # figure reconstruite dans le process appelant
+    _, labels = cluster_with_k(X, k_auto, models=viz.models)
+    return {"k_auto": k_auto, "Ks": viz.Ks, "inertias": viz.inertias, "models": viz.models,
+            "sampled": viz.sampled, "labels": labels}
+
+
+def cluster_all_applications(
+    df_profiles: pd.DataFrame,
+    k_max: int = 10,
+    n_jobs: int = KMEANS_N_JOBS,
+    min_users: int = 20,
+    min_modules: int = 2,
+    mode: str = KMEANS_MODE,
+) -> Dict[str, SimpleNamespace]:
+    """
+    Clustering intra-application de TOUTES les applications en une passe :
+    df_profiles découpé par application, une tâche joblib par application éligible
+    (≥ min_users utilisateurs et ≥ min_modules modules actifs).
+    Retour : {application: SimpleNamespace(matrix, k_auto, viz, df_labeled, centers)}
+    avec viz au format d'auto_k_elbow (viz.models réutilisables par cluster_with_k).
+    """
+    from joblib import Parallel, delayed
+
+    jobs = []
+    for app in sorted({lvl0 for lvl0, _ in df_profiles.columns}):
+        sub = intra_matrix(df_profiles, app)
+        if not sub.empty and sub.shape[0] >= min_users and sub.shape[1] >= min_modules:
+            jobs.append((app, sub))
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(_cluster_application)(sub, min(k_max, max(2, sub.shape[0] - 1)), mode) for _, sub in jobs
+    )
+
+    results: Dict[str, SimpleNamespace] = {}
+    for (app, sub), r in zip(jobs, fitted):
+        df_labeled = sub.copy()
+        df_labeled["cluster"] = r["labels"]
+        viz = SimpleNamespace(
+            fig=elbow_figure(r["Ks"], r["inertias"], r["k_auto"]),
+            Ks=r["Ks"], inertias=r["inertias"], models=r["models"], sampled=r["sampled"],
+        )
+        results[app] = SimpleNamespace(
+            matrix=sub, k_auto=r["k_auto"], viz=viz, df_labeled=df_labeled, centers=cluster_centers_mean(df_labeled),
+        )
+    return results
+
+
 def cluster_centers_mean(df_clustered: pd.DataFrame) -> pd.DataFrame:
     """
     Calcule le profil moyen par cluster (moyenne des ratios).
     Retourne un DF index=cluster, colonnes = mêmes colonnes que df_clustered sans 'cluster'.
     """
-    ratio_cols = [c for c in df_clustered.columns if c != "cluster"]
-    centers = (
-        df_clustered.groupby("cluster")[ratio_cols]
-                    .mean()
-                    .sort_index()
+    ratios = df_clustered.drop(columns="cluster")
+    if not _is_sparse_frame(ratios):
+        return ratios.groupby(df_clustered["cluster"]).mean().sort_index()
+
+    # creux : sommes par cluster = indicatrice(cluster)ᵀ @ ratios
+    clusters, inv = np.unique(df_clustered["cluster"].to_numpy(), return_inverse=True)
+    member = sp.csr_matrix(
+        (np.ones(len(inv)), (inv, np.arange(len(inv)))), shape=(len(clusters), len(inv))
+    )
+    sums = np.asarray((member @ as_matrix(ratios)).todense())
+    centers = pd.DataFrame(
+        sums / np.bincount(inv)[:, None],
+        index=pd.Index(clusters, name="cluster"),
+        columns=ratios.columns,
     )
     return centers
 
@@ -182,7 +548,7 @@ def modules_by_application(df_logs: pd.DataFrame) -> Dict[str, List[str]]:
     m = (df_logs[["Application", "Module"]]
             .dropna()
             .drop_duplicates()
-            .groupby("Application")["Module"]
+            .groupby("Application", observed=True)["Module"]
             .apply(lambda s: sorted(s.unique().tolist()))
             .to_dict())
     return m
@@ -192,14 +558,12 @@ def user_active_days_total(df: pd.DataFrame) -> pd.Series:
     """
     Retourne une Series indexée par User ID avec le nb de jours DISTINCTS d'activité,
     en considérant un jour actif = présence d'au moins une ligne (peu importe l'application).
+    Accepte aussi les couples (User ID, Date) déjà dédoublonnés de analytics.store.
+    Calcul vectorisé sur codes entiers (voir analytics.engagement).
     """
-    d = df.copy()
-    d["User ID"] = d["User ID"].astype(str).str.strip().str.upper()
-    d["Date"] = pd.to_datetime(d["Date"]).dt.date
-    unique_days = d[["User ID", "Date"]].drop_duplicates()
-    s = unique_days.groupby("User ID")["Date"].nunique().sort_values(ascending=False)
-    s.name = "distinct_active_days"
-    return s
+    from analytics.engagement import distinct_active_days
+
+    return distinct_active_days(df)
 
 def top_users_by_days(s_days: pd.Series, top_n: int = 10) -> pd.DataFrame:
     """Top N super users (jours actifs distincts)."""
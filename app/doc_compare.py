@@ -0,0 +1,354 @@
+# app/doc_compare.py
+"""
+Comparaison de versions de documents (utilitaire documentaire), sur documents complets.
+
+- unités = phrases / puces / lignes
+- alignement "patience" : ancres = unités uniques dans les deux versions (clé = texte
+  normalisé, comparaison par hash), plus longue sous-suite croissante, puis récursion
+  entre les ancres ; difflib seulement sur les petites zones sans ancre
+- détection des blocs déplacés (même texte supprimé d'un côté, ajouté de l'autre)
+- diff mot-à-mot uniquement sur les paires modifiées
+- mode sémantique (compare_documents_semantic) : les unités non alignées à l'identique sont
+  rapprochées par similarité d'embeddings (reformulations, déplacements reformulés)
+"""
+import difflib
+import os
+import re
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Au-delà de ce produit de tailles, une zone sans ancre n'est pas passée à difflib (coût quadratique)
+SMALL_GAP_CELLS = 10_000
+
+# Mode sémantique : similarité cosinus minimale pour apparier deux unités reformulées
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_THRESHOLD", "0.85"))
+# Nb de candidats gardés par unité (top-k) et nb de zones voisines comparées (blocking)
+SEMANTIC_TOP_K = int(os.getenv("SEMANTIC_TOP_K", "3"))
+SEMANTIC_WINDOW = int(os.getenv("SEMANTIC_WINDOW", "2"))
+# Taille max (lignes × colonnes) de la passe globale sur les unités restantes
+SEMANTIC_MAX_CELLS = int(os.getenv("SEMANTIC_MAX_CELLS", "25000000"))
+
+
+def split_units(txt: str) -> List[str]:
+    """Découpe le texte en unités lisibles (phrases / puces / lignes)."""
+    t = re.sub(r"[•\-\u2022]\s*", "\n", txt)  # puces → retours ligne
+    parts = re.split(r"(?<=[\.\!\?])\s+|\n+", t)  # fin de phrase OU newline
+    return [p.strip() for p in parts if p and p.strip()]
+
+
+def unit_key(unit: str) -> str:
+    """Clé de comparaison d'une unité (espaces normalisés)."""
+    return " ".join(unit.split())
+
+
+def word_diff(a: str, b: str) -> str:
+    """Diff mot-à-mot : '2021 → 1999, haut → très haut, …'"""
+    a_w, b_w = a.split(), b.split()
+    changes = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a_w, b_w, autojunk=False).get_opcodes():
+        if tag == "replace":
+            changes.append(f"{' '.join(a_w[i1:i2])} → {' '.join(b_w[j1:j2])}")
+        elif tag == "delete":
+            changes.append(f"supprimé: {' '.join(a_w[i1:i2])}")
+        elif tag == "insert":
+            changes.append(f"ajouté: {' '.join(b_w[j1:j2])}")
+    return ", ".join(changes)
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Plus longue sous-suite strictement croissante en j (pairs triées par i), O(n log n)."""
+    tails: List[int] = []       # j de fin de la meilleure sous-suite de chaque longueur
+    tails_idx: List[int] = []   # indice dans pairs correspondant
+    prev = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tails_idx.append(k)
+        else:
+            tails[pos] = j
+            tails_idx[pos] = k
+        prev[k] = tails_idx[pos - 1] if pos > 0 else -1
+    out = []
+    k = tails_idx[-1] if tails_idx else -1
+    while k != -1:
+        out.append(pairs[k])
+        k = prev[k]
+    return out[::-1]
+
+
+def align_units(a: Sequence[str], b: Sequence[str]) -> List[Tuple[int, int]]:
+    """
+    Alignement de type patience diff : liste triée des paires (i, j) avec a[i] == b[j].
+    Travail itératif (pas de récursion Python) pour les très longs documents.
+    """
+    matches: List[Tuple[int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # préfixe / suffixe communs
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo >= ahi or blo >= bhi:
+            continue
+
+        # ancres : unités présentes exactement une fois de chaque côté
+        count_a: Dict[str, int] = {}
+        pos_a: Dict[str, int] = {}
+        for i in range(alo, ahi):
+            count_a[a[i]] = count_a.get(a[i], 0) + 1
+            pos_a[a[i]] = i
+        count_b: Dict[str, int] = {}
+        pos_b: Dict[str, int] = {}
+        for j in range(blo, bhi):
+            count_b[b[j]] = count_b.get(b[j], 0) + 1
+            pos_b[b[j]] = j
+        candidates = sorted(
+            (pos_a[k], pos_b[k]) for k, c in count_a.items() if c == 1 and count_b.get(k) == 1
+        )
+        anchors = _longest_increasing(candidates)
+
+        if not anchors:
+            # petite zone sans ancre : difflib exact ; grande zone : laissée non alignée
+            if (ahi - alo) * (bhi - blo) <= SMALL_GAP_CELLS:
+                sm = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+                for i, j, size in sm.get_matching_blocks():
+                    matches.extend((alo + i + k, blo + j + k) for k in range(size))
+            continue
+
+        matches.extend(anchors)
+        prev_i, prev_j = alo, blo
+        for i, j in anchors:
+            stack.append((prev_i, i, prev_j, j))
+            prev_i, prev_j = i + 1, j + 1
+        stack.append((prev_i, ahi, prev_j, bhi))
+
+    matches.sort()
+    return matches
+
+
+def _gaps(matches: List[Tuple[int, int]], n_a: int, n_b: int) -> List[Tuple[int, int, int, int]]:
+    """Zones non alignées (i1, i2, j1, j2) entre les paires alignées."""
+    gaps = []
+    prev_i, prev_j = 0, 0
+    for i, j in matches + [(n_a, n_b)]:
+        if i > prev_i or j > prev_j:
+            gaps.append((prev_i, i, prev_j, j))
+        prev_i, prev_j = i + 1, j + 1
+    return gaps
+
+
+def _group_moves(moves: List[Tuple[int, int]], old_units: List[str]) -> List[Tuple[str, int, int]]:
+    """Regroupe les unités déplacées consécutives (des deux côtés) en blocs (texte, pos. ancienne, pos. nouvelle)."""
+    blocks: List[Tuple[str, int, int]] = []
+    start = None
+    for i, j in sorted(moves):
+        if start is None:
+            start, texts = (i, j), [old_units[i]]
+        elif (i, j) == (last[0] + 1, last[1] + 1):
+            texts.append(old_units[i])
+        else:
+            blocks.append((" ".join(texts), start[0], start[1]))
+            start, texts = (i, j), [old_units[i]]
+        last = (i, j)
+    if start is not None:
+        blocks.append((" ".join(texts), start[0], start[1]))
+    return blocks
+
+
+def compare_units(old_units: List[str], new_units: List[str]) -> Dict[str, list]:
+    """
+    Compare deux listes d'unités.
+    Retour : {"added": [...], "removed": [...], "modified": [(ancien, nouveau, diff)],
+              "moved": [(texte, position ancienne, position nouvelle)], "unchanged": int}
+    """
+    a = [unit_key(u) for u in old_units]
+    b = [unit_key(u) for u in new_units]
+    matches = align_units(a, b)
+    gaps = _gaps(matches, len(a), len(b))
+
+    # Déplacements : texte supprimé dans une zone et ajouté (à l'identique) dans une autre
+    removed_pos: Dict[str, List[int]] = {}
+    for i1, i2, _, _ in gaps:
+        for i in range(i1, i2):
+            removed_pos.setdefault(a[i], []).append(i)
+    moves: List[Tuple[int, int]] = []
+    moved_old, moved_new = set(), set()
+    for _, _, j1, j2 in gaps:
+        for j in range(j1, j2):
+            candidates = removed_pos.get(b[j])
+            if candidates:
+                i = candidates.pop(0)
+                moves.append((i, j))
+                moved_old.add(i)
+                moved_new.add(j)
+
+    added: List[str] = []
+    removed: List[str] = []
+    modified: List[Tuple[str, str, str]] = []
+    for i1, i2, j1, j2 in gaps:
+        a_block = [old_units[i] for i in range(i1, i2) if i not in moved_old]
+        b_block = [new_units[j] for j in range(j1, j2) if j not in moved_new]
+        # paires dans la zone remplacée (diff mot-à-mot seulement ici)
+        n = min(len(a_block), len(b_block))
+        for k in range(n):
+            if unit_key(a_block[k]) != unit_key(b_block[k]):
+                modified.append((a_block[k], b_block[k], word_diff(a_block[k], b_block[k])))
+        removed.extend(a_block[n:])
+        added.extend(b_block[n:])
+
+    return {
+        "added": added,
+        "removed": removed,
+        "modified": modified,
+        "moved": _group_moves(moves, old_units),
+        "unchanged": len(matches),
+    }
+
+
+def compare_documents(text_old: str, text_new: str) -> Dict[str, list]:
+    """Compare deux textes complets (voir compare_units)."""
+    return compare_units(split_units(text_old), split_units(text_new))
+
+
+def _embed_units(embedder, texts: List[str], batch_size: int):
+    """Embeddings normalisés (float32), calculés par batchs avec le modèle partagé."""
+    import numpy as np
+
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embedder.embed_documents(texts[start:start + batch_size]))
+    out = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.maximum(norms, 1e-12)
+
+
+def _top_k_pairs(A, B, rows, cols, top_k: int, threshold: float, chunk: int = 1024) -> List[Tuple[float, int, int]]:
+    """Paires (similarité, ligne, colonne) : top-k colonnes par ligne au-dessus du seuil, par blocs de lignes."""
+    import numpy as np
+
+    pairs: List[Tuple[float, int, int]] = []
+    if not len(rows) or not len(cols):
+        return pairs
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    Bc = B[cols]
+    k = min(top_k, len(cols))
+    for start in range(0, len(rows), chunk):
+        r = rows[start:start + chunk]
+        sims = A[r] @ Bc.T
+        best = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best_sims = np.take_along_axis(sims, best, axis=1)
+        for ri, ci in zip(*np.nonzero(best_sims >= threshold)):
+            pairs.append((float(best_sims[ri, ci]), int(r[ri]), int(cols[best[ri, ci]])))
+    return pairs
+
+
+def compare_units_semantic(
+    old_units: List[str],
+    new_units: List[str],
+    embedder,
+    threshold: float = SEMANTIC_THRESHOLD,
+    top_k: int = SEMANTIC_TOP_K,
+    window: int = SEMANTIC_WINDOW,
+    batch_size: int = 256,
+) -> Dict[str, list]:
+    """
+    Comparaison sémantique : même format de retour que compare_units, "modified" = unités reformulées.
+    1) alignement exact (patience) → unités inchangées
+    2) unités restantes seulement : embeddings par batchs, similarité vectorisée
+       - blocking : chaque zone non alignée n'est comparée qu'à ses `window` zones voisines
+       - passe globale (bornée par SEMANTIC_MAX_CELLS) sur ce qui reste, pour les déplacements lointains
+       - top-k par unité puis appariement glouton par similarité décroissante
+    3) paire dans sa zone et dans l'ordre → reformulée ; sinon → déplacée (et aussi reformulée si le
+       texte diffère : la reformulation et son diff mot-à-mot ne sont pas masqués par le déplacement) ;
+       le reste → ajouté / supprimé
+    """
+    import numpy as np
+
+    a = [unit_key(u) for u in old_units]
+    b = [unit_key(u) for u in new_units]
+    matches = align_units(a, b)
+    gaps = _gaps(matches, len(a), len(b))
+
+    # unités non alignées, numérotées par zone
+    todo_a = [i for i1, i2, _, _ in gaps for i in range(i1, i2)]
+    todo_b = [j for _, _, j1, j2 in gaps for j in range(j1, j2)]
+    gap_a = [g for g, (i1, i2, _, _) in enumerate(gaps) for _ in range(i1, i2)]
+    gap_b = [g for g, (_, _, j1, j2) in enumerate(gaps) for _ in range(j1, j2)]
+
+    pairs: List[Tuple[int, int]] = []
+    if todo_a and todo_b:
+        vecs = _embed_units(embedder, [old_units[i] for i in todo_a] + [new_units[j] for j in todo_b], batch_size)
+        A, B = vecs[:len(todo_a)], vecs[len(todo_a):]
+        rows_by_gap: Dict[int, List[int]] = {}
+        cols_by_gap: Dict[int, List[int]] = {}
+        for r, g in enumerate(gap_a):
+            rows_by_gap.setdefault(g, []).append(r)
+        for c, g in enumerate(gap_b):
+            cols_by_gap.setdefault(g, []).append(c)
+
+        def assign(candidates, used_r, used_c):
+            for _, r, c in sorted(candidates, reverse=True):
+                if r not in used_r and c not in used_c:
+                    used_r.add(r)
+                    used_c.add(c)
+                    pairs.append((todo_a[r], todo_b[c]))
+
+        used_r, used_c = set(), set()
+        local = []
+        for g, rows in rows_by_gap.items():
+            cols = [c for h in range(g - window, g + window + 1) for c in cols_by_gap.get(h, [])]
+            local.extend(_top_k_pairs(A, B, rows, cols, top_k, threshold))
+        assign(local, used_r, used_c)
+
+        rest_r = [r for r in range(len(todo_a)) if r not in used_r]
+        rest_c = [c for c in range(len(todo_b)) if c not in used_c]
+        if rest_r and rest_c and len(rest_r) * len(rest_c) <= SEMANTIC_MAX_CELLS:
+            assign(_top_k_pairs(A, B, rest_r, rest_c, top_k, threshold), used_r, used_c)
+
+    # ordre : une paire est "en place" si ses deux unités sont dans la même zone, et dans l'ordre (LIS)
+    gap_of_a = dict(zip(todo_a, gap_a))
+    gap_of_b = dict(zip(todo_b, gap_b))
+    same_gap = sorted(p for p in pairs if gap_of_a[p[0]] == gap_of_b[p[1]])
+    in_place = set()
+    by_gap: Dict[int, List[Tuple[int, int]]] = {}
+    for p in same_gap:
+        by_gap.setdefault(gap_of_a[p[0]], []).append(p)
+    for group in by_gap.values():
+        in_place.update(_longest_increasing(group))
+
+    unchanged = len(matches)
+    modified: List[Tuple[str, str, str]] = []
+    moves: List[Tuple[int, int]] = []
+    for i, j in sorted(pairs):
+        if (i, j) in in_place:
+            if a[i] == b[j]:
+                unchanged += 1
+            else:
+                modified.append((old_units[i], new_units[j], word_diff(old_units[i], new_units[j])))
+        else:
+            moves.append((i, j))
+            if a[i] != b[j]:
+                modified.append((old_units[i], new_units[j], word_diff(old_units[i], new_units[j])))
+
+    paired_a = {i for i, _ in pairs}
+    paired_b = {j for _, j in pairs}
+    return {
+        "added": [new_units[j] for j in todo_b if j not in paired_b],
+        "removed": [old_units[i] for i in todo_a if i not in paired_a],
+        "modified": modified,
+        "moved": _group_moves(moves, old_units),
+        "unchanged": unchanged,
+    }
+
+
+def compare_documents_semantic(text_old: str, text_new: str, embedder, **kwargs) -> Dict[str, list]:
+    """Compare deux textes complets en mode sémantique (voir compare_units_semantic)."""
+    return compare_units_semantic(split_units(text_old), split_units(text_new), embedder, **kwargs)
@@ -0,0 +1,268 @@
+# app/doc_processing.py
+"""
+Traitements LLM des documents longs (utilitaire documentaire).
+- découpage du texte extrait sur les frontières de pages puis de paragraphes
+- appels LLM parallèles avec un plafond de concurrence
+- résumé map-reduce hiérarchique (document complet, plus de troncature)
+- traduction par segments en parallèle, restituée dans l'ordre au fil de l'eau ;
+  un segment dont la traduction est tronquée (max_tokens atteint) est redécoupé et retraduit
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Nb max d'appels LLM simultanés (quota API Mistral)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Débit max d'appels LLM (appels/seconde, 0 = pas de limite)
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))
+# Taille max d'un segment envoyé au LLM (caractères)
+SEGMENT_MAX_CHARS = int(os.getenv("SEGMENT_MAX_CHARS", "6000"))
+# Segments plus courts pour la traduction (sortie ≈ entrée, bornée par max_tokens=500 du LLM :
+# ~1000 caractères français restent sous la limite, même vers l'allemand)
+TRANSLATION_MAX_CHARS = int(os.getenv("TRANSLATION_MAX_CHARS", "1000"))
+# En deçà, un segment tronqué n'est plus redécoupé (traduction partielle conservée)
+TRANSLATION_MIN_CHARS = 100
+
+_PAGE_BOUNDARY = re.compile(r"\n\s*\n(?=\[Page \d+\])")
+_PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[\.\!\?])\s+")
+
+ProgressCallback = Callable[[int, int, str], None]  # (terminés, total, étape)
+
+
+def _hard_split(text: str, max_chars: int) -> Iterator[str]:
+    """Dernier recours pour un paragraphe trop long : phrases, puis coupe franche."""
+    cur = ""
+    for sent in _SENTENCE_BOUNDARY.split(text):
+        while len(sent) > max_chars:
+            if cur:
+                yield cur
+                cur = ""
+            yield sent[:max_chars]
+            sent = sent[max_chars:]
+        if cur and len(cur) + 1 + len(sent) > max_chars:
+            yield cur
+            cur = sent
+        else:
+            cur = f"{cur} {sent}" if cur else sent
+    if cur:
+        yield cur
+
+
+def _units(text: str, max_chars: int) -> Iterator[str]:
+    """Pages entières si possible, sinon paragraphes, sinon phrases."""
+    for page in _PAGE_BOUNDARY.split(text):
+        if len(page) <= max_chars:
+            yield page
+            continue
+        for para in _PARAGRAPH_BOUNDARY.split(page):
+            if len(para) <= max_chars:
+                yield para
+            else:
+                yield from _hard_split(para, max_chars)
+
+
+def pack_texts(units, max_chars: int, sep: str = "\n\n") -> List[str]:
+    """Regroupe des unités consécutives en blocs de taille ≤ max_chars (ordre conservé)."""
+    blocks: List[str] = []
+    cur = ""
+    for unit in units:
+        unit = unit.strip()
+        if not unit:
+            continue
+        if cur and len(cur) + len(sep) + len(unit) > max_chars:
+            blocks.append(cur)
+            cur = unit
+        else:
+            cur = f"{cur}{sep}{unit}" if cur else unit
+    if cur:
+        blocks.append(cur)
+    return blocks
+
+
+def split_segments(text: str, max_chars: int = SEGMENT_MAX_CHARS) -> List[str]:
+    """Découpe le texte extrait en segments ≤ max_chars, sur frontières de pages / paragraphes."""
+    return pack_texts(_units(text, max_chars), max_chars)
+
+
+class RateLimiter:
+    """Espace les appels d'au moins 1/rate secondes (partagé entre threads). rate <= 0 : pas de limite."""
+
+    def __init__(self, rate_per_s: float = LLM_RATE_LIMIT):
+        self.interval = 1.0 / rate_per_s if rate_per_s and rate_per_s > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _invoke_message(llm, prompt: str, limiter: Optional[RateLimiter] = None):
+    if limiter is not None:
+        limiter.acquire()
+    return llm.invoke(prompt)
+
+
+def _invoke(llm, prompt: str, limiter: Optional[RateLimiter] = None) -> str:
+    out = _invoke_message(llm, prompt, limiter)
+    return getattr(out, "content", str(out))
+
+
+def _truncated(out) -> bool:
+    """Réponse coupée par max_tokens (finish_reason "length" dans les métadonnées LangChain)."""
+    meta = getattr(out, "response_metadata", None) or {}
+    return meta.get("finish_reason") in {"length", "max_tokens"}
+
+
+def run_prompts(
+    llm,
+    prompts: List[str],
+    max_workers: int = LLM_MAX_CONCURRENCY,
+    on_progress: Optional[ProgressCallback] = None,
+    stage: str = "",
+    limiter: Optional[RateLimiter] = None,
+) -> List[str]:
+    """
+    Exécute les prompts en parallèle (au plus max_workers appels simultanés, débit borné par limiter).
+    Retourne les réponses dans l'ordre des prompts ; on_progress est appelé
+    dans le thread appelant à chaque réponse reçue.
+    """
+    results: List[str] = [""] * len(prompts)
+    if not prompts:
+        return results
+    limiter = limiter or RateLimiter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+        futures = {pool.submit(_invoke, llm, p, limiter): i for i, p in enumerate(prompts)}
+        for done, fut in enumerate(as_completed(futures), start=1):
+            results[futures[fut]] = fut.result()
+            if on_progress:
+                on_progress(done, len(prompts), stage)
+    return results
+
+
+def summarize_map_reduce(
+    llm,
+    text: str,
+    length: str,
+    max_chars: int = SEGMENT_MAX_CHARS,
+    max_workers: int = LLM_MAX_CONCURRENCY,
+    on_progress: Optional[ProgressCallback] = None,
+) -> str:
+    """
+    Résumé du document complet :
+    1) map    : chaque segment est résumé (en parallèle)
+    2) reduce : les résumés partiels sont regroupés et re-résumés, niveau par niveau,
+                jusqu'à tenir dans un seul appel final à la longueur demandée.
+    """
+    segments = split_segments(text, max_chars)
+    final_prompt = "Fais un résumé {length} du document suivant :\n\n{content}\n\nRésumé :"
+
+    if len(segments) <= 1:
+        if on_progress:
+            on_progress(0, 1, "Résumé")
+        out = _invoke(llm, final_prompt.format(length=length, content=text))
+        if on_progress:
+            on_progress(1, 1, "Résumé")
+        return out
+
+    n = len(segments)
+    partials = run_prompts(
+        llm,
+        [
+            f"Voici la partie {i}/{n} d'un document. Résume-la fidèlement en conservant les exigences, "
+            f"références, chiffres et décisions importants.\n\n{seg}\n\nRésumé de la partie {i} :"
+            for i, seg in enumerate(segments, start=1)
+        ],
+        max_workers=max_workers,
+        on_progress=on_progress,
+        stage="Résumé des sections",
+    )
+
+    level = 1
+    while True:
+        groups = pack_texts(partials, max_chars)
+        if len(groups) == 1:
+            break
+        if len(groups) >= len(partials):  # résumés trop longs pour être regroupés : fusion 2 à 2
+            groups = ["\n\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+        level += 1
+        partials = run_prompts(
+            llm,
+            [
+                "Fusionne les résumés partiels suivants (parties consécutives d'un même document) "
+                f"en un résumé unique, sans perdre d'information importante.\n\n{g}\n\nRésumé fusionné :"
+                for g in groups
+            ],
+            max_workers=max_workers,
+            on_progress=on_progress,
+            stage=f"Fusion (niveau {level})",
+        )
+
+    if on_progress:
+        on_progress(0, 1, "Synthèse finale")
+    out = _invoke(
+        llm,
+        f"Voici les résumés successifs des parties d'un document. Fais-en un résumé {length} "
+        f"cohérent du document complet :\n\n{groups[0]}\n\nRésumé :",
+    )
+    if on_progress:
+        on_progress(1, 1, "Synthèse finale")
+    return out
+
+
+_TRANSLATION_PROMPT = (
+    "Traduis le texte suivant de {src} vers {tgt}. Réponds uniquement par la traduction, "
+    "en conservant la mise en forme et les marqueurs [Page N].\n\nTexte :\n{seg}\n\nTraduction :"
+)
+
+
+def _translate_segment(llm, seg: str, source_lang: str, target_lang: str,
+                       limiter: Optional[RateLimiter] = None) -> str:
+    """Traduit un segment ; tronqué par max_tokens → redécoupé en deux et retraduit partie par partie."""
+    out = _invoke_message(llm, _TRANSLATION_PROMPT.format(src=source_lang, tgt=target_lang, seg=seg), limiter)
+    text = getattr(out, "content", str(out))
+    if not _truncated(out) or len(seg) < 2 * TRANSLATION_MIN_CHARS:
+        return text
+    halves = split_segments(seg, max(TRANSLATION_MIN_CHARS, len(seg) // 2 + 1))
+    if len(halves) < 2:
+        return text
+    return "\n\n".join(_translate_segment(llm, h, source_lang, target_lang, limiter) for h in halves)
+
+
+def translate_stream(
+    llm,
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    max_chars: int = TRANSLATION_MAX_CHARS,
+    max_workers: int = LLM_MAX_CONCURRENCY,
+    rate_limit: float = LLM_RATE_LIMIT,
+) -> Iterator[Tuple[int, int, str]]:
+    """
+    Traduit le document complet, segment par segment, en parallèle sous limite de débit.
+    Produit (index, total, segment traduit) dans l'ordre du document, dès que le préfixe
+    correspondant est complet : le début de la traduction est disponible sans attendre la fin.
+    """
+    segments = split_segments(text, max_chars)
+    limiter = RateLimiter(rate_limit)
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(segments) or 1)))
+    try:
+        # soumis dans l'ordre : les premiers segments partent en premier
+        futures = [
+            pool.submit(_translate_segment, llm, seg, source_lang, target_lang, limiter)
+            for seg in segments
+        ]
+        for i, fut in enumerate(futures):
+            yield i, len(segments), fut.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
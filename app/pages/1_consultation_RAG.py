@@ -8,13 +8,11 @@ from typing import Optional
 from utils_docs import (
     hide_native_nav, custom_sidebar_nav, sidebar_system_status, require_login
 )
-from rag.elasticsearch_indexer import get_elastic_client, set_chunk_obsolete
 
 st.set_page_config(page_title="Consultation RAG — apsalIA", layout="wide")
 st.title("🔍 Consultation RAG")
 
 INDEX_NAME = os.getenv("ELASTICSEARCH_INDEX", "rfi_rag")
-es = get_elastic_client()
 
 # --- Bandeau gauche (menu custom) ---
 hide_native_nav()
@@ -24,6 +22,14 @@ require_login()  # accès protégé (mot de passe)
 
 
 # ---------- Helpers ----------
+def _get_es():
+    """Client Elasticsearch créé à la demande (uniquement pour les actions qui en ont besoin)."""
+    if st.session_state.get("es_client") is None:
+        from rag.elasticsearch_indexer import get_elastic_client
+        st.session_state.es_client = get_elastic_client()
+    return st.session_state.es_client
+
+
 def get_native_file_path(meta: dict) -> Optional[Path]:
     """
     Récupère le chemin vers le fichier natif en essayant plusieurs stratégies :
@@ -180,7 +186,8 @@ def render_answer_block(question: str, answer_text: str, hit, idx: int):
                 disabled = chunk_id is None
                 if st.button("🚫 Marquer ce chunk comme obsolète", key=f"obsolete_{idx}", disabled=disabled):
                     try:
-                        set_chunk_obsolete(es, INDEX_NAME, chunk_id, True)
+                        from rag.elasticsearch_indexer import set_chunk_obsolete
+                        set_chunk_obsolete(_get_es(), INDEX_NAME, chunk_id, True)
                         st.success("Chunk marqué obsolète. Les prochaines recherches l’excluront.")
                         st.rerun()
                     except Exception as e:
@@ -242,6 +249,26 @@ if result:
     st.subheader("💡 Réponse :")
     st.write(result.get("answer", "").strip())
 
+    timings = result.get("timings") or {}
+    if timings:
+        with st.expander("⏱️ Temps par étape"):
+            labels = {
+                "embedding_ms": "Embedding de la question",
+                "es_client_ms": "Recherche ES (client)",
+                "es_took_ms": "Recherche ES (serveur, took)",
+                "rerank_ms": "Reranking",
+                "context_ms": "Formatage du contexte",
+                "llm_ttft_ms": "LLM — premier token",
+                "llm_total_ms": "LLM — génération complète",
+                "total_ms": "Total",
+            }
+            st.table([{"Étape": label, "ms": timings[key]} for key, label in labels.items()
+                      if timings.get(key) is not None])
+            if timings.get("prompt_tokens") is not None:
+                st.caption(f"Tokens : {timings['prompt_tokens']} (prompt) / {timings.get('response_tokens')} (réponse)")
+            if result.get("correlation_id"):
+                st.caption(f"Identifiant de corrélation (journaux) : `{result['correlation_id']}`")
+
     st.subheader("📋 TOP 3 - Texte exact des meilleures réponses :")
     src_docs = result.get("source_documents") or []
     for i, doc in enumerate(src_docs[:3]):
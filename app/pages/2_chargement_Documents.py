@@ -19,34 +19,21 @@ from utils_docs import (
     require_login,
 )
 
-# ES & RAG
-from rag.elasticsearch_indexer import (
-    get_elastic_client,
-    get_index_stats,
-    create_index_if_not_exists,
-    index_documents_bulk,
-)
-from rag.doc_loader import detect_columns, create_smart_chunks_from_detected,KEYWORDS_BESOIN, KEYWORDS_REPONSE
-
 # éviter les KeyError au premier affichage
 if "custom_keywords_besoin" not in st.session_state:
     st.session_state.custom_keywords_besoin = []
 if "custom_keywords_reponse" not in st.session_state:
     st.session_state.custom_keywords_reponse = []
 
-from rag.embeddings import get_embedding_model      
-
-# --- Connexion Elasticsearch ---
-es = get_elastic_client()
 
-# --- Nom d'index (défini par variable d'env ou valeur par défaut) ---
-INDEX_NAME = os.getenv("ELASTICSEARCH_INDEX", "rfi_rag")
+def _get_embedding_model():
+    """Modèle d'embeddings chargé à la demande (une fois par session), jamais pour un visiteur non connecté."""
+    if st.session_state.get("embedding_model") is None:
+        from rag.embeddings import get_embedding_model
+        st.session_state.embedding_model = get_embedding_model()
+    return st.session_state.embedding_model
 
 
-# --- Embedding model (chargé une fois en session) ---
-if "embedding_model" not in st.session_state:
-    st.session_state.embedding_model = get_embedding_model()
-embedding_model = st.session_state.embedding_model
 # ────────────────────────────────────────────────────────────────────────────────
 # Page setup & nav
 # ────────────────────────────────────────────────────────────────────────────────
@@ -55,6 +42,15 @@ custom_sidebar_nav(active="Chargement & Indexation")
 sidebar_system_status()
 require_login()
 
+# ES & RAG — importés après l'authentification (langchain n'est pas chargé pour le formulaire de login)
+from rag.elasticsearch_indexer import (
+    get_elastic_client,
+    get_index_stats,
+    create_index_if_not_exists,
+    index_documents_bulk,
+)
+from rag.doc_loader import detect_columns, create_smart_chunks_from_detected, KEYWORDS_BESOIN, KEYWORDS_REPONSE
+
 st.set_page_config(page_title="Chargement & Indexation — apsalIA", layout="wide")
 st.title("📥 Chargement & Indexation")
 
@@ -282,7 +278,7 @@ if st.button("🚀 Lancer le chargement & l’indexation", type="primary"):
             try:
                 st.caption(f"🔎 Indexation dans **{INDEX_NAME}** de {len(file_chunks)} chunks…")
                 # Embeddings des chunks du fichier
-                vectors = embedding_model.embed_documents([d.page_content for d in file_chunks]) 
+                vectors = _get_embedding_model().embed_documents([d.page_content for d in file_chunks]) 
                 # Indexation ES 
                 index_documents_bulk(es, file_chunks, vectors, INDEX_NAME)  # NEW
                 total_chunks += len(file_chunks)
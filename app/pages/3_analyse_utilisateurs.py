@@ -1,20 +1,12 @@
 # app/pages/4_analyse_utilisateurs.py
 import io
 import os
+import zipfile
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import matplotlib.pyplot as plt
 import numpy as np
 
 from utils_docs import hide_native_nav, custom_sidebar_nav, sidebar_system_status, require_login
-from analytics.user_behavior import (
-    load_logs_df, compute_ratios, aggregate_by_application,
-    auto_k_elbow, cluster_with_k, cluster_centers_mean,
-    modules_by_application
-)
-
-from analytics.user_behavior import user_active_days_total, top_users_by_days, low_engagement_users
 
 
 # --- Page setup & chrome ---
@@ -24,6 +16,132 @@ custom_sidebar_nav()
 require_login()
 sidebar_system_status()
 
+# Imports lourds (plotly, analytics) seulement une fois l'utilisateur connecté
+import plotly.express as px
+from analytics.user_behavior import (
+    load_logs_cached, file_sha256, compute_ratios, aggregate_by_application,
+    auto_k_elbow, cluster_with_k, cluster_centers_mean, cluster_all_applications,
+    modules_by_application
+)
+
+from analytics.user_behavior import top_users_by_days, low_engagement_users
+from analytics.store import AnalyticsStore
+from analytics.engagement import (
+    compute_engagement, active_days_histogram, active_days_quantile_profile, active_days_slice,
+)
+from analytics.batch import INTRA_MIN_MODULES, INTRA_MIN_USERS, load_batch
+
+# Résultats d'analyse mémorisés entre reruns et sessions, clé = sha256 de l'export (+ application, K).
+# Les gros objets (DataFrames, modèles) sont passés en arguments "_" : non hachés par Streamlit.
+ANALYTICS_CACHE_ENTRIES = int(os.getenv("ANALYTICS_CACHE_ENTRIES", "32"))
+GLOBAL = ""  # clé "application" du clustering global
+# Graphique jours actifs : une barre par user jusqu'à ce seuil, agrégats serveur au-delà
+ACTIVE_DAYS_CHART_MAX_USERS = int(os.getenv("ACTIVE_DAYS_CHART_MAX_USERS", "2000"))
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _profiles(logs_sha: str, _df: pd.DataFrame):
+    df_profiles = compute_ratios(_df)                               # colonnes = (Application, Module)
+    return df_profiles, aggregate_by_application(df_profiles)      # colonnes = Applications (agrégé)
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _batch(logs_sha: str):
+    """Résultats pré-calculés par `python -m analytics.batch` pour ces données, sinon None."""
+    return load_batch(logs_sha)
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _all_applications(logs_sha: str, _df_profiles: pd.DataFrame):
+    """Clustering intra-application de toutes les applications éligibles, en une passe parallèle."""
+    batch = _batch(logs_sha)
+    if batch is not None:
+        return batch.applications(_df_profiles)
+    return cluster_all_applications(_df_profiles, k_max=10, min_users=INTRA_MIN_USERS, min_modules=INTRA_MIN_MODULES)
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _all_applications_zip(logs_sha: str, _results) -> bytes:
+    """Export de toutes les applications (K auto) : labels combinés + labels et centres par application."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        combined = pd.concat(
+            [pd.DataFrame({"User ID": res.df_labeled.index.astype(str), "Application": app,
+                           "cluster": res.df_labeled["cluster"].to_numpy()})
+             for app, res in _results.items()],
+            ignore_index=True,
+        ) if _results else pd.DataFrame(columns=["User ID", "Application", "cluster"])
+        zf.writestr("clusters_users_applications.csv", combined.to_csv(index=False))
+        for app, res in _results.items():
+            labels = res.df_labeled.reset_index().rename(columns={"index": "User ID"})
+            centers = res.centers.copy()
+            centers.index.name = "Cluster"
+            zf.writestr(f"{app}/clusters_users.csv", labels.to_csv(index=False))
+            zf.writestr(f"{app}/centres.csv", centers.to_csv())
+    return buf.getvalue()
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _elbow(logs_sha: str, app: str, k_max: int, _X):
+    batch = _batch(logs_sha)
+    result = batch.elbow(app) if batch is not None else None
+    return result or auto_k_elbow(_X, k_min=1, k_max=k_max)
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _clusters(logs_sha: str, app: str, k: int, _X, _models):
+    df_labeled, _ = cluster_with_k(_X, k, models=_models)
+    centers = cluster_centers_mean(df_labeled).copy()
+    centers.index.name = "Cluster"
+    labels_csv = df_labeled.reset_index().rename(columns={"index": "User ID"}).to_csv(index=False)
+    return df_labeled, centers, labels_csv
+
+
+@st.cache_resource(max_entries=ANALYTICS_CACHE_ENTRIES, show_spinner=False)
+def _engagement(logs_sha: str, _df: pd.DataFrame):
+    """Jours actifs distincts, DAU/WAU/MAU glissants et niveaux mensuels, en une passe."""
+    batch = _batch(logs_sha)
+    if batch is not None:
+        return batch.engagement()
+    return compute_engagement(_df, period="M")
+
+
+def _centers_heatmap(centers: pd.DataFrame, x_label: str, title: str | None = None):
+    fig = px.imshow(
+        centers,
+        aspect="auto",
+        labels=dict(x=x_label, y="Cluster", color="Proportion d’activité"),
+        color_continuous_scale="Blues",
+        text_auto=".2f",
+        zmin=0, zmax=1,
+    )
+    fig.update_yaxes(
+        tickmode="array",
+        tickvals=list(range(len(centers.index))),
+        ticktext=[str(i) for i in centers.index],
+    )
+    fig.update_layout(
+        height=300 + 30 * len(centers.index),
+        margin=dict(l=40, r=40, t=40, b=40),
+    )
+    if title:
+        fig.update_layout(title_text=title)
+    return fig
+
+
+def _cluster_sizes_table(df_labeled: pd.DataFrame, caption: str) -> None:
+    sizes = df_labeled["cluster"].value_counts().sort_index()
+    st.caption(caption)
+    tbl = sizes.to_frame("Users").reset_index().rename(columns={"index": "Cluster", "cluster": "Cluster"})
+    st.dataframe(
+        tbl, use_container_width=True, hide_index=True,
+        column_config={
+            "Cluster": st.column_config.NumberColumn(format="%d", width="small"),
+            "Users":   st.column_config.NumberColumn(format="%d", width="small"),
+        },
+    )
+
+
 st.title(" Analyse du comportement utilisateur dans MasterControl")
 
 st.markdown(
@@ -65,34 +183,78 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
-uploaded = st.file_uploader(
-    "Dépose l’export CSV",
-    type=["csv"],
-    label_visibility="collapsed"  
+source = st.radio(
+    "Source des logs :",
+    ["Export CSV", "Base historique"],
+    horizontal=True,
+    key="logs_source",
+    help="Base historique : exports déjà intégrés (agrégats incrémentaux, pas de ré-import de l'historique)",
 )
-if not uploaded:
-    st.info("Charge un CSV pour continuer.")
-    st.stop()
 
-# --- Chargement du CSV ---
-try:
-    df = load_logs_df(uploaded)
-except Exception as e:
-    st.error(f"Erreur de chargement: {e}")
-    st.stop()
+if source == "Base historique":
+    # Agrégats incrémentaux : comptes (User, Application, Module) + couples (User, Date) distincts
+    store = AnalyticsStore()
+    ingested = store.ingested()
+    if not ingested:
+        st.info("La base historique est vide : intégrez un export CSV (bouton ci-dessous après import, ou `python -m analytics.store ingest`).")
+        st.stop()
+    logs_sha = store.fingerprint()
+    cached = st.session_state.get("store_cache")
+    if cached is None or cached["sha"] != logs_sha:
+        with st.spinner("Lecture de la base historique…"):
+            st.session_state.store_cache = {"sha": logs_sha, "df": store.counts(), "days": store.active_days()}
+    df, df_days = st.session_state.store_cache["df"], st.session_state.store_cache["days"]
+    st.caption(f"📦 {len(ingested)} export(s) intégré(s) — dernier : {ingested[-1]['name']}")
+else:
+    uploaded = st.file_uploader(
+        "Dépose l’export CSV",
+        type=["csv"],
+        label_visibility="collapsed"  
+    )
+    if not uploaded:
+        st.info("Charge un CSV pour continuer.")
+        st.stop()
+
+    # --- Chargement du CSV ---
+    # Parsing une seule fois par export : DataFrame gardé en session pour les reruns (widgets),
+    # cache Parquet (clé sha256) pour les nouvelles sessions / rechargements de page.
+    try:
+        cached = st.session_state.get("logs_cache")
+        if cached is None or cached["file_id"] != uploaded.file_id:
+            with st.spinner("Lecture des logs…"):
+                df, logs_sha = load_logs_cached(uploaded, sha=file_sha256(uploaded), on_warning=st.warning)
+            st.session_state.logs_cache = {"file_id": uploaded.file_id, "sha": logs_sha, "df": df}
+        else:
+            df, logs_sha = cached["df"], cached["sha"]
+    except Exception as e:
+        st.error(f"Erreur de chargement: {e}")
+        st.stop()
+    df_days = df
+
+    if st.button("➕ Intégrer cet export à la base historique"):
+        with st.spinner("Intégration incrémentale…"):
+            entry = AnalyticsStore().ingest(uploaded, sha=logs_sha, logs=df)  # export déjà lu : pas de second parsing
+        if entry["new"]:
+            st.success(f"✅ Export intégré ({entry['rows']} lignes, {entry['date_min']} → {entry['date_max']}).")
+            if entry["rows_skipped"]:
+                st.warning(f"{entry['rows_skipped']} lignes ignorées : actions déjà comptées par un export intégré.")
+        else:
+            st.info("Cet export est déjà dans la base historique.")
+
+if _batch(logs_sha) is not None:
+    st.caption(f"⚡ Résultats pré-calculés (batch du {_batch(logs_sha).manifest['created_at']}) chargés pour ces données.")
 
 with st.expander("Aperçu des données (5 lignes)"):
     st.dataframe(df.head(), use_container_width=True)
 
 # --- Période couverte ---
-date_min = df["Date"].min()
-date_max = df["Date"].max()
+date_min = df_days["Date"].min().date()
+date_max = df_days["Date"].max().date()
 
 
 # --- Calcule des Ratios par (Application, Module) puis agrégation par Application 
 with st.spinner("Calcul des ratios par utilisateur…"):
-    df_profiles = compute_ratios(df)                   # colonnes = (Application, Module)
-    ratios_app = aggregate_by_application(df_profiles) # colonnes = Applications (agrégé)
+    df_profiles, ratios_app = _profiles(logs_sha, df)
 
 st.success(
     f"📅 Données disponibles du **{date_min}** au **{date_max}**\n\n"
@@ -114,7 +276,7 @@ même si la courbe propose une autre valeur.
 
 # --- K automatique (Elbow 1→10) ---
 with st.spinner("Méthode du coude (distorsion) sur les applications…"):
-    k_auto, viz = auto_k_elbow(ratios_app, k_min=1, k_max=10)
+    k_auto, viz = _elbow(logs_sha, GLOBAL, 10, ratios_app)
 
 # Courbe du coude + K détecté à gauche
 col1, col2 = st.columns([0.5, 0.5])
@@ -122,283 +284,186 @@ with col1:
     st.success(f"K détecté (intra-app) : **{k_auto}**")
     st.pyplot(viz.fig, use_container_width=True)
 
-# --- Clustering initial avec K auto (pas de message 'clustering terminé') ---
-with st.spinner(f"Clustering KMeans (K={int(k_auto)})…"):
-    df_app_labeled, labels = cluster_with_k(ratios_app, int(k_auto))
-
-# --- Heatmap centres (résultat avec K auto) ---
-st.subheader("Profils moyens par cluster (Applications)")
-centers = cluster_centers_mean(df_app_labeled)
-centers_plot = centers.copy()
-centers_plot.index.name = "Cluster"
-
-fig_hm = px.imshow(
-    centers_plot,
-    aspect="auto",
-    labels=dict(x="Application", y="Cluster", color="Proportion d’activité"),
-    color_continuous_scale="Blues",
-    text_auto=".2f",
-    zmin=0, zmax=1,
-)
-fig_hm.update_yaxes(
-    tickmode="array",
-    tickvals=list(range(len(centers_plot.index))),
-    ticktext=[str(i) for i in centers_plot.index],
-)
-fig_hm.update_layout(
-    height=300 + 30 * len(centers_plot.index),
-    margin=dict(l=40, r=40, t=40, b=40),
-)
-st.plotly_chart(fig_hm, use_container_width=True)
 
-# --- Réglage manuel de K (SOUS la heatmap) ---
-# --- Colonnage pour les étapes de réglage/lecture ---
-col_left, col_right = st.columns([0.5, 0.5])
+# Fragment : changer K ne relance que cette section (pas le chargement, les ratios ni le coude)
+@st.fragment
+def global_clustering_section() -> None:
+    # --- Clustering initial avec K auto (pas de message 'clustering terminé') ---
+    with st.spinner(f"Clustering KMeans (K={int(k_auto)})…"):
+        df_app_labeled, centers_plot, labels_csv = _clusters(logs_sha, GLOBAL, int(k_auto), ratios_app, viz.models)
 
-with col_left:
-    # 1) K manuel — UN SEUL number_input
-    n_users = ratios_app.shape[0]
-    k_upper = max(2, min(10, n_users - 1))
-    k_default = min(max(2, int(k_auto)), k_upper)
-
-    k_use = st.number_input(
-        "Modifier le nombre de clusters (K) si besoin :",
-        min_value=2, max_value=k_upper, value=k_default, step=1,
-        key="global_kmanual",
-    )
+    # --- Heatmap centres (résultat avec K auto) ---
+    st.subheader("Profils moyens par cluster (Applications)")
+    fig_hm = _centers_heatmap(centers_plot, "Application")
+    st.plotly_chart(fig_hm, use_container_width=True)
 
-    # ⬇️ Recalcule si K change (et met à jour centers_plot + fig_hm pour l’export)
-    if int(k_use) != int(k_auto):
-        df_app_labeled, labels = cluster_with_k(ratios_app, int(k_use))
-        centers = cluster_centers_mean(df_app_labeled)
-        centers_plot = centers.copy()
-        centers_plot.index.name = "Cluster"
-
-        fig_hm = px.imshow(
-            centers_plot,
-            aspect="auto",
-            labels=dict(x="Application", y="Cluster", color="Proportion d’activité"),
-            color_continuous_scale="Blues",
-            text_auto=".2f",
-            zmin=0, zmax=1,
-        )
-        fig_hm.update_yaxes(
-            tickmode="array",
-            tickvals=list(range(len(centers_plot.index))),
-            ticktext=[str(i) for i in centers_plot.index],
-        )
-        fig_hm.update_layout(
-            height=300 + 30 * len(centers_plot.index),
-            margin=dict(l=40, r=40, t=40, b=40),
+    # --- Réglage manuel de K (SOUS la heatmap) ---
+    col_left, col_right = st.columns([0.5, 0.5])
+
+    with col_left:
+        # 1) K manuel — UN SEUL number_input
+        n_users = ratios_app.shape[0]
+        k_upper = max(2, min(10, n_users - 1))
+        k_default = min(max(2, int(k_auto)), k_upper)
+
+        k_use = st.number_input(
+            "Modifier le nombre de clusters (K) si besoin :",
+            min_value=2, max_value=k_upper, value=k_default, step=1,
+            key="global_kmanual",
         )
-        st.plotly_chart(fig_hm, use_container_width=True)
 
-    # 2) Taille des clusters (Application)
-    sizes_global = df_app_labeled["cluster"].value_counts().sort_index()
-    st.caption("Taille des clusters (Application)")
-    tbl = sizes_global.to_frame("Users").reset_index().rename(columns={"index": "Cluster"})
-    st.dataframe(
-        tbl, use_container_width=True, hide_index=True,
-        column_config={
-            "Cluster": st.column_config.NumberColumn(format="%d", width="small"),
-            "Users":   st.column_config.NumberColumn(format="%d", width="small"),
-        },
-    )
+        # ⬇️ Recalcule si K change (et met à jour centers_plot + fig_hm pour l’export)
+        if int(k_use) != int(k_auto):
+            df_app_labeled, centers_plot, labels_csv = _clusters(logs_sha, GLOBAL, int(k_use), ratios_app, viz.models)
+            fig_hm = _centers_heatmap(centers_plot, "Application")
+            st.plotly_chart(fig_hm, use_container_width=True)
+
+        # 2) Taille des clusters (Application)
+        _cluster_sizes_table(df_app_labeled, "Taille des clusters (Application)")
 
-    # 3) Tableau des centres (ratios moyens)
-    with st.expander("Tableau des centres (ratios moyens)"):
-        st.dataframe(centers_plot, use_container_width=True)
+        # 3) Tableau des centres (ratios moyens)
+        with st.expander("Tableau des centres (ratios moyens)"):
+            st.dataframe(centers_plot, use_container_width=True)
 
-with col_right:
-    # ( laisser vide )
-    pass
+    # --- Export ---
+    st.subheader("Exports")
+    st.download_button(
+        "📥 Télécharger les labels par user (CSV)",
+        data=labels_csv,
+        file_name="clusters_users.csv",
+        mime="text/csv"
+    )
 
+    # --- Export heatmap Application (HTML ) -------------------------------------------------------
+    html_str = fig_hm.to_html(full_html=False, include_plotlyjs="cdn")
+    st.download_button(
+        "📥 Exporter la heatmap (HTML)",
+        data=html_str,
+        file_name="heatmap_clusters.html",
+        mime="text/html",
+        key="dl_hm_html",
+    )
+    st.caption("ℹ️ L’export correspond à la dernière heatmap affichée (K automatique ou K manuel).")
 
-# --- Export ---
-st.subheader("Exports")
-buf_csv = io.StringIO()
-df_app_labeled.reset_index().rename(columns={"index": "User ID"}).to_csv(buf_csv, index=False)
-st.download_button(
-    "📥 Télécharger les labels par user (CSV)",
-    data=buf_csv.getvalue(),
-    file_name="clusters_users.csv",
-    mime="text/csv"
-)
 
-# --- Export heatmap Application (HTML ) -------------------------------------------------------
-html_str = fig_hm.to_html(full_html=False, include_plotlyjs="cdn")
-st.download_button(
-    "📥 Exporter la heatmap (HTML)",
-    data=html_str,
-    file_name="heatmap_clusters.html",
-    mime="text/html",
-    key="dl_hm_html",
-)
-st.caption("ℹ️ L’export correspond à la dernière heatmap affichée (K automatique ou K manuel).")
+global_clustering_section()
 
 #------------------------------------------------------------------------------------------------------------------------------------------#
 st.header("🔬 Clustering intra-application (modules)")
 #------------------------------------------------------------------------------------------------------------------------------------------#
 
-# ── Option : analyse intra-application (par modules)----------------------------------------------
-choice_intra = st.radio(
-    "Voulez-vous analyser une application en détail ?",
-    options=["Non", "Oui"],
-    index=0,
-    horizontal=True,
-    key="intra_toggle"
-)
 
-if choice_intra == "Oui":
+@st.fragment
+def intra_app_section() -> None:
+    # ── Option : analyse intra-application (par modules)----------------------------------------------
+    choice_intra = st.radio(
+        "Voulez-vous analyser une application en détail ?",
+        options=["Non", "Oui"],
+        index=0,
+        horizontal=True,
+        key="intra_toggle"
+    )
+    if choice_intra != "Oui":
+        st.caption("Activez l’analyse intra-application pour explorer les modules d’une application précise.")
+        return
+
+    # Toutes les applications calculées une fois (coude + K auto) : changer d’appli est immédiat
+    with st.spinner("Clustering intra-application de toutes les applications…"):
+        all_apps = _all_applications(logs_sha, df_profiles)
+
     # Choix de l’appli à zoomer--------------------------------------------------------------------
     apps = sorted({lvl0 for (lvl0, lvl1) in df_profiles.columns})
     app = st.selectbox("Application à analyser :", apps, key="intra_app_selector")
 
-    # Sous-matrice modules de l’appli choisie-------------------------------------------------------
-    df_app_mod = df_profiles[app].copy()
-    df_app_mod = df_app_mod.loc[df_app_mod.sum(axis=1) > 0, :]
-    df_app_mod = df_app_mod.loc[:, df_app_mod.sum(axis=0) > 0]
+    # PAs d'analyse si moins de 20 users ou 2 modules actifs -----------------------------------------
+    res_app = all_apps.get(app)
+    if res_app is None:
+        st.warning(f"Pas assez de signal sur cette application (moins de {INTRA_MIN_USERS} utilisateurs "
+                   f"ou moins de {INTRA_MIN_MODULES} modules actifs).")
+        return
 
-    # PAs d'analyse si moins de 2 colonnes-----------------------------------------------------------
-    if df_app_mod.empty or df_app_mod.shape[0] < 20 or df_app_mod.shape[1] < 2:
-        st.warning("Pas assez de signal sur cette application (moins de 20 utilisateurs ou moins de 2 modules actifs).")
-        st.stop()
-
-    # Coude auto 1→10 (borné) puis layout 2 colonnes
+    # Sous-matrice modules de l’appli choisie, coude auto 1→10 (borné) puis layout 2 colonnes
+    df_app_mod = res_app.matrix
     n_users = df_app_mod.shape[0]
     k_max_intra = min(10, max(2, n_users - 1))
-    with st.spinner("Méthode du coude (distorsion) sur l’application…"):
-        k_auto_intra, viz_intra = auto_k_elbow(df_app_mod, k_min=1, k_max=k_max_intra)
+    k_auto_intra, viz_intra = res_app.k_auto, res_app.viz
 
     col1, col2 = st.columns([0.5, 0.5])
     with col1:
         st.success(f"K détecté (intra-app) : **{k_auto_intra}**")
         st.pyplot(viz_intra.fig, use_container_width=True)
 
-# --- Clustering initial avec K auto ---
+    # --- Clustering initial avec K auto ---
     with st.spinner(f"Clustering KMeans (K={int(k_auto_intra)})…"):
-        df_app_mod_labeled, labels_intra = cluster_with_k(df_app_mod, int(k_auto_intra))
-
-    centers_intra = cluster_centers_mean(df_app_mod_labeled).copy()
-    centers_intra.index.name = "Cluster"
+        df_app_mod_labeled, centers_intra, labels_csv_intra = _clusters(
+            logs_sha, app, int(k_auto_intra), df_app_mod, viz_intra.models
+        )
 
-    import plotly.express as px
-    fig_hm_intra = px.imshow(
-        centers_intra,
-        aspect="auto",
-        labels=dict(x="Module", y="Cluster", color="Proportion d’activité"),
-        color_continuous_scale="Blues",
-        text_auto=".2f", zmin=0, zmax=1,
-)
-    fig_hm_intra.update_yaxes(
-        tickmode="array",
-        tickvals=list(range(len(centers_intra.index))),
-        ticktext=[str(i) for i in centers_intra.index],
-)
-    fig_hm_intra.update_layout(
-        height=300 + 30 * len(centers_intra.index),
-        margin=dict(l=40, r=40, t=40, b=40),
-        title_text=f"Profils moyens par module — {app}",
-)
+    fig_hm_intra = _centers_heatmap(centers_intra, "Module", f"Profils moyens par module — {app}")
     st.plotly_chart(fig_hm_intra, use_container_width=True)
 
-# --- Réglage manuel de K (SOUS la heatmap) ---
+    # --- Réglage manuel de K (SOUS la heatmap) ---
     col_left_intra, col_right_intra = st.columns([0.5, 0.5])
 
     with col_left_intra:
-    # 1) K manuel — UN SEUL number_input (intra)
+        # 1) K manuel — UN SEUL number_input (intra)
         k_default_intra = min(max(2, int(k_auto_intra)), k_max_intra)
         k_use_intra = st.number_input(
             "Modifier le nombre de clusters (K) si besoin (intra-app) :",
             min_value=2, max_value=k_max_intra, value=k_default_intra, step=1,
             key=f"intra_kmanual_{app}",  # clé unique par application
-    )
+        )
 
         # ⬇️ Recalcule si K change (et met à jour centers_intra + fig_hm_intra pour l’export)
         if int(k_use_intra) != int(k_auto_intra):
-            df_app_mod_labeled, labels_intra = cluster_with_k(df_app_mod, int(k_use_intra))
-            centers_intra = cluster_centers_mean(df_app_mod_labeled).copy()
-            centers_intra.index.name = "Cluster"
-
-            import plotly.express as px
-            fig_hm_intra = px.imshow(
-                centers_intra,
-                aspect="auto",
-                labels=dict(x="Module", y="Cluster", color="Proportion d’activité"),
-                color_continuous_scale="Blues",
-                text_auto=".2f", zmin=0, zmax=1,
-        )
-            fig_hm_intra.update_yaxes(
-                tickmode="array",
-                tickvals=list(range(len(centers_intra.index))),
-                ticktext=[str(i) for i in centers_intra.index],
-        )
-            fig_hm_intra.update_layout(
-                height=300 + 30 * len(centers_intra.index),
-                margin=dict(l=40, r=40, t=40, b=40),
-                title_text=f"Profils moyens par module — {app} (K={int(k_use_intra)})",
-        )
+            df_app_mod_labeled, centers_intra, labels_csv_intra = _clusters(
+                logs_sha, app, int(k_use_intra), df_app_mod, viz_intra.models
+            )
+            fig_hm_intra = _centers_heatmap(
+                centers_intra, "Module", f"Profils moyens par module — {app} (K={int(k_use_intra)})"
+            )
             st.plotly_chart(fig_hm_intra, use_container_width=True)
 
-    # 2) Taille des clusters (module)
-        sizes_intra = df_app_mod_labeled["cluster"].value_counts().sort_index()
-        st.caption("Taille des clusters (module)")
-        tbl_intra = sizes_intra.to_frame("Users").reset_index().rename(columns={"index": "Cluster"})
-        st.dataframe(
-            tbl_intra,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "Cluster": st.column_config.NumberColumn(format="%d", width="small"),
-                "Users":   st.column_config.NumberColumn(format="%d", width="small"),
-        },
-    )
+        # 2) Taille des clusters (module)
+        _cluster_sizes_table(df_app_mod_labeled, "Taille des clusters (module)")
 
-    # 3) Tableau des centres (ratios moyens) — intra
+        # 3) Tableau des centres (ratios moyens) — intra
         with st.expander("Tableau des centres (ratios moyens) — intra-app"):
             st.dataframe(centers_intra, use_container_width=True)
 
-    with col_right:
-     # (laisser vide )
-        pass
-
-
-# --- Export ---
+    # --- Export ---
     st.subheader("Exports")
-    buf_csv_intra = io.StringIO()
-    df_app_mod_labeled.reset_index().rename(columns={"index": "User ID"}).to_csv(buf_csv_intra, index=False)
     st.download_button(
         "📥 Télécharger les labels par user (CSV)",
-        data=buf_csv_intra.getvalue(),
+        data=labels_csv_intra,
         file_name=f"clusters_users_{app}.csv",
         mime="text/csv",
         key=f"dl_labels_intra_csv_{app}",
-)
+    )
 
-# --- Export heatmap Application (HTML ) -------------------------------------------------------
+    # --- Export heatmap Application (HTML ) -------------------------------------------------------
     html_str = fig_hm_intra.to_html(full_html=False, include_plotlyjs="cdn")
     st.download_button(
         "📥 Exporter la heatmap (HTML)",
         data=html_str,
-        file_name="heatmap_clusters.html",
+        file_name=f"heatmap_clusters_{app}.html",
         mime="text/html",
-        key="dl_hm_html_global", 
-)
+        key=f"dl_hm_html_intra_{app}",
+    )
     st.caption("ℹ️ L’export correspond à la dernière heatmap affichée (K automatique ou K manuel).")
 
+    # --- Export toutes applications (K auto) ---
+    st.download_button(
+        f"📦 Exporter les clusters de toutes les applications ({len(all_apps)}, ZIP)",
+        data=_all_applications_zip(logs_sha, all_apps),
+        file_name="clusters_applications.zip",
+        mime="application/zip",
+        key="dl_intra_all_zip",
+    )
 
 
-else:
-    st.caption("Activez l’analyse intra-application pour explorer les modules d’une application précise.")
-
-
-
-
-
-
+intra_app_section()
 
-#-----------------------------------------------------------------------------------------------------------------------------------#
-from analytics.user_behavior import user_active_days_total, top_users_by_days, low_engagement_users
 #-----------------------------------------------------------------------------------------------------------------------------------#
 # --- Résumé méthodologique pour l'analyse par connexions ---
 st.markdown(
@@ -433,25 +498,96 @@ st.markdown(
 )
 
 
-s_days = user_active_days_total(df)  # df = CSV brut déjà chargé plus haut
 
-# Bar chart : TOUS les users, triés, sans étiquettes X
-plot_data = s_days.reset_index()
-plot_data.columns = ["User ID", "Distinct active days"]  # s_days est déjà trié décroissant
+engagement = _engagement(logs_sha, df_days)  # CSV brut, ou couples (User, Date) de la base historique
+s_days = engagement.active_days
 
-fig_days = px.bar(
-    plot_data,
-    x="User ID",
-    y="Distinct active days",
-    title="Jours actifs distincts par utilisateur (tous les users, tri décroissant)",
-    labels={"User ID": "User", "Distinct active days": "Jours actifs"}
-)
-fig_days.update_xaxes(showticklabels=False)  # masque toutes les étiquettes X
-fig_days.update_layout(bargap=0.2)
-#  hover pour lire l’ID + valeur
-fig_days.update_traces(hovertemplate="User: %{x}<br>Jours actifs: %{y}<extra></extra>")
+def _active_days_bars(s_part: pd.Series, title: str):
+    """Bar chart par utilisateur (trié, sans étiquettes X)."""
+    plot_data = s_part.reset_index()
+    plot_data.columns = ["User ID", "Distinct active days"]  # s_days est déjà trié décroissant
+
+    fig = px.bar(
+        plot_data,
+        x="User ID",
+        y="Distinct active days",
+        title=title,
+        labels={"User ID": "User", "Distinct active days": "Jours actifs"}
+    )
+    fig.update_xaxes(showticklabels=False)  # masque toutes les étiquettes X
+    fig.update_layout(bargap=0.2)
+    #  hover pour lire l’ID + valeur
+    fig.update_traces(hovertemplate="User: %{x}<br>Jours actifs: %{y}<extra></extra>")
+    return fig
+
+
+# Au-delà de ACTIVE_DAYS_CHART_MAX_USERS : agrégats calculés côté serveur (taille constante),
+# détail par utilisateur seulement sur la tranche demandée.
+@st.fragment
+def active_days_chart() -> None:
+    n_users = len(s_days)
+    if n_users <= ACTIVE_DAYS_CHART_MAX_USERS:
+        st.plotly_chart(
+            _active_days_bars(s_days, "Jours actifs distincts par utilisateur (tous les users, tri décroissant)"),
+            use_container_width=True,
+        )
+        return
+
+    view = st.radio(
+        f"{n_users} utilisateurs — affichage agrégé :",
+        ["Profil trié (quantiles)", "Distribution (histogramme)"],
+        horizontal=True,
+        key="active_days_view",
+    )
+    if view.startswith("Profil"):
+        fig = px.area(
+            active_days_quantile_profile(s_days),
+            x="Rang (%)", y="Jours actifs",
+            title="Jours actifs distincts par utilisateur (rang en % des users, tri décroissant)",
+        )
+    else:
+        fig = px.bar(
+            active_days_histogram(s_days),
+            x="Jours actifs (min)", y="Utilisateurs",
+            hover_data=["Jours actifs (max)"],
+            title="Distribution des jours actifs distincts",
+        )
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Drill-down : seule la tranche choisie est envoyée au navigateur
+    rank_from, rank_to = st.slider(
+        "Détail par utilisateur — tranche du classement (%)",
+        min_value=0.0, max_value=100.0, value=(0.0, 5.0), step=0.5,
+        key="active_days_slice",
+    )
+    part = active_days_slice(s_days, rank_from, rank_to, max_users=ACTIVE_DAYS_CHART_MAX_USERS)
+    st.plotly_chart(
+        _active_days_bars(part, f"Utilisateurs du rang {rank_from:g} % au rang {rank_to:g} % ({len(part)} affichés)"),
+        use_container_width=True,
+    )
+
+
+active_days_chart()
 
-st.plotly_chart(fig_days, use_container_width=True)
+# Activité glissante + niveaux d'engagement mensuels ---------------------------------
+st.subheader("📈 Utilisateurs actifs (DAU / WAU / MAU)")
+col_roll, col_tiers = st.columns(2)
+with col_roll:
+    fig_roll = px.line(
+        engagement.rolling.reset_index(),
+        x="Date", y=["DAU", "WAU", "MAU"],
+        labels={"value": "Utilisateurs actifs", "variable": "Fenêtre"},
+        title="Utilisateurs distincts actifs sur 1 / 7 / 30 jours glissants",
+    )
+    st.plotly_chart(fig_roll, use_container_width=True)
+with col_tiers:
+    fig_tiers = px.bar(
+        engagement.tier_counts.reset_index(),
+        x="Période", y=list(engagement.tier_counts.columns),
+        labels={"value": "Utilisateurs", "variable": "Niveau"},
+        title="Niveaux d'engagement par mois (jours actifs dans le mois)",
+    )
+    st.plotly_chart(fig_tiers, use_container_width=True)
 
 
 
@@ -472,38 +608,43 @@ with col_left:
 
 
 # Faible engagement--------------------------------------------------------------------
-st.subheader("⬇️ Utilisateurs à faible engagement")
-mode = st.radio("Mode de sélection du seuil", ["Absolu (X jours)", "Quantile (% les plus faibles)"], horizontal=True)
-col_a, col_b = st.columns(2)
-
-if mode.startswith("Absolu"):
-    with col_a:
-        X = st.number_input("Seuil X (jours)", min_value=0, value=3, step=1)
-    df_low, thr = low_engagement_users(s_days, mode="absolute", x=int(X))
-    st.caption(f"Sélection: utilisateurs avec **jours actifs ≤ {thr}**.")
-else:
-    with col_a:
-        pct = st.slider("Quantile (%)", min_value=1, max_value=50, value=10, step=1)
-    df_low, thr = low_engagement_users(s_days, mode="quantile", q=float(pct)/100.0)
-    st.caption(f"Sélection: **{pct}%** les plus faibles (seuil calculé: **≤ {thr} jours**).")
+@st.fragment
+def low_engagement_section() -> None:
+    st.subheader("⬇️ Utilisateurs à faible engagement")
+    mode = st.radio("Mode de sélection du seuil", ["Absolu (X jours)", "Quantile (% les plus faibles)"], horizontal=True)
+    col_a, col_b = st.columns(2)
+
+    if mode.startswith("Absolu"):
+        with col_a:
+            X = st.number_input("Seuil X (jours)", min_value=0, value=3, step=1)
+        df_low, thr = low_engagement_users(s_days, mode="absolute", x=int(X))
+        st.caption(f"Sélection: utilisateurs avec **jours actifs ≤ {thr}**.")
+    else:
+        with col_a:
+            pct = st.slider("Quantile (%)", min_value=1, max_value=50, value=10, step=1)
+        df_low, thr = low_engagement_users(s_days, mode="quantile", q=float(pct)/100.0)
+        st.caption(f"Sélection: **{pct}%** les plus faibles (seuil calculé: **≤ {thr} jours**).")
+
+    col_left, _ = st.columns([0.3, 0.7])
+    with col_left:
+        st.dataframe(
+            df_low,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "User ID": st.column_config.TextColumn(width="small"),
+                "distinct_active_days": st.column_config.NumberColumn(format="%d", width="small"),
+            },
+        )
+
+    # Exports ------------------------------------------------------------------------------
+    col_dl1, col_dl2 = st.columns(2)
+    with col_dl1:
+        csv_top = df_top10.to_csv(index=False).encode("utf-8")
+        st.download_button("📥 Export Top 10 (CSV)", data=csv_top, file_name="top10_super_users.csv", mime="text/csv")
+    with col_dl2:
+        csv_low = df_low.to_csv(index=False).encode("utf-8")
+        st.download_button("📥 Export Low Engagement (CSV)", data=csv_low, file_name="low_engagement_users.csv", mime="text/csv")
 
-col_left, _ = st.columns([0.3, 0.7])
-with col_left:
-    st.dataframe(
-        df_low,
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "User ID": st.column_config.TextColumn(width="small"),
-            "distinct_active_days": st.column_config.NumberColumn(format="%d", width="small"),
-        },
-    )
 
-# Exports ------------------------------------------------------------------------------
-col_dl1, col_dl2 = st.columns(2)
-with col_dl1:
-    csv_top = df_top10.to_csv(index=False).encode("utf-8")
-    st.download_button("📥 Export Top 10 (CSV)", data=csv_top, file_name="top10_super_users.csv", mime="text/csv")
-with col_dl2:
-    csv_low = df_low.to_csv(index=False).encode("utf-8")
-    st.download_button("📥 Export Low Engagement (CSV)", data=csv_low, file_name="low_engagement_users.csv", mime="text/csv")
+low_engagement_section()
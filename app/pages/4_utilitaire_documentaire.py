@@ -1,6 +1,9 @@
 # app/pages/3_Utilitaire_Documentaire.py
 import streamlit as st
 from app.utils_docs import extract_document_content, DOCX_AVAILABLE, PDF_AVAILABLE
+import time
+from doc_processing import summarize_map_reduce, translate_stream, split_segments, SEGMENT_MAX_CHARS
+from doc_compare import compare_documents, compare_documents_semantic
 
 from utils_docs import hide_native_nav, custom_sidebar_nav, sidebar_system_status, require_login
 
@@ -11,6 +14,16 @@ require_login()  # ⬅️ empêche l'accès si non connecté
 
 st.set_page_config(page_title="Utilitaire documentaire", page_icon="📄", layout="wide")
 st.header("📄 Utilitaire Documentaire")
+
+
+def _get_embedding_model():
+    """Modèle d'embeddings partagé, chargé seulement pour la comparaison sémantique."""
+    if st.session_state.get("embedding_model") is None:
+        from rag.embeddings import get_embedding_model
+        st.session_state.embedding_model = get_embedding_model()
+    return st.session_state.embedding_model
+
+
 st.markdown("*Interface pour traiter vos documents sans conservation des données*")
 st.info("📌 Les documents traités ici ne sont pas sauvegardés et ne sont pas indexés.")
 
@@ -74,19 +87,31 @@ if op == "Traduction automatique":
 
     if st.button("🔄 Traduire"):
         sel = next(f for f in supported if f.name == doc_name)
-        with st.spinner(f"Traduction de {doc_name}..."):
-            content = extract_document_content(sel)
-            if content.startswith("[Erreur"):
-                st.error(content)
-            else:
-                limit = 4000
-                if len(content) > limit:
-                    content = content[:limit] + "...\n[Contenu tronqué]"
-                prompt = f"Traduis le texte suivant de {src} vers {tgt}.\n\nTexte :\n{content}\n\nTraduction :"
-                out = st.session_state.rag_system.llm.invoke(prompt)
-                st.success("✅ Traduction terminée")
-                st.text_area("", value=out.content, height=300)
-                st.download_button("📥 Télécharger", data=out.content, file_name=f"{doc_name}_traduit_{tgt}.txt", mime="text/plain")
+        content = extract_document_content(sel)
+        if content.startswith("[Erreur"):
+            st.error(content)
+        else:
+            # Document complet : segments traduits en parallèle, affichés dans l'ordre dès que disponibles
+            progress = st.progress(0, text=f"Traduction de {doc_name}…")
+            output = st.empty()
+            parts = []
+            t0 = time.perf_counter()
+            first_output_s = None
+            for i, total, translated in translate_stream(st.session_state.rag_system.llm, content, src, tgt):
+                if first_output_s is None:
+                    first_output_s = time.perf_counter() - t0
+                parts.append(translated.strip())
+                progress.progress(int(100 * (i + 1) / total), text=f"Segments traduits : {i + 1}/{total}")
+                output.text_area("", value="\n\n".join(parts), height=300, key=f"translation_{i}")
+            progress.empty()
+            translation = "\n\n".join(parts)
+            st.success("✅ Traduction terminée")
+            if first_output_s is not None:
+                st.caption(
+                    f"⏱️ Premier segment affiché en {first_output_s:.1f} s — "
+                    f"traduction complète en {time.perf_counter() - t0:.1f} s ({len(parts)} segments)."
+                )
+            st.download_button("📥 Télécharger", data=translation, file_name=f"{doc_name}_traduit_{tgt}.txt", mime="text/plain")
 
 # ───────── Résumé ─────────
 elif op == "Résumé de document":
@@ -108,19 +133,27 @@ elif op == "Résumé de document":
             if content.startswith("[Erreur"):
                 st.error(content)
             else:
-                limit = 6000
-                if len(content) > limit:
-                    content = content[:limit] + "...\n[Contenu tronqué]"
-
-                # Nouveau prompt sans notion de "focus"
-                prompt = f"Fais un résumé {length.lower()} du document suivant :\n\n{content}\n\nRésumé :"
-
-                out = st.session_state.rag_system.llm.invoke(prompt)
+                # Document complet : découpage pages/paragraphes, résumés des sections en parallèle puis fusion
+                n_segments = len(split_segments(content, SEGMENT_MAX_CHARS))
+                if n_segments > 1:
+                    st.caption(f"Document long : {n_segments} sections résumées en parallèle puis fusionnées.")
+                progress = st.progress(0, text="Résumé en cours…")
+
+                def _on_progress(done: int, total: int, stage: str) -> None:
+                    progress.progress(int(100 * done / max(total, 1)), text=f"{stage} : {done}/{total}")
+
+                summary = summarize_map_reduce(
+                    st.session_state.rag_system.llm,
+                    content,
+                    length.lower(),
+                    on_progress=_on_progress,
+                )
+                progress.empty()
                 st.success("✅ Résumé généré")
-                st.markdown(out.content)
+                st.markdown(summary)
                 st.download_button(
                     "📥 Télécharger",
-                    data=out.content,
+                    data=summary,
                     file_name=f"{doc_name}_resume.md",
                     mime="text/markdown"
                 )
@@ -138,40 +171,21 @@ else:
     with c2_col:
         newer = st.selectbox("Document version 2 (nouvelle) :", [f.name for f in supported], key="doc2")
 
+    mode = st.radio(
+        "Mode de comparaison :",
+        ["Textuel", "Sémantique"],
+        horizontal=True,
+        help="Sémantique : les exigences reformulées ou déplacées sont rapprochées par similarité d'embeddings",
+    )
+    semantic = mode == "Sémantique"
+    modified_title = "Éléments reformulés" if semantic else "Éléments modifiés"
+
     if older == newer:
         st.error("⚠️ Sélectionne deux documents différents.")
     elif st.button("🔄 Comparer les versions"):
         d1 = next(f for f in supported if f.name == older)
         d2 = next(f for f in supported if f.name == newer)
 
-        import re, difflib
-        from typing import List, Tuple
-
-        def split_units(txt: str) -> List[str]:
-            """Découpe le texte en unités lisibles (phrases / puces / lignes)."""
-            t = re.sub(r"[•\-\u2022]\s*", "\n", txt)  # puces → retours ligne
-            parts = re.split(r"(?<=[\.\!\?])\s+|\n+", t)  # fin de phrase OU newline
-            return [p.strip() for p in parts if p and p.strip()]
-
-        def word_diff(a: str, b: str) -> str:
-            """Diff mot-à-mot : '2021 → 1999, haut → très haut, …'"""
-            a_w, b_w = a.split(), b.split()
-            diff = list(difflib.ndiff(a_w, b_w))
-            changes, i = [], 0
-            while i < len(diff):
-                if diff[i].startswith("- ") and i+1 < len(diff) and diff[i+1].startswith("+ "):
-                    changes.append(f"{diff[i][2:]} → {diff[i+1][2:]}")
-                    i += 2
-                elif diff[i].startswith("- "):
-                    changes.append(f"supprimé: {diff[i][2:]}")
-                    i += 1
-                elif diff[i].startswith("+ "):
-                    changes.append(f"ajouté: {diff[i][2:]}")
-                    i += 1
-                else:
-                    i += 1
-            return ", ".join(changes)
-
         with st.spinner("Comparaison en cours..."):
             text_old = extract_document_content(d1)
             text_new = extract_document_content(d2)
@@ -180,65 +194,46 @@ else:
                 st.error("Erreur d'extraction d'un des documents.")
                 st.stop()
 
-            # Tronquage sécurité
-            limit = 20000
-            if len(text_old) > limit: text_old = text_old[:limit]
-            if len(text_new) > limit: text_new = text_new[:limit]
-
-            old_units = split_units(text_old)
-            new_units = split_units(text_new)
-
-            # Aligne les unités (phrases/lignes) entre anciennes et nouvelles versions
-            sm = difflib.SequenceMatcher(None, old_units, new_units)
-            added: List[str] = []
-            removed: List[str] = []
-            modified: List[Tuple[str, str, str]] = []  # (ancien, nouveau, diff)
-
-            for tag, i1, i2, j1, j2 in sm.get_opcodes():
-                if tag == "equal":
-                    continue
-                elif tag == "delete":
-                    removed.extend(old_units[i1:i2])
-                elif tag == "insert":
-                    added.extend(new_units[j1:j2])
-                elif tag == "replace":
-                    # On associe les paires dans la zone remplacée
-                    a_block = old_units[i1:i2]
-                    b_block = new_units[j1:j2]
-                    n = min(len(a_block), len(b_block))
-                    for k in range(n):
-                        a_sent, b_sent = a_block[k], b_block[k]
-                        diff_words = word_diff(a_sent, b_sent)
-                        if a_sent != b_sent:
-                            modified.append((a_sent, b_sent, diff_words))
-                    # S'il reste des lignes en plus d'un côté, ce sont des ajouts/suppressions purs
-                    if len(a_block) > n:
-                        removed.extend(a_block[n:])
-                    if len(b_block) > n:
-                        added.extend(b_block[n:])
+            # Documents complets : alignement patience + diff mot-à-mot sur les paires modifiées
+            if semantic:
+                result = compare_documents_semantic(text_old, text_new, _get_embedding_model())
+            else:
+                result = compare_documents(text_old, text_new)
+            added, removed, modified, moved = result["added"], result["removed"], result["modified"], result["moved"]
 
             # ----- Rendu -----
             st.success("✅ Comparaison terminée")
             st.subheader(f"Comparaison : {older} → {newer}")
+            st.caption(
+                f"Inchangés : {result['unchanged']} · Ajoutés : {len(added)} · Supprimés : {len(removed)} · "
+                f"{'Reformulés' if semantic else 'Modifiés'} : {len(modified)} · Blocs déplacés : {len(moved)}"
+            )
 
             st.markdown("### Éléments ajoutés")
             if added:
-                for u in added:
-                    st.markdown(f"- {u}")
+                st.markdown("\n".join(f"- {u}" for u in added))
             else:
                 st.markdown("_Aucun_")
 
             st.markdown("### Éléments supprimés")
             if removed:
-                for u in removed:
-                    st.markdown(f"- {u}")
+                st.markdown("\n".join(f"- {u}" for u in removed))
             else:
                 st.markdown("_Aucun_")
 
-            st.markdown("### Éléments modifiés")
+            st.markdown(f"### {modified_title}")
             if modified:
-                for old_s, new_s, d in modified:
-                    st.markdown(f"- **Ancienne :** {old_s}\n  **Nouvelle :** {new_s}\n  ↳ **Différences :** {d if d else 'modifications mineures'}")
+                # un seul bloc markdown par section (documents longs : des milliers d'éléments)
+                st.markdown("\n".join(
+                    f"- **Ancienne :** {old_s}\n  **Nouvelle :** {new_s}\n  ↳ **Différences :** {d if d else 'modifications mineures'}"
+                    for old_s, new_s, d in modified
+                ))
+            else:
+                st.markdown("_Aucun_")
+
+            st.markdown("### Éléments déplacés")
+            if moved:
+                st.markdown("\n".join(f"- {u}  \n  ↳ position {i_old + 1} → {i_new + 1}" for u, i_old, i_new in moved))
             else:
                 st.markdown("_Aucun_")
 
@@ -258,7 +253,7 @@ else:
             else:
                 md_lines.append("_Aucun_")
             md_lines.append("")
-            md_lines.append("## Éléments modifiés")
+            md_lines.append(f"## {modified_title}")
             if modified:
                 for old_s, new_s, d in modified:
                     md_lines.append(f"- **Ancienne :** {old_s}")
@@ -267,6 +262,14 @@ else:
             else:
                 md_lines.append("_Aucun_")
             md_lines.append("")
+            md_lines.append("## Éléments déplacés")
+            if moved:
+                for u, i_old, i_new in moved:
+                    md_lines.append(f"- {u}")
+                    md_lines.append(f"  ↳ position {i_old + 1} → {i_new + 1}")
+            else:
+                md_lines.append("_Aucun_")
+            md_lines.append("")
 
             md_text = "\n".join(md_lines)
             st.download_button(
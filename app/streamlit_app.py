@@ -2,8 +2,6 @@
 import os
 from pathlib import Path
 import streamlit as st
-from rag.elasticsearch_indexer import get_elastic_client, get_index_stats
-from rag.rag_system import EQMSRAGSystem
 from utils_docs import hide_native_nav, custom_sidebar_nav, sidebar_system_status
 
 # --- Page config ---
@@ -150,6 +148,8 @@ with col_left:
                         st.session_state.is_auth = True
                         st.session_state.mistral_api_key = MISTRAL_API_KEY_ENV
 
+                        # import différé : langchain / torch ne sont chargés qu'à la connexion
+                        from rag.rag_system import EQMSRAGSystem
                         rag = EQMSRAGSystem(MISTRAL_API_KEY_ENV)
                         if hasattr(rag, "setup_rag_chain"):
                             try:
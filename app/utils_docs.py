@@ -1,70 +1,184 @@
 # app/utils_docs.py
 import os
 import io
-import tempfile
+import atexit
+import hashlib
+import threading
+import importlib.util
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 import streamlit as st
 
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except Exception:
-    DOCX_AVAILABLE = False
+# Disponibilité testée sans importer les bibliothèques (import réel au premier fichier traité)
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
+PDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
+
+# Extraction PDF en parallèle (process) à partir de ce nombre de pages
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Nb de documents extraits gardés en mémoire (LRU, clé = sha256 du fichier)
+EXTRACT_CACHE_SIZE = int(os.getenv("EXTRACT_CACHE_SIZE", "16"))
+
+_extract_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_extract_cache_lock = threading.Lock()
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _extract_cache_lock:
+        if key in _extract_cache:
+            _extract_cache.move_to_end(key)
+            return _extract_cache[key]
+    return None
+
+
+def _cache_put(key, value: str) -> None:
+    if EXTRACT_CACHE_SIZE <= 0:
+        return
+    with _extract_cache_lock:
+        _extract_cache[key] = value
+        _extract_cache.move_to_end(key)
+        while len(_extract_cache) > EXTRACT_CACHE_SIZE:
+            _extract_cache.popitem(last=False)
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Pool de process partagé par toutes les sessions, créé au premier gros PDF."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # "spawn" : pas de fork du serveur Streamlit (multi-threadé)
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=max(1, PDF_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pdf_pool.shutdown, wait=False, cancel_futures=True)
+        return _pdf_pool
+
+
+def _pdf_pages_text(data: bytes, start: int, stop: int) -> list:
+    """Texte des pages [start, stop) d'un PDF (exécuté dans un worker ou en local)."""
+    import pypdf
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    pages = []
+    for i in range(start, stop):
+        try:
+            text = (reader.pages[i].extract_text() or "").strip()
+            if text:
+                pages.append(f"[Page {i+1}]\n{text}")
+        except Exception as e:
+            pages.append(f"[Erreur page {i+1}: {e}]")
+    return pages
+
 
-try:
+def _extract_pdf(data: bytes) -> str:
     import pypdf
-    PDF_AVAILABLE = True
-except Exception:
-    PDF_AVAILABLE = False
+
+    n_pages = len(pypdf.PdfReader(io.BytesIO(data)).pages)
+    workers = max(1, PDF_WORKERS)
+    if workers == 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        pages = _pdf_pages_text(data, 0, n_pages)
+    else:
+        # une plage contiguë de pages par tâche : le PDF n'est transmis et parsé qu'une fois par tâche
+        step = -(-n_pages // workers)
+        pool = _get_pdf_pool()
+        futures = [pool.submit(_pdf_pages_text, data, s, min(s + step, n_pages)) for s in range(0, n_pages, step)]
+        pages = [p for fut in futures for p in fut.result()]
+    return "\n\n".join(pages) if pages else "[PDF vide ou non extractible]"
+
+
+def _docx_table_rows(tbl) -> Iterator[str]:
+    """
+    Lignes d'un tableau Word : une valeur par w:tc, séparées par ' | '.
+    Les cellules vides restent en place et une fusion horizontale (un seul w:tc avec gridSpan=n)
+    est suivie de n-1 cellules vides : les colonnes restent alignées d'une ligne à l'autre.
+    Les lignes entièrement vides sont ignorées.
+    """
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+
+    for tr in tbl.iterchildren(qn("w:tr")):
+        cells = []
+        for tc in tr.iterchildren(qn("w:tc")):
+            text = " ".join(
+                t for t in (Paragraph(p, None).text.strip() for p in tc.iter(qn("w:p"))) if t
+            )
+            cells.append(text)
+            span = tc.find(f"{qn('w:tcPr')}/{qn('w:gridSpan')}")
+            if span is not None:
+                cells.extend([""] * (int(span.get(qn("w:val"), "1")) - 1))
+        if any(cells):
+            yield " | ".join(cells)
+
+
+def iter_docx_blocks(data: bytes) -> Iterator[str]:
+    """
+    Parcourt un DOCX en mémoire (pas de fichier temporaire), dans l'ordre du document :
+    un bloc par paragraphe non vide, un bloc par tableau (une ligne de texte par ligne du tableau).
+    """
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(io.BytesIO(data))
+    p_tag, tbl_tag = qn("w:p"), qn("w:tbl")
+    for child in doc.element.body.iterchildren():
+        if child.tag == p_tag:
+            text = Paragraph(child, doc).text.strip()
+            if text:
+                yield text
+        elif child.tag == tbl_tag:
+            rows = list(_docx_table_rows(child))
+            if rows:
+                yield "\n".join(rows)
 
 
 def extract_document_content(uploaded_file) -> str:
     """
     Extrait le contenu textuel d'un fichier uploadé (TXT, DOCX/DOC, PDF).
     Retourne une chaîne avec messages d’erreur en cas de problème.
+    Résultat mis en cache par sha256 du contenu : les reruns et opérations successives
+    sur le même document ne ré-extraient pas le fichier.
     """
     file_extension = uploaded_file.name.lower().split('.')[-1]
     file_content = ""
 
     try:
+        data = uploaded_file.getvalue()
+        cache_key = (hashlib.sha256(data).hexdigest(), file_extension)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         if file_extension == "txt":
-            file_content = str(uploaded_file.read(), "utf-8")
+            file_content = str(data, "utf-8")
 
         elif file_extension in ["docx", "doc"]:
             if not DOCX_AVAILABLE:
                 return "[Erreur: Bibliothèque python-docx non installée. pip install python-docx]"
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp:
-                tmp.write(uploaded_file.getvalue())
-                tmp_path = tmp.name
             try:
-                doc = Document(tmp_path)
-                paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-                file_content = "\n\n".join(paragraphs) if paragraphs else "[Document DOCX vide]"
+                blocks = list(iter_docx_blocks(data))
+                file_content = "\n\n".join(blocks) if blocks else "[Document DOCX vide]"
             except Exception as e:
                 file_content = f"[Erreur extraction DOCX: {e}]"
-            finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
 
         elif file_extension == "pdf":
             if not PDF_AVAILABLE:
                 return "[Erreur: Bibliothèque PyPDF non installée]"
             try:
-                reader = pypdf.PdfReader(io.BytesIO(uploaded_file.getvalue()))
-                pages = []
-                for i, page in enumerate(reader.pages):
-                    try:
-                        text = page.extract_text() or ""
-                        text = text.strip()
-                        if text:
-                            pages.append(f"[Page {i+1}]\n{text}")
-                    except Exception as e:
-                        pages.append(f"[Erreur page {i+1}: {e}]")
-                file_content = "\n\n".join(pages) if pages else "[PDF vide ou non extractible]"
+                file_content = _extract_pdf(data)
             except Exception as e:
                 file_content = f"[Erreur extraction PDF: {e}]"
 
         else:
-            file_content = f"[Format non supporté: .{file_extension}]"
+            return f"[Format non supporté: .{file_extension}]"
+
+        if not file_content.startswith("[Erreur"):
+            _cache_put(cache_key, file_content)
 
     except Exception as e:
         file_content = f"[Erreur générale pour {uploaded_file.name}: {e}]"
@@ -123,7 +237,11 @@ def sidebar_system_status():
                 size_kb = round(stats.get("store_size_kb", 0), 1)
                 ok = True
             except TypeError:
-                es = get_elastic_client()
+                # client réutilisé sur la session : pas de nouveau ping ES à chaque rerun
+                es = st.session_state.get("es_client")
+                if es is None:
+                    es = get_elastic_client()
+                    st.session_state.es_client = es
                 stats = get_index_stats(es, INDEX_NAME)  # signature (client, index)
                 if "error" not in stats:
                     docs = stats.get("documents_count", "—")
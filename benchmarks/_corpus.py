@@ -0,0 +1,262 @@
+# benchmarks/_corpus.py
+"""
+Génération de corpus RFI synthétiques, de la même forme que nos classeurs réels :
+ligne d'en-tête précédée de quelques lignes de titre, colonne besoin/exigence,
+colonne(s) réponse/commentaire, colonnes annexes (→ meta_col_*).
+
+Déterministe (seed) pour que les mesures soient comparables d'un run à l'autre.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Dict, List
+
+import pandas as pd
+
+REF_PREFIXES = ["NC", "GEN", "CAPA", "DOC", "TRN", "AUD", "CHG", "RISK", "SUP", "VAL"]
+MODULES = ["Documents", "Formation", "Non-conformités", "CAPA", "Audits", "Fournisseurs", "Changements", "Risques"]
+PRIORITIES = ["Obligatoire", "Souhaité", "Optionnel"]
+
+SUBJECTS = [
+    "Le système", "La solution", "L'application", "Le module qualité", "La plateforme eQMS",
+    "Le workflow d'approbation", "Le gestionnaire documentaire", "Le tableau de bord",
+]
+VERBS = [
+    "doit permettre de", "doit pouvoir", "permet-il de", "doit garantir la possibilité de",
+    "est-il capable de", "doit offrir la capacité de",
+]
+ACTIONS = [
+    "tracer toutes les modifications", "signer électroniquement", "archiver les versions obsolètes",
+    "notifier les approbateurs", "générer un rapport d'audit", "exporter au format PDF",
+    "gérer les habilitations par rôle", "planifier les formations obligatoires",
+    "lier une CAPA à une non-conformité", "escalader les tâches en retard",
+    "historiser les connexions", "paramétrer les circuits de validation",
+    "importer des fichiers Excel", "calculer les indicateurs qualité",
+]
+OBJECTS = [
+    "des procédures", "des enregistrements qualité", "des dossiers de lot", "des fournisseurs critiques",
+    "des réclamations clients", "des écarts", "des plans d'action", "des audits internes",
+    "conformément au 21 CFR Part 11", "selon les BPF", "avec horodatage", "pour chaque site",
+]
+ANSWERS = [
+    "Oui, nativement dans le module {module}.",
+    "Oui, via le paramétrage standard du workflow {module}.",
+    "Partiellement : la fonctionnalité existe dans {module}, un développement spécifique est requis pour {action}.",
+    "Non disponible en standard ; contournement possible via les rapports {module}.",
+    "Oui. Le module {module} permet de {action} avec piste d'audit complète.",
+]
+
+
+def _sentence(rng: random.Random) -> tuple[str, str]:
+    action = rng.choice(ACTIONS)
+    text = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {action} {rng.choice(OBJECTS)}."
+    return text, action
+
+
+def synthetic_rfi_sheet(n_rows: int, seed: int = 0, title_rows: int = 2) -> pd.DataFrame:
+    """
+    Onglet RFI SANS header (comme `pd.read_excel(..., header=None)`).
+    Colonnes : Référence | Exigence | Réponse fournisseur | Priorité | Module
+    """
+    rng = random.Random(seed)
+    rows: List[list] = []
+    rows.append(["Cahier des charges eQMS", None, None, None, None])
+    for _ in range(max(0, title_rows - 1)):
+        rows.append([None, None, None, None, None])
+    rows.append(["Référence", "Exigence", "Réponse fournisseur", "Priorité", "Module"])
+    for i in range(n_rows):
+        module = rng.choice(MODULES)
+        besoin, action = _sentence(rng)
+        reponse = rng.choice(ANSWERS).format(module=module, action=action)
+        rows.append([
+            f"{rng.choice(REF_PREFIXES)}-{i:04d}",
+            besoin,
+            reponse,
+            rng.choice(PRIORITIES),
+            module,
+        ])
+    return pd.DataFrame(rows)
+
+
+def synthetic_workbook(n_rows: int, n_sheets: int = 1, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """Classeur {onglet: DataFrame sans header}, lignes réparties sur n_sheets onglets."""
+    per_sheet = [n_rows // n_sheets + (1 if s < n_rows % n_sheets else 0) for s in range(n_sheets)]
+    return {f"Exigences_{s + 1}": synthetic_rfi_sheet(n, seed=seed * 1000 + s) for s, n in enumerate(per_sheet)}
+
+
+def synthetic_chunks(n_chunks: int, seed: int = 0, filename: str = "RFI_synthetique.xlsx", rows_per_sheet: int = 5000):
+    """Chunks LangChain produits par rag.doc_loader à partir d'un classeur synthétique."""
+    from rag.doc_loader import detect_columns, create_smart_chunks_from_detected
+
+    n_sheets = max(1, -(-n_chunks // rows_per_sheet))
+    sheets = synthetic_workbook(n_chunks, n_sheets=n_sheets, seed=seed)
+    chunks = []
+    for onglet in detect_columns(sheets, filename):
+        chunks.extend(create_smart_chunks_from_detected(onglet, filename))
+    return chunks
+
+
+def write_workbooks(directory, n_files: int, rows_per_file: int, n_sheets: int = 1, seed: int = 0) -> list:
+    """Écrit n_files classeurs .xlsx synthétiques dans `directory` ; retourne leurs chemins."""
+    from pathlib import Path
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for f in range(n_files):
+        path = directory / f"RFI_synthetique_{f:03d}.xlsx"
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            for name, df in synthetic_workbook(rows_per_file, n_sheets=n_sheets, seed=seed + f).items():
+                df.to_excel(writer, sheet_name=name, header=False, index=False)
+        paths.append(path)
+    return paths
+
+
+class HashEmbeddings:
+    """Embeddings lexicaux hachés (mots + bigrammes), normalisés L2 : même interface que les modèles, hors ligne."""
+
+    def __init__(self, dim: int = 768):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.vectorizer = HashingVectorizer(n_features=dim, ngram_range=(1, 2), alternate_sign=True, norm="l2")
+
+    def embed_array(self, texts: List[str]):
+        import numpy as np
+
+        return self.vectorizer.transform(texts).astype(np.float32).toarray()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def synthetic_spec_document(n_pages: int, sentences_per_page: int = 40, seed: int = 0) -> str:
+    """Texte de spécification long, au format de l'extraction PDF ([Page N] + paragraphes)."""
+    rng = random.Random(seed)
+    pages = []
+    n = 0
+    for p in range(1, n_pages + 1):
+        paragraphs, para = [], []
+        for _ in range(sentences_per_page):
+            n += 1
+            sentence, _ = _sentence(rng)
+            para.append(f"{sentence[:-1]} (exigence {rng.choice(REF_PREFIXES)}-{n:05d}).")
+            if len(para) >= rng.randint(3, 6):
+                paragraphs.append(" ".join(para))
+                para = []
+        if para:
+            paragraphs.append(" ".join(para))
+        pages.append(f"[Page {p}]\n" + "\n\n".join(paragraphs))
+    return "\n\n".join(pages)
+
+
+def revise_document(text: str, seed: int = 1, p_modify: float = 0.03, p_delete: float = 0.01,
+                    p_insert: float = 0.01, n_moves: int = 5, move_len: int = 8) -> str:
+    """Nouvelle version d'un document : phrases reformulées, supprimées, ajoutées, blocs déplacés."""
+    rng = random.Random(seed)
+    sentences = [s for s in text.replace("\n\n", "\n").split("\n") if s]
+    units: List[str] = []
+    for line in sentences:
+        for s in line.split(". "):
+            units.append(s if s.endswith(".") else s + ".")
+    out: List[str] = []
+    for u in units:
+        r = rng.random()
+        if r < p_delete:
+            continue
+        if r < p_delete + p_modify:
+            words = u.split()
+            k = rng.randrange(len(words))
+            words[k] = rng.choice(["obligatoirement", "systématiquement", "au besoin", "2025", "v2"])
+            u = " ".join(words)
+        out.append(u)
+        if rng.random() < p_insert:
+            out.append(_sentence(rng)[0])
+    for _ in range(n_moves):
+        if len(out) <= 2 * move_len:
+            break
+        start = rng.randrange(len(out) - move_len)
+        block = out[start:start + move_len]
+        del out[start:start + move_len]
+        dest = rng.randrange(len(out))
+        out[dest:dest] = block
+    return "\n".join(out)
+
+
+def write_rfi_docx(path, n_rows: int, rows_per_table: int = 200, seed: int = 0):
+    """Document Word RFI synthétique : titres + paragraphes d'introduction + tableaux d'exigences."""
+    from docx import Document
+
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_heading("Cahier des charges eQMS", level=1)
+    done = 0
+    while done < n_rows:
+        n = min(rows_per_table, n_rows - done)
+        doc.add_heading(f"Section {done // rows_per_table + 1} — {rng.choice(MODULES)}", level=2)
+        doc.add_paragraph(_sentence(rng)[0])
+        table = doc.add_table(rows=n + 1, cols=5)
+        for cell, label in zip(table.rows[0].cells, ["Référence", "Exigence", "Réponse fournisseur", "Priorité", "Module"]):
+            cell.text = label
+        for r in range(1, n + 1):
+            module = rng.choice(MODULES)
+            besoin, action = _sentence(rng)
+            values = [
+                f"{rng.choice(REF_PREFIXES)}-{done + r:05d}",
+                besoin,
+                rng.choice(ANSWERS).format(module=module, action=action),
+                rng.choice(PRIORITIES),
+                module,
+            ]
+            for cell, value in zip(table.rows[r].cells, values):
+                cell.text = value
+        done += n
+    doc.save(str(path))
+    return path
+
+
+LOG_APPLICATIONS = {
+    "Documents": ["Consultation", "Révision", "Approbation", "Diffusion", "Archivage"],
+    "Formation": ["Sessions", "Quiz", "Matrice", "Attestations"],
+    "Non-conformités": ["Déclaration", "Investigation", "Clôture"],
+    "CAPA": ["Création", "Plan d'action", "Efficacité", "Clôture"],
+    "Audits": ["Planification", "Constats", "Rapports"],
+    "Fournisseurs": ["Qualification", "Évaluation", "Réclamations"],
+    "Changements": ["Demande", "Évaluation d'impact", "Mise en œuvre"],
+    "Risques": ["Identification", "Cotation", "Revue"],
+}
+
+
+def synthetic_logs(n_users: int, actions_per_user: int = 20, n_profiles: int = 5, days: int = 365, seed: int = 0) -> pd.DataFrame:
+    """
+    Logs MasterControl synthétiques (Application, Module, User ID, Date), déjà normalisés comme
+    load_logs_df (catégoriels + dates). Chaque user suit un profil d'usage (mélange d'applications).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    pairs = [(app, mod) for app, mods in LOG_APPLICATIONS.items() for mod in mods]
+    app_of_pair = np.array([list(LOG_APPLICATIONS).index(a) for a, _ in pairs])
+    mod_names = sorted({m for _, m in pairs})
+    mod_of_pair = np.array([mod_names.index(m) for _, m in pairs])
+
+    profiles = rng.dirichlet(np.full(len(pairs), 0.3), size=n_profiles)
+    user_profile = rng.integers(0, n_profiles, size=n_users)
+    n_rows = n_users * actions_per_user
+    users = np.repeat(np.arange(n_users), actions_per_user)
+    # tirage du couple (application, module) selon le profil de chaque user
+    row_profile = user_profile[users]
+    pair_idx = np.empty(n_rows, dtype=np.int64)
+    for p in range(n_profiles):
+        mask = row_profile == p
+        pair_idx[mask] = rng.choice(len(pairs), size=int(mask.sum()), p=profiles[p])
+    start = np.datetime64("2024-01-01")
+    return pd.DataFrame({
+        "Application": pd.Categorical.from_codes(app_of_pair[pair_idx], categories=list(LOG_APPLICATIONS)),
+        "Module": pd.Categorical.from_codes(mod_of_pair[pair_idx], categories=mod_names),
+        "User ID": pd.Categorical.from_codes(users, categories=[f"U{u:07d}" for u in range(n_users)]),
+        "Date": start + rng.integers(0, days, size=n_rows).astype("timedelta64[D]"),
+    })
@@ -0,0 +1,111 @@
+# benchmarks/bench_analytics.py
+"""
+Benchmark de bout en bout du clustering de l'analyse utilisateurs (app/analytics/user_behavior.py).
+
+Pour chaque population (logs synthétiques déjà normalisés) :
+ratios creux (compute_ratios) → agrégation par application → méthode du coude → clustering K auto.
+Configurations comparées :
+- sequential : KMeans complet, K ajustés l'un après l'autre, sans échantillon, re-fit pour K auto
+- parallel   : réglages par défaut (K en parallèle, MiniBatch au-delà du seuil, échantillon, réutilisation)
+
+--chart mesure aussi la taille (JSON Plotly) et le temps de construction du graphique
+« jours actifs par utilisateur » : une barre par user vs agrégats serveur (profil + histogramme).
+
+Usage :
+    python benchmarks/bench_analytics.py --users 10000 100000 1000000 [--skip-sequential-above 100000] [--chart]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "app"))
+
+from benchmarks._corpus import synthetic_logs  # noqa: E402
+from analytics.user_behavior import (  # noqa: E402
+    aggregate_by_application, auto_k_elbow, cluster_with_k, compute_ratios,
+)
+
+
+def run(df, config: str) -> dict:
+    timings = {}
+    t0 = time.perf_counter()
+    profiles = compute_ratios(df)
+    ratios_app = aggregate_by_application(profiles)
+    timings["ratios_s"] = time.perf_counter() - t0
+
+    t = time.perf_counter()
+    if config == "sequential":
+        k_auto, viz = auto_k_elbow(ratios_app, 1, 10, n_jobs=1, mode="full", sample_size=0)
+        models = None
+    else:
+        k_auto, viz = auto_k_elbow(ratios_app, 1, 10)
+        models = viz.models
+    timings["elbow_s"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    cluster_with_k(ratios_app, k_auto, models=models, mode="full" if config == "sequential" else "auto")
+    timings["cluster_s"] = time.perf_counter() - t
+    timings["total_s"] = time.perf_counter() - t0
+    return {"k_auto": int(k_auto), **{k: round(v, 3) for k, v in timings.items()}}
+
+
+def chart_payload(df) -> dict:
+    """Taille du JSON Plotly envoyé au navigateur : barres par user vs agrégats serveur."""
+    import plotly.express as px
+    from analytics.engagement import active_days_histogram, active_days_quantile_profile, distinct_active_days
+
+    s_days = distinct_active_days(df)
+    out = {}
+    t0 = time.perf_counter()
+    bars = px.bar(s_days.reset_index(), x="User ID", y="distinct_active_days").to_json()
+    out["bars_kb"], out["bars_s"] = round(len(bars) / 1024), round(time.perf_counter() - t0, 3)
+    t0 = time.perf_counter()
+    agg = (px.area(active_days_quantile_profile(s_days), x="Rang (%)", y="Jours actifs").to_json()
+           + px.bar(active_days_histogram(s_days), x="Jours actifs (min)", y="Utilisateurs").to_json())
+    out["aggregated_kb"], out["aggregated_s"] = round(len(agg) / 1024), round(time.perf_counter() - t0, 3)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Temps de bout en bout du clustering utilisateurs")
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--actions-per-user", type=int, default=20)
+    parser.add_argument("--skip-sequential-above", type=int, default=100_000,
+                        help="Pas de mesure séquentielle au-delà de ce nb d'utilisateurs (trop long)")
+    parser.add_argument("--chart", action="store_true", help="Mesurer la taille du graphique jours actifs")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for n_users in args.users:
+        df = synthetic_logs(n_users, actions_per_user=args.actions_per_user, seed=n_users)
+        configs = ["parallel"] if n_users > args.skip_sequential_above else ["sequential", "parallel"]
+        for config in configs:
+            row = {"users": n_users, "log_rows": len(df), "config": config, **run(df, config)}
+            results.append(row)
+            print(
+                f"{n_users:>9} users  {config:<10}  ratios {row['ratios_s']:7.2f} s  coude {row['elbow_s']:7.2f} s  "
+                f"clustering {row['cluster_s']:6.2f} s  total {row['total_s']:7.2f} s  (K={row['k_auto']})"
+            )
+        if args.chart:
+            row = {"users": n_users, "config": "chart", **chart_payload(df)}
+            results.append(row)
+            print(
+                f"{n_users:>9} users  graphique   barres {row['bars_kb']} Ko ({row['bars_s']} s)  "
+                f"agrégé {row['aggregated_kb']} Ko ({row['aggregated_s']} s)"
+            )
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
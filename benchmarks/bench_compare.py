@@ -0,0 +1,96 @@
+# benchmarks/bench_compare.py
+"""
+Benchmark du moteur de comparaison de versions (app/doc_compare.py).
+
+Génère un document de spécification synthétique (N pages) et une version révisée
+(reformulations, ajouts, suppressions, blocs déplacés), puis mesure le temps de
+compare_documents. --legacy mesure aussi l'ancienne méthode (SequenceMatcher sur
+les unités + ndiff mot-à-mot), qui peut être très lente sur les longs documents.
+
+Usage :
+    python benchmarks/bench_compare.py --pages 200 [--legacy] [--output results/compare.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "app"))
+
+from benchmarks._corpus import revise_document, synthetic_spec_document  # noqa: E402
+from doc_compare import compare_documents, split_units  # noqa: E402
+
+
+def legacy_compare(text_old: str, text_new: str) -> dict:
+    """Ancienne implémentation de la page (sans troncature), pour référence."""
+    old_units, new_units = split_units(text_old), split_units(text_new)
+    sm = difflib.SequenceMatcher(None, old_units, new_units)
+    added, removed, modified = [], [], []
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag == "delete":
+            removed.extend(old_units[i1:i2])
+        elif tag == "insert":
+            added.extend(new_units[j1:j2])
+        elif tag == "replace":
+            a_block, b_block = old_units[i1:i2], new_units[j1:j2]
+            n = min(len(a_block), len(b_block))
+            for k in range(n):
+                list(difflib.ndiff(a_block[k].split(), b_block[k].split()))
+                if a_block[k] != b_block[k]:
+                    modified.append((a_block[k], b_block[k]))
+            removed.extend(a_block[n:])
+            added.extend(b_block[n:])
+    return {"added": added, "removed": removed, "modified": modified}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Temps de comparaison de versions sur longs documents")
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--sentences-per-page", type=int, default=40)
+    parser.add_argument("--legacy", action="store_true", help="Mesurer aussi l'ancienne méthode difflib")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for pages in args.pages:
+        old = synthetic_spec_document(pages, args.sentences_per_page, seed=pages)
+        new = revise_document(old, seed=pages + 1)
+
+        t0 = time.perf_counter()
+        res = compare_documents(old, new)
+        elapsed = time.perf_counter() - t0
+        row = {
+            "pages": pages,
+            "chars_old": len(old),
+            "chars_new": len(new),
+            "compare_s": round(elapsed, 3),
+            "added": len(res["added"]),
+            "removed": len(res["removed"]),
+            "modified": len(res["modified"]),
+            "moved_blocks": len(res["moved"]),
+            "unchanged": res["unchanged"],
+        }
+        if args.legacy:
+            t0 = time.perf_counter()
+            legacy_compare(old, new)
+            row["legacy_s"] = round(time.perf_counter() - t0, 3)
+        results.append(row)
+        print(
+            f"{pages:>4} pages  {elapsed:7.3f} s  +{row['added']} -{row['removed']} ~{row['modified']} "
+            f"↔{row['moved_blocks']}" + (f"  (legacy {row['legacy_s']:.3f} s)" if args.legacy else "")
+        )
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_docx.py
+"""
+Benchmark de l'extraction DOCX de l'utilitaire documentaire (app/utils_docs.py).
+
+Compare, sur des documents RFI synthétiques riches en tableaux :
+- legacy : fichier temporaire + python-docx, doc.paragraphs seulement (tableaux perdus)
+- stream : iter_docx_blocks, lecture en mémoire, paragraphes + tableaux dans l'ordre
+Mesures : temps, débit (Mo/s, lignes d'exigences/s), pic mémoire Python (tracemalloc),
+taille du texte extrait.
+
+Usage :
+    python benchmarks/bench_docx.py --rows 2000 20000 [--output results/docx.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "app"))
+
+from benchmarks._corpus import write_rfi_docx  # noqa: E402
+from utils_docs import iter_docx_blocks  # noqa: E402
+
+
+def legacy_extract(data: bytes) -> str:
+    """Ancienne implémentation (avant lecture en mémoire)."""
+    from docx import Document
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
+        tmp.write(data)
+        tmp_path = tmp.name
+    try:
+        doc = Document(tmp_path)
+        paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
+        return "\n\n".join(paragraphs)
+    finally:
+        os.unlink(tmp_path)
+
+
+def stream_extract(data: bytes) -> str:
+    return "\n\n".join(iter_docx_blocks(data))
+
+
+def measure(fn, data: bytes, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = fn(data)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    return {"seconds": round(best, 3), "mb_per_s": round(len(data) / 1e6 / best, 2),
+            "peak_mb": round(peak / 1e6, 1), "chars": len(text)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Débit et mémoire de l'extraction DOCX")
+    parser.add_argument("--rows", type=int, nargs="+", default=[2000, 20000], help="Lignes d'exigences par document")
+    parser.add_argument("--rows-per-table", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            path = write_rfi_docx(Path(tmp) / f"rfi_{n_rows}.docx", n_rows, rows_per_table=args.rows_per_table)
+            data = path.read_bytes()
+            for name, fn in (("legacy", legacy_extract), ("stream", stream_extract)):
+                row = {"rows": n_rows, "file_mb": round(len(data) / 1e6, 2), "method": name, **measure(fn, data, args.repeat)}
+                row["rows_per_s"] = round(n_rows / row["seconds"]) if row["seconds"] else None
+                results.append(row)
+                print(
+                    f"{n_rows:>7} lignes  {name:<6}  {row['seconds']:7.3f} s  {row['mb_per_s']:6.2f} Mo/s  "
+                    f"{row['rows_per_s']} lignes/s  pic {row['peak_mb']} Mo  texte {row['chars']} car."
+                )
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_embeddings.py
+"""
+Benchmark des backends d'embeddings (rag.embeddings.get_embedding_model).
+
+Pour chaque backend : temps de chargement, débit embed_documents (textes/s),
+latence embed_query (p50/p95), et accord cosinus avec le backend de référence
+(torch fp32) sur des chunks au format réel produits par rag.doc_loader.
+
+Avec --workers, mesure aussi la montée en charge d'EncodingPool (textes/s et
+efficacité par rapport à 1 worker).
+
+Usage :
+    python benchmarks/bench_embeddings.py --n-texts 1000 --backends torch onnx [--output results/embeddings.json]
+    python benchmarks/bench_embeddings.py --n-texts 5000 --backends torch --workers 1 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks._corpus import synthetic_chunks  # noqa: E402
+from rag.embeddings import EncodingPool, get_embedding_model  # noqa: E402
+
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def bench_backend(backend: str, texts: list[str], queries: list[str]) -> tuple[dict, np.ndarray]:
+    t0 = time.perf_counter()
+    model = get_embedding_model(backend)
+    load_s = time.perf_counter() - t0
+
+    model.embed_documents(texts[:8])  # warm-up
+
+    t0 = time.perf_counter()
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    docs_s = time.perf_counter() - t0
+
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        model.embed_query(q)
+        lat.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "n_texts": len(texts),
+        "embed_documents_s": round(docs_s, 3),
+        "texts_per_s": round(len(texts) / docs_s, 1),
+        "query_p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "query_p95_ms": round(float(np.percentile(lat, 95)), 2),
+    }, vectors
+
+
+def bench_pool(backend: str, texts: list[str], workers_list: list[int], batch_size: int) -> list[dict]:
+    rows = []
+    for workers in workers_list:
+        with EncodingPool(workers=workers, batch_size=batch_size, backend=backend) as pool:
+            t0 = time.perf_counter()
+            pool.embed_documents(texts[: workers * batch_size])  # démarrage + chargement des modèles
+            startup_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            pool.embed_documents(texts)
+            run_s = time.perf_counter() - t0
+        rows.append({
+            "backend": backend,
+            "workers": workers,
+            "batch_size": batch_size,
+            "startup_s": round(startup_s, 2),
+            "texts_per_s": round(len(texts) / run_s, 1),
+        })
+    base = rows[0]["texts_per_s"] / rows[0]["workers"]
+    for r in rows:
+        r["scaling_efficiency"] = round(r["texts_per_s"] / (base * r["workers"]), 2)
+        print(f"pool {backend:<6} {r['workers']:>2} workers  {r['texts_per_s']:>8.1f} textes/s  efficacité {r['scaling_efficiency']:.2f}")
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Débit et fidélité des backends d'embeddings")
+    parser.add_argument("--n-texts", type=int, default=1000)
+    parser.add_argument("--n-queries", type=int, default=50)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--reference", default="torch", help="Backend de référence pour l'accord cosinus")
+    parser.add_argument("--workers", nargs="*", type=int, default=[], help="Tailles de pool à mesurer (ex: 1 2 4)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.n_texts, seed=args.seed)
+    texts = [c.page_content for c in chunks]
+    # requêtes courtes, comme dans la consultation (le besoin client seul)
+    queries = [c.page_content.split("Contenu: ")[1].split("\n")[0] for c in chunks[: args.n_queries]]
+
+    backends = list(dict.fromkeys([args.reference] + args.backends))
+    results, vectors = [], {}
+    for backend in backends:
+        res, vecs = bench_backend(backend, texts, queries)
+        vectors[backend] = vecs
+        results.append(res)
+
+    ref = vectors[args.reference]
+    for res in results:
+        cos = _cosine_rows(vectors[res["backend"]], ref)
+        res["cosine_vs_reference"] = {
+            "mean": round(float(cos.mean()), 5),
+            "p01": round(float(np.percentile(cos, 1)), 5),
+            "min": round(float(cos.min()), 5),
+        }
+        res["speedup_vs_reference"] = round(res["texts_per_s"] / results[0]["texts_per_s"], 2)
+        print(
+            f"{res['backend']:<8} {res['texts_per_s']:>8.1f} textes/s  x{res['speedup_vs_reference']:<5} "
+            f"query p50 {res['query_p50_ms']:.1f} ms  cos moyen {res['cosine_vs_reference']['mean']:.4f} "
+            f"(min {res['cosine_vs_reference']['min']:.4f})"
+        )
+
+    pool_results = []
+    for backend in args.backends if args.workers else []:
+        pool_results.extend(bench_pool(backend, texts, sorted(args.workers), args.batch_size))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"reference": args.reference, "results": results, "pool": pool_results}
+        args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
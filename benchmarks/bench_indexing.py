@@ -0,0 +1,218 @@
+# benchmarks/bench_indexing.py
+"""
+Benchmark du pipeline d'ingestion (rag/indexing.py), étape par étape.
+
+Corpus fixe généré une fois (write_workbooks, seed) : N classeurs .xlsx de R lignes.
+Étapes mesurées, avec les fonctions de production :
+    excel_read   pd.read_excel(sheet_name=None, header=None)
+    detect       doc_loader.detect_columns
+    chunking     doc_loader.create_smart_chunks_from_detected
+    enrichment   sha256 du fichier + indexing._enrich_chunks_with_source_metadata
+    embedding    get_embedding_model().embed_documents, ou EncodingPool (--workers > 1)
+    indexing     elasticsearch_indexer.index_documents_bulk dans un index jetable (--no-index pour l'ignorer)
+
+Pour chaque étape : durée, pic de RSS du process pendant l'étape (échantillonné, inclut la mémoire
+native : torch, onnxruntime, openpyxl) et hausse par rapport au début de l'étape ; débits fichiers/s,
+lignes/s, chunks/s, vecteurs/s pour l'étape et pour le pipeline complet.
+
+Usage :
+    python benchmarks/bench_indexing.py --files 20 --rows 2000 [--embedder hash] [--no-index] \\
+        [--output results/indexing.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks._corpus import HashEmbeddings, write_workbooks  # noqa: E402
+from rag.doc_loader import create_smart_chunks_from_detected, detect_columns  # noqa: E402
+from rag.indexing import (  # noqa: E402
+    EMBEDDING_BATCH_SIZE, EMBEDDING_WORKERS, _enrich_chunks_with_source_metadata, _sha256_file,
+)
+
+STAGES = ["excel_read", "detect", "chunking", "enrichment", "embedding", "indexing"]
+
+
+def _rss_bytes() -> int:
+    """RSS courant (Linux : /proc/self/statm), sinon pic depuis le démarrage (getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageMeter:
+    """Durée cumulée et pic de RSS par étape ; un thread échantillonne la mémoire toutes les interval_s."""
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.seconds = {s: 0.0 for s in STAGES}
+        self.peak = {s: 0 for s in STAGES}
+        self.delta = {s: 0 for s in STAGES}
+        self._current = None
+        self._start_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self._observe()
+
+    def _observe(self) -> None:
+        stage = self._current
+        if stage is not None:
+            rss = _rss_bytes()
+            self.peak[stage] = max(self.peak[stage], rss)
+            self.delta[stage] = max(self.delta[stage], rss - self._start_rss)
+
+    @contextmanager
+    def stage(self, name: str):
+        self._start_rss = _rss_bytes()
+        self._current = name
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - t0
+            self._observe()
+            self._current = None
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run(paths: list[Path], meter: StageMeter, embedder: str, workers: int, index: bool) -> dict:
+    counts = {"files": len(paths), "rows": 0, "chunks": 0, "vectors": 0}
+    all_chunks = []
+    for path in paths:
+        with meter.stage("excel_read"):
+            all_sheets = pd.read_excel(path, sheet_name=None, header=None)
+        counts["rows"] += sum(len(df) for df in all_sheets.values())
+        with meter.stage("detect"):
+            onglets = detect_columns(all_sheets, path.name)
+        with meter.stage("chunking"):
+            chunks = [c for onglet in onglets for c in create_smart_chunks_from_detected(onglet, path.name)]
+        with meter.stage("enrichment"):
+            _enrich_chunks_with_source_metadata(chunks, path, path, _sha256_file(path))
+        all_chunks.extend(chunks)
+    counts["chunks"] = len(all_chunks)
+
+    texts = [doc.page_content for doc in all_chunks]
+    with meter.stage("embedding"):
+        if embedder == "hash":
+            vectors = HashEmbeddings().embed_documents(texts)
+        elif workers > 1:
+            from rag.embeddings import EncodingPool
+
+            with EncodingPool(workers=workers, batch_size=EMBEDDING_BATCH_SIZE) as pool:
+                vectors = pool.embed_documents(texts)
+        else:
+            from rag.embeddings import get_embedding_model
+
+            vectors = get_embedding_model().embed_documents(texts)
+    counts["vectors"] = len(vectors)
+
+    if index:
+        from rag.elasticsearch_indexer import create_index_if_not_exists, get_elastic_client, index_documents_bulk
+
+        es = get_elastic_client()
+        index_name = "rfi_bench_indexing"
+        if es.indices.exists(index=index_name):
+            es.indices.delete(index=index_name)
+        create_index_if_not_exists(es, index_name)
+        try:
+            with meter.stage("indexing"):
+                index_documents_bulk(es, all_chunks, vectors, index_name)
+        finally:
+            es.indices.delete(index=index_name)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Temps et mémoire par étape du pipeline d'indexation")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000, help="Lignes d'exigences par classeur")
+    parser.add_argument("--sheets", type=int, default=2)
+    parser.add_argument("--embedder", choices=["model", "hash"], default="model",
+                        help="model = rag.embeddings (EMBEDDING_BACKEND / service) ; hash = hors ligne")
+    parser.add_argument("--workers", type=int, default=EMBEDDING_WORKERS, help="Process d'encodage (défaut : EMBEDDING_WORKERS)")
+    parser.add_argument("--no-index", action="store_true", help="Ne pas mesurer l'indexation Elasticsearch")
+    parser.add_argument("--corpus-dir", type=Path, default=None, help="Conserver/réutiliser le corpus généré ici")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.corpus_dir or Path(tmp)
+        paths = sorted(directory.glob("RFI_synthetique_*.xlsx"))
+        if len(paths) != args.files:
+            print(f"📝 Génération de {args.files} classeurs × {args.rows} lignes dans {directory}…")
+            paths = write_workbooks(directory, args.files, args.rows, n_sheets=args.sheets, seed=args.seed)
+
+        meter = StageMeter()
+        t0 = time.perf_counter()
+        try:
+            counts = run(paths, meter, args.embedder, args.workers, not args.no_index)
+        finally:
+            meter.close()
+        total_s = time.perf_counter() - t0
+
+    units = {
+        "excel_read": ("files", "rows"),
+        "detect": ("files",),
+        "chunking": ("rows", "chunks"),
+        "enrichment": ("chunks",),
+        "embedding": ("vectors",),
+        "indexing": ("chunks",),
+    }
+    stages = []
+    for name in STAGES:
+        sec = meter.seconds[name]
+        if not sec:
+            continue
+        row = {
+            "stage": name,
+            "seconds": round(sec, 3),
+            "share": round(sec / total_s, 3),
+            "peak_rss_mb": round(meter.peak[name] / 2**20, 1),
+            "delta_rss_mb": round(meter.delta[name] / 2**20, 1),
+            **{f"{u}_per_s": round(counts[u] / sec, 1) for u in units[name]},
+        }
+        stages.append(row)
+        rates = "  ".join(f"{row[f'{u}_per_s']:>10.1f} {u}/s" for u in units[name])
+        print(f"{name:<11} {sec:8.2f} s  ({row['share']:.0%})  pic {row['peak_rss_mb']:7.1f} Mo "
+              f"(+{row['delta_rss_mb']:.1f})  {rates}")
+
+    pipeline = {"seconds": round(total_s, 2), **{f"{u}_per_s": round(n / total_s, 1) for u, n in counts.items()}}
+    print(f"{'total':<11} {total_s:8.2f} s  " + "  ".join(f"{pipeline[f'{u}_per_s']} {u}/s" for u in counts))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            "counts": counts,
+            "stages": stages,
+            "pipeline": pipeline,
+        }
+        args.output.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# benchmarks/bench_retrieval.py
+"""
+Benchmark de la recherche RAG sur corpus RFI synthétiques (10k, 100k, 1M chunks).
+
+Corpus : classeurs synthétiques de la forme des vrais (colonne exigence, colonne réponse,
+colonnes annexes → meta_col_*), passés par rag.doc_loader (detect_columns + chunking métier).
+Requêtes : reformulations « Est-il possible de <action> <objet> ? » ; un chunk est pertinent
+s'il porte le même couple (action, objet) dans son besoin client.
+
+Pour chaque taille, chaque backend et chaque mode de recherche :
+latence (p50/p90/p95/p99), `took` serveur ES, recall@k = |top-k ∩ pertinents| / min(k, |pertinents|).
+
+Backends :
+- numpy : recherche exacte en mémoire (cosinus, même score que le script_score ES), sans service
+- es    : Elasticsearch local (ELASTIC_HOST, conteneur single-node), index dédié rfi_bench_<n>
+Modes :
+- first_stage : search_documents, top-k direct (RERANK_ENABLED=false)
+- rerank      : RETRIEVAL_CANDIDATES candidats → cross-encoder (budget RERANK_BUDGET_MS) → top-k
+
+--embedder hash (HashingVectorizer, déterministe, hors ligne) rend les grandes tailles praticables ;
+--embedder model utilise rag.embeddings.get_embedding_model (EMBEDDING_BACKEND / EMBEDDING_SERVICE_URL).
+
+Usage :
+    python benchmarks/bench_retrieval.py --sizes 10000 100000 1000000 --embedder hash --backends numpy
+    python benchmarks/bench_retrieval.py --sizes 10000 --backends numpy es --modes first_stage rerank \\
+        --output results/retrieval.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks._corpus import ACTIONS, OBJECTS, HashEmbeddings, synthetic_chunks  # noqa: E402
+
+_BESOIN = re.compile(r"Contenu: (.*)")
+
+
+def _embed_corpus(embedder, texts: list[str], batch_size: int = 20000) -> np.ndarray:
+    if isinstance(embedder, HashEmbeddings):
+        return np.vstack([embedder.embed_array(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+    return np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+
+
+def relevance_key(content: str) -> tuple[str, str] | None:
+    """Couple (action, objet) du besoin client d'un chunk (vérité terrain du corpus synthétique)."""
+    m = _BESOIN.search(content)
+    besoin = m.group(1) if m else ""
+    action = next((a for a in ACTIONS if a in besoin), None)
+    obj = next((o for o in OBJECTS if o in besoin), None)
+    return (action, obj) if action and obj else None
+
+
+def make_queries(n: int, seed: int = 0) -> list[tuple[str, tuple[str, str]]]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        action, obj = rng.choice(ACTIONS), rng.choice(OBJECTS)
+        out.append((f"Est-il possible de {action} {obj} ?", (action, obj)))
+    return out
+
+
+class NumpyBackend:
+    """Recherche exacte en mémoire, résultats au format de search_documents_with_stats."""
+
+    name = "numpy"
+
+    def __init__(self, chunks, vectors: np.ndarray):
+        self.chunks = chunks
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)  # en place : 1M × 768 float32 ≈ 3 Go
+        self.vectors = vectors
+
+    def search(self, query_vector, size: int):
+        t0 = time.perf_counter()
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self.vectors @ q
+        size = min(size, len(scores))
+        top = np.argpartition(-scores, size - 1)[:size]
+        top = top[np.argsort(-scores[top])]
+        results = [
+            {"score": float(scores[i]) + 1.0, "content": self.chunks[i].page_content, "metadata": self.chunks[i].metadata}
+            for i in top
+        ]
+        return results, {"client_ms": round((time.perf_counter() - t0) * 1000, 1), "took_ms": None, "hits": len(results)}
+
+    def close(self) -> None:
+        pass
+
+
+class ElasticBackend:
+    """Index Elasticsearch dédié (mapping de production), interrogé via search_documents_with_stats."""
+
+    name = "es"
+
+    def __init__(self, chunks, vectors: np.ndarray, index_name: str, reuse: bool = False, keep: bool = False):
+        from elasticsearch.helpers import streaming_bulk
+        from rag.elasticsearch_indexer import create_index_if_not_exists, get_elastic_client
+
+        self.es = get_elastic_client()
+        self.index_name = index_name
+        self.keep = keep
+        if reuse and self.es.indices.exists(index=index_name) and self.es.count(index=index_name)["count"] == len(chunks):
+            print(f"↪️ Index {index_name} réutilisé ({len(chunks)} documents)")
+            return
+        if self.es.indices.exists(index=index_name):
+            self.es.indices.delete(index=index_name)
+        create_index_if_not_exists(self.es, index_name)
+
+        def actions():
+            for doc, vec in zip(chunks, vectors):
+                yield {
+                    "_index": index_name,
+                    "_id": doc.metadata["chunk_id"],
+                    "_source": {"content": doc.page_content, "embedding": vec.tolist(), **doc.metadata},
+                }
+
+        for ok, item in streaming_bulk(self.es, actions(), chunk_size=500, request_timeout=120, raise_on_error=False):
+            if not ok:
+                print(f"❌ Échec d'indexation : {item}")
+        self.es.indices.refresh(index=index_name)
+
+    def search(self, query_vector, size: int):
+        from rag.elasticsearch_indexer import search_documents_with_stats
+
+        return search_documents_with_stats(self.es, query_vector, self.index_name, size=size)
+
+    def close(self) -> None:
+        if not self.keep:
+            self.es.indices.delete(index=self.index_name)
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    a = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": round(float(a.mean()), 2),
+        **{f"p{p}": round(float(np.percentile(a, p)), 2) for p in (50, 90, 95, 99)},
+    }
+
+
+def run_mode(backend, mode: str, queries, query_vectors, relevant_counts, k: int, candidates: int,
+             budget_ms: float, reranker=None) -> dict:
+    latencies, took, recalls, reranked = [], [], [], 0
+    for (question, key), qv in zip(queries, query_vectors):
+        t0 = time.perf_counter()
+        results, stats = backend.search(qv, candidates if mode == "rerank" else k)
+        if mode == "rerank" and results:
+            results, info = reranker.rerank(question, results, top_k=k, budget_ms=budget_ms)
+            reranked += int(info["reranked"])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if stats.get("took_ms") is not None:
+            took.append(stats["took_ms"])
+        n_rel = relevant_counts.get(key, 0)
+        if n_rel:
+            hits = sum(relevance_key(r["content"]) == key for r in results[:k])
+            recalls.append(hits / min(k, n_rel))
+    row = {
+        "mode": mode,
+        "k": k,
+        "n_queries": len(queries),
+        "latency_ms": _percentiles(latencies),
+        "qps": round(len(latencies) / (sum(latencies) / 1000), 1) if latencies else 0.0,
+        f"recall_at_{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+    }
+    if took:
+        row["es_took_ms"] = _percentiles(took)
+    if mode == "rerank":
+        row["candidates"] = candidates
+        row["reranked_ratio"] = round(reranked / max(1, len(queries)), 3)
+    return row
+
+
+def main() -> None:
+    from rag.rag_system import RERANK_BUDGET_MS, RETRIEVAL_CANDIDATES, RERANK_TOP_K
+
+    parser = argparse.ArgumentParser(description="Latence et recall@k de la recherche RAG sur corpus synthétiques")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", choices=["numpy", "es"], default=["numpy"])
+    parser.add_argument("--modes", nargs="+", choices=["first_stage", "rerank"], default=["first_stage"])
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension des vecteurs hash (768 = mapping ES)")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=RERANK_TOP_K)
+    parser.add_argument("--candidates", type=int, default=RETRIEVAL_CANDIDATES)
+    parser.add_argument("--rerank-budget-ms", type=float, default=RERANK_BUDGET_MS)
+    parser.add_argument("--reuse-index", action="store_true", help="Réutiliser rfi_bench_<n> s'il est complet")
+    parser.add_argument("--keep-index", action="store_true", help="Ne pas supprimer l'index ES en fin de run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.embedder == "hash":
+        embedder = HashEmbeddings(args.dim)
+    else:
+        from rag.embeddings import get_embedding_model
+
+        embedder = get_embedding_model()
+    reranker = None
+    if "rerank" in args.modes:
+        from rag.reranking import get_reranker
+
+        reranker = get_reranker()
+        if reranker is None:
+            parser.error("mode rerank demandé mais reranker indisponible")
+
+    queries = make_queries(args.n_queries, seed=args.seed + 1)
+    query_vectors = [embedder.embed_query(q) for q, _ in queries]
+
+    results = []
+    for n in args.sizes:
+        t0 = time.perf_counter()
+        chunks = synthetic_chunks(n, seed=args.seed)
+        for doc in chunks:
+            doc.metadata["obsolete"] = False
+        corpus_s = time.perf_counter() - t0
+        relevant_counts: dict = {}
+        for doc in chunks:
+            key = relevance_key(doc.page_content)
+            relevant_counts[key] = relevant_counts.get(key, 0) + 1
+
+        t0 = time.perf_counter()
+        vectors = _embed_corpus(embedder, [c.page_content for c in chunks])
+        embed_s = time.perf_counter() - t0
+        print(f"📄 {len(chunks)} chunks (doc_loader {corpus_s:.1f} s, embeddings {embed_s:.1f} s)")
+
+        for name in args.backends:
+            t0 = time.perf_counter()
+            if name == "numpy":
+                backend = NumpyBackend(chunks, vectors)
+            else:
+                backend = ElasticBackend(chunks, vectors, f"rfi_bench_{n}", reuse=args.reuse_index, keep=args.keep_index)
+            index_s = time.perf_counter() - t0
+            try:
+                for q in query_vectors[:5]:  # warm-up (caches ES / BLAS)
+                    backend.search(q, args.k)
+                for mode in args.modes:
+                    row = run_mode(backend, mode, queries, query_vectors, relevant_counts, args.k,
+                                   args.candidates, args.rerank_budget_ms, reranker)
+                    row = {"n_chunks": len(chunks), "backend": name, "embedder": args.embedder,
+                           "corpus_s": round(corpus_s, 2), "embed_s": round(embed_s, 2),
+                           "index_s": round(index_s, 2), **row}
+                    results.append(row)
+                    lat = row["latency_ms"]
+                    print(
+                        f"{len(chunks):>8} {name:<6} {mode:<12} p50 {lat['p50']:8.2f} ms  p95 {lat['p95']:8.2f} ms  "
+                        f"p99 {lat['p99']:8.2f} ms  recall@{args.k} {row[f'recall_at_{args.k}']}"
+                    )
+            finally:
+                backend.close()
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            "results": results,
+        }
+        args.output.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/bench_startup.py
+"""
+Benchmark du démarrage à froid de l'application Streamlit.
+
+- Profil d'import (`python -X importtime`) de chaque point d'entrée, dans un
+  interpréteur neuf : temps cumulé, imports les plus coûteux, et présence des
+  dépendances lourdes (torch, langchain, transformers, sklearn…) qui ne
+  doivent PAS être chargées avant la connexion.
+- "First paint" : exécution à froid du script de page via `streamlit.testing`
+  (AppTest), sans utilisateur connecté.
+
+Usage :
+    python benchmarks/bench_startup.py [--output results/startup.json] [--profiles-dir results/importtime]
+
+Les profils bruts (`*.importtime.txt`) sont lisibles par `tuna`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = REPO_ROOT / "app"
+
+# Modules qui ne doivent être importés qu'à la demande
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "langchain",
+                 "langchain_community", "langchain_mistralai", "sklearn", "matplotlib"]
+
+# Points d'entrée profilés (code exécuté à l'import d'une page, avant connexion)
+IMPORT_TARGETS = {
+    "utils_docs": "import utils_docs",
+    "rag.elasticsearch_indexer": "import rag.elasticsearch_indexer",
+    "rag.embeddings": "import rag.embeddings",
+    "analytics.user_behavior": "import analytics.user_behavior",
+    "rag.rag_system": "import rag.rag_system",
+}
+
+PAGES = [
+    "app/streamlit_app.py",
+    "app/pages/1_consultation_RAG.py",
+    "app/pages/2_chargement_Documents.py",
+    "app/pages/3_analyse_utilisateurs.py",
+    "app/pages/4_utilitaire_documentaire.py",
+]
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # même PYTHONPATH que les conteneurs (/:/app)
+    env["PYTHONPATH"] = os.pathsep.join([str(REPO_ROOT), str(APP_DIR), env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    return env
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Parse la sortie de `-X importtime` → [{module, self_us, cumulative_us, depth}]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, payload = line.split(":", 1)
+            self_us, cumul_us, name = payload.split("|", 2)
+            depth = (len(name) - len(name.lstrip(" "))) // 2
+            rows.append({
+                "module": name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumul_us),
+                "depth": depth,
+            })
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_import(label: str, statement: str, profiles_dir: Path | None, top_n: int = 15) -> dict:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=str(REPO_ROOT), env=_env(), capture_output=True, text=True,
+    )
+    wall_s = time.perf_counter() - t0
+
+    if profiles_dir is not None:
+        profiles_dir.mkdir(parents=True, exist_ok=True)
+        (profiles_dir / f"{label}.importtime.txt").write_text(proc.stderr, encoding="utf-8")
+
+    rows = parse_importtime(proc.stderr)
+    loaded = {r["module"].split(".")[0] for r in rows}
+    top_level = [r for r in rows if r["depth"] == 0]
+    return {
+        "target": label,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "wall_s": round(wall_s, 3),
+        "import_total_ms": round(sum(r["cumulative_us"] for r in top_level) / 1000, 1),
+        "heavy_loaded": sorted(m for m in HEAVY_MODULES if m in loaded),
+        "top_imports": [
+            {"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)}
+            for r in sorted(top_level, key=lambda r: r["cumulative_us"], reverse=True)[:top_n]
+        ],
+    }
+
+
+def first_paint(page: str, timeout: float = 120.0) -> dict:
+    """Exécute la page à froid (session non connectée) dans un process neuf et mesure le temps de rendu."""
+    code = (
+        "import time, json\n"
+        "t0 = time.perf_counter()\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "t1 = time.perf_counter()\n"
+        f"at = AppTest.from_file({page!r}, default_timeout={timeout})\n"
+        "at.run()\n"
+        "t2 = time.perf_counter()\n"
+        "print(json.dumps({'streamlit_import_s': t1 - t0, 'script_run_s': t2 - t1,"
+        " 'exceptions': [str(e.value) for e in at.exception]}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=str(REPO_ROOT), env=_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"page": page, "ok": False, "error": proc.stderr.strip().splitlines()[-1:]}
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "page": page,
+        "ok": not out["exceptions"],
+        "streamlit_import_s": round(out["streamlit_import_s"], 3),
+        "script_run_s": round(out["script_run_s"], 3),
+        "exceptions": out["exceptions"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profil d'import et first paint des pages APSALIA")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON de résultats")
+    parser.add_argument("--profiles-dir", type=Path, default=None, help="Dossier des profils importtime bruts")
+    parser.add_argument("--skip-pages", action="store_true", help="Ne pas mesurer le first paint (AppTest)")
+    args = parser.parse_args()
+
+    results = {
+        "python": sys.version.split()[0],
+        "imports": [profile_import(label, stmt, args.profiles_dir) for label, stmt in IMPORT_TARGETS.items()],
+        "pages": [] if args.skip_pages else [first_paint(p) for p in PAGES],
+    }
+
+    for r in results["imports"]:
+        if not r["ok"]:
+            print(f"{r['target']:<28} ÉCHEC {r['error']}")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "—"
+        print(f"{r['target']:<28} {r['import_total_ms']:>9.1f} ms  lourds: {heavy}")
+    for r in results["pages"]:
+        if r.get("ok"):
+            print(f"{r['page']:<40} run {r['script_run_s']:.3f} s")
+        else:
+            print(f"{r['page']:<40} ÉCHEC {r.get('error') or r.get('exceptions')}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
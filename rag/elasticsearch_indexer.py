@@ -2,16 +2,25 @@
 Module d'indexation Elasticsearch adapté pour Docker
 """
 
+from __future__ import annotations
+
 import os
-from typing import List, Dict, Any
+import time
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
-from langchain.schema import Document
 import urllib3
 
+from rag.log import get_logger
+
+if TYPE_CHECKING:  # uniquement pour les annotations : évite de charger langchain à l'import
+    from langchain.schema import Document
+
 # Désactiver les warnings SSL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+logger = get_logger("rag.elasticsearch_indexer")
+
 def get_elastic_client():
     host = os.getenv("ELASTIC_HOST", "http://elasticsearch:9200")
     user = os.getenv("ELASTIC_USERNAME", "elastic")
@@ -29,7 +38,7 @@ def get_elastic_client():
         raise ConnectionError(
             f"Ping Elasticsearch échoué sur {host} avec user '{user}'"
         )
-    print(f"✅ Connexion réussie à Elasticsearch: {host}")
+    logger.info("Connexion réussie à Elasticsearch", extra={"host": host})
     return es
 
 def create_index_if_not_exists(es: Elasticsearch, index_name: str) -> bool:
@@ -38,7 +47,7 @@ def create_index_if_not_exists(es: Elasticsearch, index_name: str) -> bool:
     """
     
     if es.indices.exists(index=index_name):
-        print(f"ℹ️ Index '{index_name}' existe déjà")
+        logger.info("Index existant", extra={"index": index_name})
         return True
     
     # Mapping optimisé pour le RAG eQMS
@@ -114,10 +123,10 @@ def create_index_if_not_exists(es: Elasticsearch, index_name: str) -> bool:
     
     try:
         response = es.indices.create(index=index_name, body=mapping)
-        print(f"✅ Index '{index_name}' créé avec succès")
+        logger.info("Index créé", extra={"index": index_name})
         return True
-    except Exception as e:
-        print(f"❌ Erreur création index '{index_name}': {e}")
+    except Exception:
+        logger.exception("Erreur création index", extra={"index": index_name})
         return False
 
 def index_documents_bulk(es: Elasticsearch, documents: List[Document], vectors: List[List[float]], index_name: str) -> bool:
@@ -128,7 +137,7 @@ def index_documents_bulk(es: Elasticsearch, documents: List[Document], vectors:
     if len(documents) != len(vectors):
         raise ValueError(f"Nombre de documents ({len(documents)}) != nombre de vecteurs ({len(vectors)})")
     
-    print(f"📤 Indexation bulk de {len(documents)} documents dans '{index_name}'...")
+    logger.info("Indexation bulk", extra={"index": index_name, "documents": len(documents)})
     
     # Préparer les documents pour bulk
     bulk_docs = []
@@ -150,28 +159,34 @@ def index_documents_bulk(es: Elasticsearch, documents: List[Document], vectors:
     
     try:
         # Indexation bulk avec chunks plus petits pour Docker
+        t0 = time.perf_counter()
         success, failed = bulk(es, bulk_docs, chunk_size=100, request_timeout=120)
-        
-        print(f"✅ Indexation bulk terminée:")
-        print(f"   Succès: {success}")
-        print(f"   Échecs: {len(failed) if failed else 0}")
+        bulk_ms = round((time.perf_counter() - t0) * 1000, 1)
         
         # Forcer le refresh
+        t0 = time.perf_counter()
         es.indices.refresh(index=index_name)
+        refresh_ms = round((time.perf_counter() - t0) * 1000, 1)
         
         # Vérifier le nombre de documents
         count_response = es.count(index=index_name)
-        print(f"   Total documents dans l'index: {count_response['count']}")
+        logger.info("Indexation bulk terminée", extra={
+            "index": index_name, "succeeded": success, "failed": len(failed) if failed else 0,
+            "index_count": count_response["count"], "bulk_ms": bulk_ms, "refresh_ms": refresh_ms,
+        })
         
         return len(failed) == 0 if failed else True
         
-    except Exception as e:
-        print(f"❌ Erreur indexation bulk: {e}")
+    except Exception:
+        logger.exception("Erreur indexation bulk", extra={"index": index_name})
         return False
 
-def search_documents(es: Elasticsearch, query_vector: List[float], index_name: str, size: int = 5) -> List[Dict]:
+def search_documents_with_stats(
+    es: Elasticsearch, query_vector: List[float], index_name: str, size: int = 5
+) -> Tuple[List[Dict], Dict[str, Any]]:
     """
-    Recherche de documents similaires par vecteur
+    Recherche de documents similaires par vecteur, avec les temps mesurés :
+    client_ms (aller-retour vu par l'application) et took_ms (temps serveur rapporté par ES).
     """
     
     search_body = {
@@ -195,8 +210,12 @@ def search_documents(es: Elasticsearch, query_vector: List[float], index_name: s
     }
 }
     
+    stats: Dict[str, Any] = {"client_ms": None, "took_ms": None, "hits": 0}
+    t0 = time.perf_counter()
     try:
         response = es.search(index=index_name, body=search_body)
+        stats["client_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        stats["took_ms"] = response.get("took")
         
         results = []
         for hit in response['hits']['hits']:
@@ -205,12 +224,21 @@ def search_documents(es: Elasticsearch, query_vector: List[float], index_name: s
                 'content': hit['_source']['content'],
                 'metadata': {k: v for k, v in hit['_source'].items() if k != 'content'}
             })
+        stats["hits"] = len(results)
+        logger.debug("Recherche ES", extra={"index": index_name, "size": size, **stats})
         
-        return results
+        return results, stats
         
-    except Exception as e:
-        print(f"❌ Erreur recherche: {e}")
-        return []
+    except Exception:
+        stats["client_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        logger.exception("Erreur recherche", extra={"index": index_name, "client_ms": stats["client_ms"]})
+        return [], stats
+
+def search_documents(es: Elasticsearch, query_vector: List[float], index_name: str, size: int = 5) -> List[Dict]:
+    """
+    Recherche de documents similaires par vecteur
+    """
+    return search_documents_with_stats(es, query_vector, index_name, size)[0]
 
 def get_index_stats(es: Elasticsearch, index_name: str) -> Dict[str, Any]:
     """
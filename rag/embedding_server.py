@@ -0,0 +1,175 @@
+"""
+Service d'embeddings local partagé (app + indexer) : un seul modèle chargé par hôte.
+
+API HTTP (JSON) :
+- POST /embed   {"texts": ["...", ...]}  → {"embeddings": [[...], ...], "dim": 768}
+- GET  /health                           → {"status": "ok", "backend": ..., "stats": {...}}
+
+Les requêtes concurrentes sont regroupées (micro-batching dynamique) : un thread
+unique accumule les textes pendant au plus EMBED_MAX_WAIT_MS ou jusqu'à
+EMBED_MAX_BATCH textes, puis encode le tout en un seul appel au modèle. Si ce
+batch échoue, chaque requête est réencodée seule : une requête invalide n'échoue
+qu'elle-même. Le client (RemoteEmbeddings) découpe ses envois à EMBED_MAX_BATCH.
+
+Lancement :
+    python /rag/embedding_server.py --host 0.0.0.0 --port 8600
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+from rag.embeddings import EMBED_MAX_BATCH, get_embedding_model
+from rag.log import get_logger
+
+logger = get_logger("rag.embedding_server")  # nom explicite : lancé en script, __name__ vaut "__main__"
+
+
+class MicroBatcher:
+    """Regroupe les demandes d'encodage concurrentes en batchs (un seul thread appelle le modèle)."""
+
+    def __init__(self, model, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "encode_s": 0.0, "batch_retries": 0, "failed_requests": 0}
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        fut: Future = Future()
+        self._queue.put((texts, fut))
+        return fut
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        pending = [self._queue.get()]
+        n_texts = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait_s
+        while n_texts < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n_texts += len(item[0])
+        return pending
+
+    def _encode_each(self, pending: List[Tuple[List[str], Future]]) -> None:
+        """Repli après l'échec d'un batch : une requête à la fois, l'erreur ne touche que la sienne."""
+        self.stats["batch_retries"] += 1
+        for batch, fut in pending:
+            try:
+                vectors = self.model.embed_documents(batch) if batch else []
+            except Exception as e:
+                self.stats["failed_requests"] += 1
+                fut.set_exception(e)
+            else:
+                fut.set_result(vectors)
+
+    def _loop(self) -> None:
+        while True:
+            pending = self._collect()
+            texts = [t for batch, _ in pending for t in batch]
+            t0 = time.perf_counter()
+            self.stats["requests"] += len(pending)
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += 1
+            try:
+                vectors = self.model.embed_documents(texts) if texts else []
+            except Exception as e:
+                if len(pending) > 1:
+                    self._encode_each(pending)
+                else:
+                    self.stats["failed_requests"] += 1
+                    pending[0][1].set_exception(e)
+                self.stats["encode_s"] += time.perf_counter() - t0
+                continue
+            self.stats["encode_s"] += time.perf_counter() - t0
+
+            start = 0
+            for batch, fut in pending:
+                fut.set_result(vectors[start:start + len(batch)])
+                start += len(batch)
+
+
+def make_handler(batcher: MicroBatcher, backend: str, request_timeout: float):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/health":
+                self._send_json(200, {"status": "ok", "backend": backend, "stats": batcher.stats})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/embed":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                texts = json.loads(self.rfile.read(length) or b"{}").get("texts")
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("'texts' doit être une liste de chaînes")
+            except Exception as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            try:
+                vectors = batcher.submit(texts).result(timeout=request_timeout)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, {"embeddings": vectors, "dim": len(vectors[0]) if vectors else 0})
+
+        def log_message(self, format, *args):  # pas de log par requête (volume)
+            pass
+
+    return EmbeddingHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Service d'embeddings partagé (micro-batching)")
+    parser.add_argument("--host", default=os.getenv("EMBED_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("EMBED_PORT", "8600")))
+    parser.add_argument("--backend", default=os.getenv("EMBEDDING_BACKEND", "torch"))
+    parser.add_argument("--max-batch", type=int, default=EMBED_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("EMBED_MAX_WAIT_MS", "5")))
+    parser.add_argument("--request-timeout", type=float, default=float(os.getenv("EMBED_REQUEST_TIMEOUT", "300")))
+    args = parser.parse_args()
+
+    logger.info("Chargement du modèle d'embeddings", extra={"backend": args.backend})
+    model = get_embedding_model(args.backend)
+    batcher = MicroBatcher(model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher, args.backend, args.request_timeout))
+    server.daemon_threads = True
+    logger.info("Service d'embeddings prêt", extra={"url": f"http://{args.host}:{args.port}",
+                                                     "max_batch": args.max_batch, "max_wait_ms": args.max_wait_ms})
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,313 @@
-from langchain.embeddings import HuggingFaceEmbeddings
+"""
+Modèles d'embeddings (interface LangChain : embed_query / embed_documents).
 
-def get_embedding_model():
-    return HuggingFaceEmbeddings(model_name="sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+Backends sélectionnables via EMBEDDING_BACKEND :
+- "torch" (défaut) : HuggingFaceEmbeddings / sentence-transformers, fp32 PyTorch
+- "onnx"           : ONNX Runtime, modèle exporté puis quantifié int8 (dynamique)
+- "remote"         : client du service d'embeddings partagé (rag/embedding_server.py) ;
+                     choisi automatiquement si EMBEDDING_SERVICE_URL est défini
+
+Les modèles locaux sont chargés une seule fois par process et partagés
+(sessions / pages Streamlit).
+
+EncodingPool répartit l'encodage de gros corpus sur plusieurs process, sur option
+(EMBEDDING_WORKERS : 1 par défaut, nombre ou "auto" ; EMBEDDING_BATCH_SIZE).
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from .log import get_logger
+
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+# max_seq_length du modèle sentence-transformers (tronque au même endroit que le backend torch)
+MAX_SEQ_LENGTH = 128
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "").rstrip("/")
+# taille de batch du service (micro-batching) ; le client découpe ses envois à la même taille
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+ONNX_CACHE_DIR = Path(os.getenv("ONNX_CACHE_DIR", str(Path(os.getenv("HF_HOME", "~/.cache/huggingface")) / "onnx"))).expanduser()
+
+logger = get_logger("rag.embeddings")
+
+
+class OnnxEmbeddings:
+    """
+    Embeddings via ONNX Runtime sur CPU, même interface que HuggingFaceEmbeddings.
+    - export ONNX (optimum) + quantification int8 dynamique, faits une seule fois puis mis en cache disque
+    - mean pooling sur le masque d'attention (identique à sentence-transformers pour ce modèle)
+    - textes triés par longueur avant découpage en batchs (moins de padding), ordre restitué en sortie
+    """
+
+    def __init__(
+        self,
+        model_name: str = MODEL_NAME,
+        cache_dir: Path = ONNX_CACHE_DIR,
+        quantize: bool = True,
+        batch_size: int = 32,
+        max_length: int = MAX_SEQ_LENGTH,
+        num_threads: int | None = None,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = max(1, int(batch_size))
+        self.max_length = int(max_length)
+
+        model_dir = Path(cache_dir) / model_name.replace("/", "__")
+        onnx_file = self._prepare_onnx(model_name, model_dir, quantize)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = num_threads or int(os.getenv("ONNX_NUM_THREADS", "0"))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(onnx_file), sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _prepare_onnx(model_name: str, model_dir: Path, quantize: bool) -> Path:
+        """Exporte (et quantifie) le modèle au premier appel ; réutilise le cache ensuite."""
+        fp32_file = model_dir / "model.onnx"
+        int8_file = model_dir / "model_quantized.onnx"
+
+        if not fp32_file.exists():
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+
+            logger.info("Export ONNX du modèle", extra={"model": model_name, "model_dir": str(model_dir)})
+            model_dir.mkdir(parents=True, exist_ok=True)
+            ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(str(model_dir))
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(str(model_dir))
+
+        if not quantize:
+            return fp32_file
+
+        if not int8_file.exists():
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            logger.info("Quantification int8 dynamique du modèle ONNX", extra={"model_dir": str(model_dir)})
+            quantizer = ORTQuantizer.from_pretrained(str(model_dir), file_name=fp32_file.name)
+            qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=str(model_dir), quantization_config=qconfig)
+
+        return int8_file
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self._input_names}
+        token_embeddings = self.session.run(None, feeds)[0]           # (batch, seq, dim)
+        mask = enc["attention_mask"][..., None].astype(np.float32)    # (batch, seq, 1)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return summed / counts
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [t.replace("\n", " ") for t in texts]
+        if not texts:
+            return []
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        parts = []
+        for start in range(0, len(texts), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            parts.append((idx, self._encode_batch([texts[i] for i in idx])))
+        out = np.empty((len(texts), parts[0][1].shape[1]), dtype=np.float32)
+        for idx, vecs in parts:
+            out[idx] = vecs
+        return out.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class RemoteEmbeddings:
+    """
+    Client du service d'embeddings partagé (même interface que les modèles locaux).
+    Les gros appels embed_documents sont découpés en requêtes de `batch_size` textes
+    (EMBED_MAX_BATCH, la taille de batch du service) pour laisser le service
+    intercaler les requêtes de consultation.
+    """
+
+    def __init__(self, url: str = EMBEDDING_SERVICE_URL, batch_size: int = EMBED_MAX_BATCH, timeout: float = 300.0):
+        import requests
+
+        if not url:
+            raise ValueError("EMBEDDING_SERVICE_URL non défini pour le backend 'remote'")
+        self.url = url.rstrip("/")
+        self.batch_size = int(batch_size)
+        self.timeout = float(timeout)
+        self._session = requests.Session()
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        resp = self._session.post(f"{self.url}/embed", json={"texts": texts}, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Service d'embeddings {self.url} : HTTP {resp.status_code} — {resp.text[:200]}")
+        return resp.json()["embeddings"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            out.extend(self._embed(texts[start:start + self.batch_size]))
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+class _SharedEmbeddings:
+    """
+    Modèle local partagé entre threads (sessions Streamlit) : les appels sont
+    sérialisés, les tokenizers "fast" ne supportant pas l'accès concurrent.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            return self.model.embed_query(text)
+
+
+@lru_cache(maxsize=None)
+def _load_local_model(backend: str):
+    if backend == "onnx":
+        model = OnnxEmbeddings(quantize=os.getenv("ONNX_QUANTIZE", "true").lower() in {"1", "true", "yes", "y"})
+    elif backend == "torch":
+        # import différé : langchain + sentence-transformers (torch) ne sont chargés qu'au premier appel
+        from langchain.embeddings import HuggingFaceEmbeddings
+
+        model = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    else:
+        raise ValueError(f"Backend d'embeddings inconnu: {backend!r} (attendu: 'torch', 'onnx' ou 'remote')")
+    return _SharedEmbeddings(model)
+
+
+def get_embedding_model(backend: str | None = None):
+    """
+    Retourne le modèle d'embeddings du backend demandé.
+    Sans backend explicite : client du service partagé si EMBEDDING_SERVICE_URL est défini,
+    sinon EMBEDDING_BACKEND (modèle local, une instance par process).
+    """
+    if backend is None:
+        backend = "remote" if EMBEDDING_SERVICE_URL else EMBEDDING_BACKEND
+    backend = backend.lower()
+
+    if backend == "remote":
+        return RemoteEmbeddings()
+    return _load_local_model(backend)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pool multi-process pour l'ingestion
+# ────────────────────────────────────────────────────────────────────────────────
+_WORKER_MODEL = None
+# plafond de "auto" : chaque worker charge sa propre copie du modèle
+EMBEDDING_AUTO_MAX_WORKERS = int(os.getenv("EMBEDDING_AUTO_MAX_WORKERS", "4"))
+
+
+def _available_cpus() -> int:
+    """Cœurs utilisables par le process (affinité / cpuset du conteneur), pas ceux de l'hôte."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # hors Linux
+        return os.cpu_count() or 1
+
+
+def encoding_workers(value: str | None = None) -> int:
+    """
+    Nb de process d'encodage : EMBEDDING_WORKERS entier (1 par défaut : pas de pool),
+    ou "auto" = un par cœur disponible, plafonné à EMBEDDING_AUTO_MAX_WORKERS.
+    """
+    value = (value if value is not None else os.getenv("EMBEDDING_WORKERS", "1")).strip().lower()
+    if value == "auto":
+        return max(1, min(_available_cpus(), EMBEDDING_AUTO_MAX_WORKERS))
+    return max(1, int(value or 1))
+
+
+def _pool_worker_init(backend: str, num_threads: int) -> None:
+    """Initialisation d'un worker : threads BLAS/torch bornés puis chargement du modèle (une fois)."""
+    global _WORKER_MODEL
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["ONNX_NUM_THREADS"] = str(num_threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(num_threads)
+    _WORKER_MODEL = get_embedding_model(backend)
+
+
+def _pool_encode(texts: List[str]) -> List[List[float]]:
+    return _WORKER_MODEL.embed_documents(texts)
+
+
+class EncodingPool:
+    """
+    Encodage parallèle sur N process, même interface que les modèles (embed_documents / embed_query).
+    - batchs construits par longueur de texte (bucketing) → moins de padding par batch
+    - batchs les plus longs soumis en premier pour équilibrer la charge entre workers
+    - ordre de sortie identique à l'ordre d'entrée
+    - à utiliser comme context manager (ou appeler close()) pour arrêter proprement les workers
+
+    Chaque worker charge sa copie du modèle : prévoir la mémoire en conséquence.
+    """
+
+    def __init__(self, workers: int | None = None, batch_size: int | None = None, backend: str | None = None):
+        cpu = _available_cpus()
+        self.workers = max(1, int(workers or encoding_workers("auto")))
+        self.batch_size = max(1, int(batch_size or os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+        self.backend = (backend or EMBEDDING_BACKEND).lower()
+        threads = max(1, cpu // self.workers)
+        # "spawn" : pas de fork d'un process qui a déjà des threads (torch, tokenizers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_pool_worker_init,
+            initargs=(self.backend, threads),
+        )
+
+    def _batches(self, texts: List[str]) -> Iterator[Tuple[np.ndarray, List[str]]]:
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        for idx in reversed(batches):  # les plus longs d'abord
+            yield idx, [texts[i] for i in idx]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        submitted = [(idx, self._executor.submit(_pool_encode, batch)) for idx, batch in self._batches(texts)]
+        out: List[List[float]] = [None] * len(texts)
+        for idx, future in submitted:
+            for i, vec in zip(idx, future.result()):
+                out[i] = vec
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._executor.submit(_pool_encode, [text]).result()[0]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "EncodingPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -2,15 +2,17 @@ import os
 from pathlib import Path
 import hashlib
 import shutil
+import time
 import pandas as pd
 
 from rag.doc_loader import detect_columns, create_smart_chunks_from_detected
-from rag.embeddings import get_embedding_model
+from rag.embeddings import get_embedding_model, encoding_workers, EncodingPool, EMBEDDING_SERVICE_URL
 from rag.elasticsearch_indexer import (
     get_elastic_client,
     create_index_if_not_exists,
     index_documents_bulk,
 )
+from rag.log import LOG_SLOW_INGESTION_MS, StageTimer, correlation_scope, get_logger
 
 # === 🔧 CONFIGURATION ===
 # indexing.py est placé dans /rag (racine du code dans le conteneur)
@@ -25,6 +27,15 @@ SOURCE_STORE_DIR = Path(os.getenv("SOURCE_STORE_DIR", "/data/source_store"))
 # Contrôle de la suppression de l'index (par défaut: False)
 REINDEX_DROP = os.getenv("REINDEX_DROP", "false").lower() in {"1", "true", "yes", "y"}
 
+# Encodage : nb de process et taille des batchs.
+# 1 (défaut) : service partagé s'il est défini (EMBEDDING_SERVICE_URL, modèle chargé une fois par hôte),
+# sinon modèle local. Plus d'un worker ou "auto" (sur option) : pool local, prioritaire sur le service,
+# avec une copie du modèle par process.
+EMBEDDING_WORKERS = encoding_workers()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+logger = get_logger("rag.indexing")
+
 
 def _sha256_file(path: Path) -> str:
     h = hashlib.sha256()
@@ -69,26 +80,36 @@ def _enrich_chunks_with_source_metadata(chunks, file_path: Path, stored_path: Pa
 
 
 def main() -> None:
-    # === 🚀 INITIALISATION (faites ici pour éviter les effets à l'import) ===
-    print("🔌 Connexion Elasticsearch…")
-    es = get_elastic_client()
+    # Un identifiant de corrélation par run : toutes les lignes du journal de ce run le portent
+    with correlation_scope():
+        timer = StageTimer(logger, "ingestion", LOG_SLOW_INGESTION_MS)
+        logger.info("Début de l'indexation", extra={"docs_dir": str(DOCS_DIR), "index": INDEX_NAME})
+        try:
+            n_files, n_chunks = _run(timer)
+        except Exception:
+            logger.exception("Indexation interrompue", extra={"stages": timer.durations})
+            raise
+        timer.finish(files=n_files, chunks=n_chunks)
+
 
-    print("🧠 Chargement du modèle d'embeddings…")
-    embedding_model = get_embedding_model()
+def _run(timer: StageTimer):
+    """Pipeline d'indexation ; retourne (nb de fichiers traités, nb de chunks indexés)."""
+    # === 🚀 INITIALISATION (faites ici pour éviter les effets à l'import) ===
+    with timer.stage("connect"):
+        es = get_elastic_client()
 
     # === 🧹 GESTION DE L'INDEX ===
-    if REINDEX_DROP:
-        print(f"🧹 Suppression de l'index existant '{INDEX_NAME}' (REINDEX_DROP=true)…")
-        if es.indices.exists(index=INDEX_NAME):
-            es.indices.delete(index=INDEX_NAME)
-            print(f"   Index '{INDEX_NAME}' supprimé.")
+    with timer.stage("index_setup"):
+        if REINDEX_DROP:
+            if es.indices.exists(index=INDEX_NAME):
+                es.indices.delete(index=INDEX_NAME)
+                logger.info("Index existant supprimé (REINDEX_DROP=true)", extra={"index": INDEX_NAME})
+            else:
+                logger.info("Index inexistant, rien à supprimer (REINDEX_DROP=true)", extra={"index": INDEX_NAME})
         else:
-            print(f"   Index '{INDEX_NAME}' inexistant, rien à supprimer.")
-    else:
-        print("ℹ️ REINDEX_DROP=false → on ne supprime pas l'index existant.")
+            logger.info("REINDEX_DROP=false : index existant conservé", extra={"index": INDEX_NAME})
 
-    create_index_if_not_exists(es, INDEX_NAME)
-    print(f"✅ Index prêt : {INDEX_NAME}")
+        create_index_if_not_exists(es, INDEX_NAME)
 
     # === 📂 CHARGEMENT & PRÉPARATION DES DOCUMENTS ===
     if not DOCS_DIR.exists():
@@ -100,61 +121,79 @@ def main() -> None:
     SOURCE_STORE_DIR.mkdir(parents=True, exist_ok=True)
 
     all_chunks = []
+    n_files = 0
     xlsx_files = list(DOCS_DIR.glob("*.xlsx"))
     if not xlsx_files:
-        print(f"⚠️ Aucun fichier .xlsx trouvé dans {DOCS_DIR}")
+        logger.warning("Aucun fichier .xlsx trouvé", extra={"docs_dir": str(DOCS_DIR)})
 
     for filepath in xlsx_files:
-        print(f"\n📄 Fichier : {filepath.name}")
+        t_file = time.perf_counter()
 
         # 1) Copie du fichier natif (idempotente) + calcul du SHA
-        sha = _sha256_file(filepath)
-        stored_name = f"{sha}__{filepath.name}"
-        stored_path = SOURCE_STORE_DIR / stored_name
-        if not stored_path.exists():
-            stored_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(str(filepath), str(stored_path))
-            print(f"📥 Copie du fichier source → {stored_path}")
-        else:
-            print(f"↪️ Copie déjà présente : {stored_path.name}")
+        with timer.stage("source_copy", file=filepath.name):
+            sha = _sha256_file(filepath)
+            stored_name = f"{sha}__{filepath.name}"
+            stored_path = SOURCE_STORE_DIR / stored_name
+            copied = not stored_path.exists()
+            if copied:
+                stored_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(str(filepath), str(stored_path))
 
         # 2) Détection de la structure (doc_loader) — si non détectée, on IGNORE le fichier
         try:
-            all_sheets = pd.read_excel(filepath, sheet_name=None, header=None)
-            onglets_exploitables = detect_columns(all_sheets, filepath.name)
-        except Exception as e:
-            print(f"❌ Erreur lors de la détection de structure pour {filepath.name} : {e}")
-            print("⛔ Fichier ignoré (structure non conforme).")
+            with timer.stage("excel_read", file=filepath.name):
+                all_sheets = pd.read_excel(filepath, sheet_name=None, header=None)
+            with timer.stage("detect", file=filepath.name):
+                onglets_exploitables = detect_columns(all_sheets, filepath.name)
+        except Exception:
+            logger.exception("Structure non conforme : fichier ignoré", extra={"file": filepath.name})
             continue
 
         # 3) Chunking métier + enrichissement des métadonnées de traçabilité
+        file_chunks = []
         try:
             for onglet_data in onglets_exploitables:
-                chunks = create_smart_chunks_from_detected(onglet_data, filepath.name)
+                with timer.stage("chunking", file=filepath.name):
+                    chunks = create_smart_chunks_from_detected(onglet_data, filepath.name)
                 if not chunks:
                     continue
-                _enrich_chunks_with_source_metadata(chunks, filepath, stored_path, sha)
-                all_chunks.extend(chunks)
-        except Exception as e:
-            print(f"❌ Erreur lors de la création des chunks pour {filepath.name} : {e}")
-            print("⛔ Fichier ignoré (échec du traitement métier).")
+                with timer.stage("enrichment", file=filepath.name):
+                    _enrich_chunks_with_source_metadata(chunks, filepath, stored_path, sha)
+                file_chunks.extend(chunks)
+        except Exception:
+            logger.exception("Échec du traitement métier : fichier ignoré", extra={"file": filepath.name})
             continue
 
-    print(f"\n✅ Total de chunks détectés : {len(all_chunks)}")
+        all_chunks.extend(file_chunks)
+        n_files += 1
+        logger.info("Fichier traité", extra={
+            "file": filepath.name, "source_copied": copied, "sheets": len(onglets_exploitables),
+            "chunks": len(file_chunks), "duration_ms": round((time.perf_counter() - t_file) * 1000, 1),
+        })
+
+    logger.info("Chunks détectés", extra={"files": n_files, "chunks": len(all_chunks)})
 
     if not all_chunks:
-        print("ℹ️ Aucun chunk à indexer. Fin.")
-        return
+        logger.info("Aucun chunk à indexer")
+        return n_files, 0
 
     # === 🧠 EMBEDDINGS ===
-    print("🔄 Création des embeddings…")
-    vectors = embedding_model.embed_documents([doc.page_content for doc in all_chunks])
+    texts = [doc.page_content for doc in all_chunks]
+    with timer.stage("embedding", texts=len(texts)):
+        if EMBEDDING_WORKERS > 1:
+            logger.info("Création des embeddings", extra={"workers": EMBEDDING_WORKERS, "batch_size": EMBEDDING_BATCH_SIZE})
+            with EncodingPool(workers=EMBEDDING_WORKERS, batch_size=EMBEDDING_BATCH_SIZE) as pool:
+                vectors = pool.embed_documents(texts)
+        else:
+            logger.info("Création des embeddings", extra={"model": "service " + EMBEDDING_SERVICE_URL if EMBEDDING_SERVICE_URL else "local"})
+            embedding_model = get_embedding_model()
+            vectors = embedding_model.embed_documents(texts)
 
     # === 📤 INDEXATION ELASTICSEARCH ===
-    print("📦 Indexation dans Elasticsearch…")
-    index_documents_bulk(es, all_chunks, vectors, INDEX_NAME)
+    with timer.stage("indexing", documents=len(all_chunks)):
+        index_documents_bulk(es, all_chunks, vectors, INDEX_NAME)
 
-    print("🎉 Pipeline terminé !")
+    return n_files, len(all_chunks)
 
 
 if __name__ == "__main__":
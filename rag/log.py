@@ -0,0 +1,122 @@
+"""
+Journalisation structurée des modules rag : une ligne JSON par événement sur la sortie standard.
+
+- LOG_LEVEL (INFO) : verbosité ; DEBUG ajoute une ligne par étape avec sa durée
+- identifiant de corrélation par consultation / run d'indexation (contextvars), présent sur chaque ligne
+- StageTimer : durée de chaque étape ; le détail complet des étapes n'est journalisé (WARNING) que si
+  l'opération dépasse son seuil de lenteur (LOG_SLOW_MS pour une consultation,
+  LOG_SLOW_INGESTION_MS pour un run d'indexation), sinon une seule ligne INFO avec la durée totale
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", "3000"))
+LOG_SLOW_INGESTION_MS = float(os.getenv("LOG_SLOW_INGESTION_MS", "600000"))
+
+_correlation_id: contextvars.ContextVar = contextvars.ContextVar("correlation_id", default=None)
+# attributs standard d'un LogRecord : tout le reste vient de `extra=` et part dans le JSON
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        cid = _correlation_id.get()
+        if cid:
+            payload["correlation_id"] = cid
+        payload.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _configure() -> None:
+    """Handler JSON sur le logger "rag" (une fois par process, sans toucher au logging de Streamlit)."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        root = logging.getLogger("rag")
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger JSON ; `name` doit être sous "rag." (ex. "rag.indexing")."""
+    _configure()
+    return logging.getLogger(name)
+
+
+def current_correlation_id() -> Optional[str]:
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation_scope(correlation_id: Optional[str] = None):
+    """Identifiant de corrélation (nouveau si non fourni) pour toutes les lignes émises dans le bloc."""
+    cid = correlation_id or uuid.uuid4().hex[:12]
+    token = _correlation_id.set(cid)
+    try:
+        yield cid
+    finally:
+        _correlation_id.reset(token)
+
+
+def log_operation(logger: logging.Logger, operation: str, duration_ms: float, stages: Dict[str, float],
+                  slow_ms: float, **fields) -> None:
+    """Fin d'opération : INFO (durée totale) ou, au-delà de slow_ms, WARNING avec le détail des étapes."""
+    extra = {"operation": operation, "duration_ms": round(duration_ms, 1), **fields}
+    if duration_ms >= slow_ms:
+        logger.warning(f"{operation} lente", extra={**extra, "slow_threshold_ms": slow_ms, "stages": stages})
+    else:
+        logger.info(f"{operation} terminée", extra=extra)
+
+
+class StageTimer:
+    """Durées cumulées par étape d'une opération (ms), journalisées à la fin via log_operation."""
+
+    def __init__(self, logger: logging.Logger, operation: str, slow_ms: float):
+        self.logger = logger
+        self.operation = operation
+        self.slow_ms = slow_ms
+        self.durations: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    def add(self, stage: str, duration_ms: float, **fields) -> None:
+        self.durations[stage] = round(self.durations.get(stage, 0.0) + duration_ms, 1)
+        self.logger.debug(stage, extra={"operation": self.operation, "stage": stage,
+                                        "duration_ms": round(duration_ms, 1), **fields})
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000, **fields)
+
+    def finish(self, **fields) -> float:
+        total_ms = (time.perf_counter() - self._t0) * 1000
+        log_operation(self.logger, self.operation, total_ms, self.durations, self.slow_ms, **fields)
+        return total_ms
@@ -0,0 +1,153 @@
+"""
+Métriques de latence des consultations RAG, étape par étape.
+
+Chaque requête (EQMSRAGSystem.query) transmet son dict `timings` à record_query :
+- agrégats exposés au format texte Prometheus sur http://<hôte>:METRICS_PORT/metrics (METRICS_PORT > 0)
+- une ligne JSON par requête dans QUERY_METRICS_LOG (chemin de fichier, "-" = sortie standard, vide = désactivé)
+
+Étapes : embedding de la question, recherche ES (client et `took` serveur), reranking,
+formatage du contexte, LLM (1er token et génération complète), total.
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from .log import current_correlation_id, get_logger
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+QUERY_METRICS_LOG = os.getenv("QUERY_METRICS_LOG", "")
+
+logger = get_logger("rag.metrics")
+
+# clé de `timings` (ms) → label "stage" de l'histogramme
+STAGES = {
+    "embedding_ms": "embedding",
+    "es_client_ms": "es_client",
+    "es_took_ms": "es_server",
+    "rerank_ms": "rerank",
+    "context_ms": "context",
+    "llm_ttft_ms": "llm_first_token",
+    "llm_total_ms": "llm_total",
+    "total_ms": "total",
+}
+TOKENS = {"prompt_tokens": "prompt", "response_tokens": "response"}
+BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class QueryMetrics:
+    """Histogrammes de durée par étape + compteurs de tokens (partagés entre sessions)."""
+
+    def __init__(self, buckets=BUCKETS_S):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._hist = {stage: {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0} for stage in STAGES.values()}
+        self._tokens = {kind: 0 for kind in TOKENS.values()}
+        self.queries = 0
+
+    def observe(self, timings: Dict[str, Any]) -> None:
+        with self._lock:
+            self.queries += 1
+            for key, stage in STAGES.items():
+                value = timings.get(key)
+                if value is None:
+                    continue
+                seconds = float(value) / 1000.0
+                h = self._hist[stage]
+                h["sum"] += seconds
+                h["count"] += 1
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        h["counts"][i] += 1
+            for key, kind in TOKENS.items():
+                if timings.get(key) is not None:
+                    self._tokens[kind] += int(timings[key])
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus (0.0.4)."""
+        lines = [
+            "# HELP eqms_rag_queries_total Consultations RAG traitées.",
+            "# TYPE eqms_rag_queries_total counter",
+            f"eqms_rag_queries_total {self.queries}",
+            "# HELP eqms_rag_stage_seconds Durée des étapes d'une consultation RAG.",
+            "# TYPE eqms_rag_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in self._hist.items():
+                for bound, n in zip(self.buckets, h["counts"]):
+                    lines.append(f'eqms_rag_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+                lines.append(f'eqms_rag_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h["count"]}')
+                lines.append(f'eqms_rag_stage_seconds_sum{{stage="{stage}"}} {h["sum"]:.6f}')
+                lines.append(f'eqms_rag_stage_seconds_count{{stage="{stage}"}} {h["count"]}')
+            lines += [
+                "# HELP eqms_rag_llm_tokens_total Tokens envoyés au LLM (prompt) et générés (response).",
+                "# TYPE eqms_rag_llm_tokens_total counter",
+            ]
+            lines += [f'eqms_rag_llm_tokens_total{{kind="{kind}"}} {n}' for kind, n in self._tokens.items()]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = QueryMetrics()
+_log_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def _write_log(record: Dict[str, Any], path: str = QUERY_METRICS_LOG) -> None:
+    line = json.dumps(record, ensure_ascii=False)
+    with _log_lock:
+        if path == "-":
+            print(line, flush=True)
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def record_query(timings: Dict[str, Any], question: str = "") -> None:
+    """Enregistre les temps d'une consultation (histogrammes + ligne JSON si QUERY_METRICS_LOG)."""
+    METRICS.observe(timings)
+    if QUERY_METRICS_LOG:
+        try:
+            _write_log({"ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "event": "rag_query",
+                        "correlation_id": current_correlation_id(), "question_chars": len(question), **timings})
+        except Exception:
+            logger.exception("Journal des métriques indisponible", extra={"path": QUERY_METRICS_LOG})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pas de log par scrape
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> bool:
+    """Démarre (une fois par process) l'endpoint /metrics en tâche de fond ; port <= 0 : désactivé."""
+    global _server
+    if port <= 0:
+        return False
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("Endpoint métriques indisponible", extra={"port": port, "error": str(e)})
+            return False
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Métriques RAG exposées", extra={"url": f"http://{host}:{port}/metrics"})
+    return True
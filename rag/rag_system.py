@@ -2,16 +2,35 @@
 Système RAG eQMS adapté pour Docker avec prompts sophistiqués du POC
 """
 
+import os
+import time
 from typing import List, Dict, Any
 from pathlib import Path
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnableLambda
 from langchain_mistralai import ChatMistralAI
 
 from .embeddings import get_embedding_model
-from .elasticsearch_indexer import get_elastic_client, search_documents
+from .elasticsearch_indexer import get_elastic_client, search_documents_with_stats
+from .log import LOG_SLOW_MS, StageTimer, correlation_scope, get_logger
+from .metrics import record_query, start_metrics_server
+from .reranking import get_reranker
+
+# Recherche en 2 étages : N candidats ES (cosinus) → cross-encoder → top-k dans le prompt
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "50"))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "5"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "800"))
+
+logger = get_logger("rag.rag_system")
+# étapes de result["timings"] (ms) reprises dans le journal des consultations
+_STAGE_KEYS = ("embedding_ms", "es_client_ms", "es_took_ms", "rerank_ms", "context_ms", "llm_ttft_ms", "llm_total_ms")
+
+
+def _elapsed_ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
 
 class EQMSRAGSystem:
     def __init__(self, mistral_api_key: str = None):
@@ -23,7 +42,12 @@ class EQMSRAGSystem:
         self.embedding_model = None
         self.llm = None
         self.rag_chain = None
+        self.reranker = None
         self.index_name = "rfi_rag"
+        self.search_size = 10  # taille de la recherche sans reranking
+        self.candidates_size = RETRIEVAL_CANDIDATES
+        self.rerank_top_k = RERANK_TOP_K
+        self.rerank_budget_ms = RERANK_BUDGET_MS
 
         # Initialiser les composants
         self._init_components()
@@ -66,15 +90,21 @@ RÉPONSE:""")
 
     def _init_components(self):
         """Initialise les composants du système"""
-        print("Initialisation des composants RAG...")
+        logger.info("Initialisation des composants RAG")
         
         # Elasticsearch
         self.es = get_elastic_client()
-        print("✅ Elasticsearch connecté")
+        logger.info("Elasticsearch connecté")
         
         # Embeddings
         self.embedding_model = get_embedding_model()
-        print("✅ Embeddings initialisés")
+        logger.info("Embeddings initialisés")
+
+        # Reranker cross-encoder (optionnel)
+        if RERANK_ENABLED:
+            self.reranker = get_reranker()
+            if self.reranker is not None:
+                logger.info("Reranker initialisé")
         
         # LLM Mistral
         if self.mistral_api_key:
@@ -84,16 +114,19 @@ RÉPONSE:""")
                 temperature=0.0,
                 max_tokens=500
             )
-            print("✅ LLM Mistral initialisé")
+            logger.info("LLM Mistral initialisé")
         else:
-            print("⚠️ Clé API Mistral manquante")
+            logger.warning("Clé API Mistral manquante")
+
+        # Endpoint Prometheus des temps par étape (METRICS_PORT > 0)
+        start_metrics_server()
 
     def setup_rag_chain(self):
         """Configuration de la chaîne RAG"""
         if not self.llm:
             raise ValueError("LLM doit être initialisé avant la chaîne RAG")
         
-        print("🔧 Configuration de la chaîne RAG ")
+        logger.info("Configuration de la chaîne RAG")
 
         def format_docs_for_client(docs):
             """Formatage des documents avec focus sur réponse client"""
@@ -108,45 +141,93 @@ RÉPONSE:""")
 
             return "\n\n" + "="*60 + "\n\n".join(formatted)
 
-        # Fonction de recherche adaptée pour Elasticsearch
-        def retrieve_documents(question: str) -> List[Dict]:
-            """Récupère les documents pertinents via Elasticsearch"""
+        # Fonction de recherche adaptée pour Elasticsearch (1er étage + reranking éventuel)
+        def retrieve_documents(question: str) -> Dict[str, Any]:
+            """Récupère les documents pertinents via Elasticsearch, puis les réordonne (cross-encoder)"""
+            timings: Dict[str, Any] = {}
             try:
                 # Créer l'embedding de la question
+                t0 = time.perf_counter()
                 query_vector = self.embedding_model.embed_query(question)
-                
-                # Rechercher dans Elasticsearch
-                results = search_documents(self.es, query_vector, self.index_name, size=10)
-                
-                return results
-            except Exception as e:
-                print(f"Erreur lors de la recherche: {e}")
-                return []
-
-        # Chaîne RAG complète avec formatage 
-        self.rag_chain = (
-            RunnableParallel({
-                "context": lambda x: format_docs_for_client(retrieve_documents(x)),
-                "question": RunnablePassthrough(),
-                "source_documents": lambda x: retrieve_documents(x)
-            })
-            | RunnableParallel({
-                "answer": (lambda x: {"context": x["context"], "question": x["question"]}) | self.prompt | self.llm | StrOutputParser(),
-                "source_documents": lambda x: x["source_documents"]
-            })
-        )
-
-        print("✅ Chaîne RAG configurée ")
+                timings["embedding_ms"] = _elapsed_ms(t0)
+
+                # Rechercher dans Elasticsearch (large si reranking) : temps client + `took` serveur
+                size = self.candidates_size if self.reranker else self.search_size
+                results, es_stats = search_documents_with_stats(self.es, query_vector, self.index_name, size=size)
+                timings["es_client_ms"] = es_stats["client_ms"]
+                timings["es_took_ms"] = es_stats["took_ms"]
+                timings["first_stage_hits"] = es_stats["hits"]
+
+                # Reranking : seuls les top-k atteignent le prompt
+                if self.reranker and results:
+                    results, info = self.reranker.rerank(
+                        question, results, top_k=self.rerank_top_k, budget_ms=self.rerank_budget_ms
+                    )
+                    timings["rerank_ms"] = info["elapsed_ms"]
+                    timings["reranked"] = info["reranked"]
+                    if not info["reranked"]:
+                        logger.warning("Budget de reranking dépassé, ordre ES conservé",
+                                       extra={"scored": info["scored"], "candidates": info["candidates"],
+                                              "budget_ms": info["budget_ms"]})
+            except Exception:
+                logger.exception("Erreur lors de la recherche")
+                results = []
+            return {"question": question, "source_documents": results, "timings": timings}
+
+        # Génération en streaming : temps jusqu'au 1er token, génération complète, tokens prompt/réponse
+        def generate_answer(x: Dict[str, Any]) -> Dict[str, Any]:
+            timings = x["timings"]
+            t0 = time.perf_counter()
+            messages = self.prompt.format_messages(
+                context=format_docs_for_client(x["source_documents"]), question=x["question"]
+            )
+            timings["context_ms"] = _elapsed_ms(t0)
+
+            t0 = time.perf_counter()
+            message = None
+            for chunk in self.llm.stream(messages):
+                if message is None:
+                    timings["llm_ttft_ms"] = _elapsed_ms(t0)
+                    message = chunk
+                else:
+                    message = message + chunk
+            timings["llm_total_ms"] = _elapsed_ms(t0)
+
+            usage = getattr(message, "usage_metadata", None) or {}
+            if not usage:  # anciennes versions de langchain-mistralai : usage brut de l'API
+                raw = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+                usage = {"input_tokens": raw.get("prompt_tokens"), "output_tokens": raw.get("completion_tokens")}
+            timings["prompt_tokens"] = usage.get("input_tokens")
+            timings["response_tokens"] = usage.get("output_tokens")
+            return {
+                "answer": message.content if message is not None else "",
+                "source_documents": x["source_documents"],
+                "timings": timings,
+            }
+
+        # Chaîne RAG complète avec formatage (une seule recherche par question)
+        self.rag_chain = RunnableLambda(retrieve_documents) | RunnableLambda(generate_answer)
+
+        logger.info("Chaîne RAG configurée")
 
     def query(self, question: str) -> Dict[str, Any]:
         """Exécution d'une requête avec formatage """
         if self.rag_chain is None:
             raise ValueError("La chaîne RAG doit être configurée")
 
-        print(f"❓ Question: {question}")
-        print("🔍 Analyse en cours...")
-
-        result = self.rag_chain.invoke(question)
+        with correlation_scope() as correlation_id:
+            logger.debug("Question reçue", extra={"question": question})
+            timer = StageTimer(logger, "rag_query", LOG_SLOW_MS)
+            result = self.rag_chain.invoke(question)
+            timings = result.get("timings", {})
+            for key in _STAGE_KEYS:  # étapes mesurées dans la chaîne (une ligne DEBUG chacune)
+                if timings.get(key) is not None:
+                    timer.add(key[:-3], timings[key])
+            timings["total_ms"] = round(timer.finish(
+                hits=len(result["source_documents"]), prompt_tokens=timings.get("prompt_tokens"),
+                response_tokens=timings.get("response_tokens"),
+            ), 1)
+            record_query(timings, question)
 
         # Formatage des métadonnées des sources
         sources_info = []
@@ -167,7 +248,9 @@ RÉPONSE:""")
             "answer": result["answer"],
             "source_documents": result["source_documents"],
             "sources_info": sources_info,
-            "sources": list(set([f"{s['file']} - {s['sheet']}" for s in sources_info]))
+            "sources": list(set([f"{s['file']} - {s['sheet']}" for s in sources_info])),
+            "timings": timings,
+            "correlation_id": correlation_id,
         }
 
     def display_result(self, result: Dict[str, Any]):
@@ -0,0 +1,85 @@
+"""
+Reranking cross-encoder (2e étage de la recherche RAG).
+
+Le 1er étage (Elasticsearch, cosinus) ramène un large ensemble de candidats ;
+le cross-encoder, exécuté sur CPU par batchs, réordonne ces candidats pour ne
+garder que les meilleurs. Un budget de latence borne le temps passé : s'il ne
+peut pas être tenu, on retombe sur l'ordre du 1er étage.
+"""
+
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from .log import get_logger
+
+# Cross-encoder multilingue (entraîné sur mMARCO, inclut le français)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+
+logger = get_logger("rag.reranking")
+
+
+def _rerank_text(doc: Dict) -> str:
+    """Texte soumis au cross-encoder : bloc métier seul (sans CONTEXTE ni MÉTADONNÉES)."""
+    content = (doc.get("content", "") or "").split("--- MÉTADONNÉES ---")[0]
+    if "=== CONTENU MÉTIER ===" in content:
+        content = content.split("=== CONTENU MÉTIER ===", 1)[1]
+    return content.strip()
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str = RERANK_MODEL, batch_size: int = 16, max_length: int = 256):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = max(1, int(batch_size))
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self._lock = threading.Lock()  # modèle partagé entre sessions
+
+    def rerank(self, question: str, docs: List[Dict], top_k: int, budget_ms: float) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        Réordonne `docs` par pertinence et retourne (top_k documents, infos).
+        Les batchs sont scorés tant que le budget le permet (estimation sur le 1er batch) ;
+        si tous les candidats ne peuvent pas être scorés à temps → ordre du 1er étage.
+        """
+        t0 = time.perf_counter()
+        pairs = [(question, _rerank_text(d)) for d in docs]
+        scores: List[float] = []
+        batch_ms = 0.0
+        complete = True
+
+        with self._lock:
+            for start in range(0, len(pairs), self.batch_size):
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                if elapsed_ms + batch_ms > budget_ms:
+                    complete = False
+                    break
+                tb = time.perf_counter()
+                batch = pairs[start:start + self.batch_size]
+                scores.extend(float(s) for s in self.model.predict(batch, batch_size=len(batch), show_progress_bar=False))
+                batch_ms = max(batch_ms, (time.perf_counter() - tb) * 1000)
+
+        info = {
+            "reranked": complete,
+            "candidates": len(docs),
+            "scored": len(scores),
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "budget_ms": budget_ms,
+        }
+        if not complete:
+            return docs[:top_k], info
+
+        ranked = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [{**docs[i], "rerank_score": scores[i]} for i in ranked], info
+
+
+@lru_cache(maxsize=None)
+def get_reranker(model_name: str = RERANK_MODEL):
+    """Reranker chargé une fois par process ; None si le modèle est indisponible (→ 1er étage seul)."""
+    try:
+        return CrossEncoderReranker(model_name)
+    except Exception as e:
+        logger.warning("Reranker indisponible, recherche 1er étage seule", extra={"model": model_name, "error": str(e)})
+        return None
@@ -0,0 +1,72 @@
+# tests/test_analytics_store.py
+"""Base analytique incrémentale (analytics.store.AnalyticsStore) : partitions delta, compaction, chevauchements."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from analytics.store import AnalyticsStore  # noqa: E402
+
+HEADER = "Application;Module;User ID;Date\n"
+
+
+def _export(tmp_path, name, rows):
+    path = tmp_path / name
+    path.write_text(HEADER + "".join(f"Documents;{m};{u};{d} 10:00:00\n" for u, m, d in rows), encoding="utf-8")
+    return path
+
+
+def _nb_actions(store):
+    counts = store.counts().astype({"User ID": str, "Module": str})
+    return {(r["User ID"], r["Module"]): r["Nb_actions"] for _, r in counts.iterrows()}
+
+
+def test_ingest_writes_delta_parts_and_compacts(tmp_path):
+    store = AnalyticsStore(tmp_path / "store", compact_parts=2)
+    first = store.ingest(_export(tmp_path, "a.csv", [("U1", "Révision", "06/01/2025"), ("U1", "Révision", "06/01/2025")]))
+    assert first["new"] and first["part"]
+    assert len(list(store.parts_dir.glob("*.parquet"))) == 1
+    assert not store.ingest(_export(tmp_path, "a.csv", [("U1", "Révision", "06/01/2025")] * 2))["new"]
+
+    store.ingest(_export(tmp_path, "b.csv", [("U1", "Révision", "07/01/2025"), ("U2", "Approbation", "07/01/2025")]))
+    assert [e["part"] for e in store.ingested()] == [None, None]
+    assert not list(store.parts_dir.glob("*.parquet"))
+    assert _nb_actions(store) == {("U1", "Révision"): 3, ("U2", "Approbation"): 1}
+    assert len(store.active_days()) == 3
+
+
+def test_overlapping_export_does_not_double_count(tmp_path):
+    store = AnalyticsStore(tmp_path / "store")
+    store.ingest(_export(tmp_path, "week.csv", [("U1", "Révision", "06/01/2025"), ("U1", "Révision", "07/01/2025")]))
+    entry = store.ingest(_export(tmp_path, "day.csv", [("U1", "Révision", "07/01/2025"), ("U1", "Révision", "08/01/2025")]))
+
+    assert entry["rows"] == 1 and entry["rows_skipped"] == 1
+    assert _nb_actions(store) == {("U1", "Révision"): 3}
+
+
+
+def test_overlapping_export_adds_new_user_on_covered_day(tmp_path):
+    store = AnalyticsStore(tmp_path / "store")
+    store.ingest(_export(tmp_path, "a.csv", [("U1", "Révision", "07/01/2025")]))
+    entry = store.ingest(_export(tmp_path, "b.csv", [("U1", "Révision", "07/01/2025"), ("U2", "Révision", "07/01/2025")]))
+
+    assert entry["rows"] == 1 and entry["rows_skipped"] == 1
+    assert _nb_actions(store) == {("U1", "Révision"): 1, ("U2", "Révision"): 1}
+    assert len(store.active_days()) == 2
+
+
+def test_full_day_export_completes_partial_day(tmp_path):
+    store = AnalyticsStore(tmp_path / "store", compact_parts=2)
+    store.ingest(_export(tmp_path, "matin.csv", [("U1", "Révision", "07/01/2025")] * 2))
+    entry = store.ingest(_export(tmp_path, "journee.csv", [("U1", "Révision", "07/01/2025")] * 5))
+
+    assert entry["rows"] == 3 and entry["rows_skipped"] == 2
+    assert _nb_actions(store) == {("U1", "Révision"): 5}
+    store.ingest(_export(tmp_path, "journee_bis.csv", [("U1", "Révision", "07/01/2025")] * 5 + [("U1", "Révision", "08/01/2025")]))
+    assert _nb_actions(store) == {("U1", "Révision"): 6}
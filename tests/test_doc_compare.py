@@ -0,0 +1,47 @@
+# tests/test_doc_compare.py
+"""Comparaison sémantique de versions (doc_compare.compare_units_semantic)."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from doc_compare import compare_units_semantic  # noqa: E402
+
+
+class BagOfWords:
+    """Embeddings déterministes : sac de mots (les reformulations légères restent très similaires)."""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, sum(map(ord, word)) * 7919 % self.dim] += 1.0
+        return out.tolist()
+
+
+OLD = [
+    "Le système conserve les enregistrements qualité pendant dix ans minimum sur site",
+    "Les utilisateurs sont authentifiés par annuaire LDAP.",
+    "Les rapports sont exportés au format PDF.",
+    "Chaque signature électronique est horodatée.",
+    "Les sauvegardes sont réalisées chaque nuit.",
+]
+
+
+def test_moved_and_reworded_unit_is_reported_as_both():
+    reworded = "Le système conserve les enregistrements qualité pendant quinze ans minimum sur site"
+    new = OLD[1:] + [reworded]
+
+    result = compare_units_semantic(OLD, new, BagOfWords(), window=0)
+
+    assert [(text, i_old) for text, i_old, _ in result["moved"]] == [(OLD[0], 0)]
+    assert [(old, new_, diff) for old, new_, diff in result["modified"]] == [(OLD[0], reworded, "dix → quinze")]
+    assert not result["added"] and not result["removed"]
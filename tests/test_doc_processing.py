@@ -0,0 +1,35 @@
+# tests/test_doc_processing.py
+"""Traduction par segments (doc_processing.translate_stream) : segments tronqués par max_tokens."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import doc_processing  # noqa: E402
+
+
+class Message:
+    def __init__(self, content, finish_reason):
+        self.content = content
+        self.response_metadata = {"finish_reason": finish_reason}
+
+
+class FakeLLM:
+    """« Traduit » en majuscules ; au-delà de max_out caractères la réponse est coupée (finish_reason length)."""
+
+    def __init__(self, max_out):
+        self.max_out = max_out
+
+    def invoke(self, prompt):
+        seg = prompt.split("Texte :\n", 1)[1].rsplit("\n\nTraduction :", 1)[0]
+        truncated = len(seg) > self.max_out
+        return Message(seg.upper()[:self.max_out], "length" if truncated else "stop")
+
+
+def test_truncated_segment_is_split_and_retranslated():
+    text = "\n\n".join(f"Paragraphe {i} " + "mot " * 60 for i in range(8))
+    parts = [t for _, _, t in doc_processing.translate_stream(FakeLLM(max_out=400), text, "fr", "en", max_chars=1000)]
+
+    translation = "\n\n".join(parts)
+    assert translation.split() == text.upper().split()
@@ -0,0 +1,40 @@
+# tests/test_embedding_server.py
+"""Micro-batching du service d'embeddings (rag.embedding_server.MicroBatcher)."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.embedding_server import MicroBatcher  # noqa: E402
+
+
+class FakeModel:
+    """Vecteur = [longueur du texte] ; un texte "bad" fait échouer tout l'appel."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if "bad" in texts:
+            raise ValueError("texte refusé")
+        return [[float(len(t))] for t in texts]
+
+
+def test_failed_batch_only_fails_the_bad_request():
+    model = FakeModel()
+    batcher = MicroBatcher(model, max_batch=64, max_wait_ms=200)
+    ok, bad, other = batcher.submit(["a", "bb"]), batcher.submit(["bad"]), batcher.submit(["ccc"])
+
+    assert ok.result(timeout=5) == [[1.0], [2.0]]
+    assert other.result(timeout=5) == [[3.0]]
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert model.calls[0] == ["a", "bb", "bad", "ccc"]
+    assert batcher.stats["batch_retries"] == 1
+    assert batcher.stats["failed_requests"] == 1
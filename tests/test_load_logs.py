@@ -0,0 +1,55 @@
+# tests/test_load_logs.py
+"""Lecture des exports de logs (analytics.user_behavior.load_logs_df) avec chaque moteur pandas."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from analytics import user_behavior  # noqa: E402
+
+CSV = (
+    "﻿Site;Application;Module;User ID;Date;Commentaire\n"
+    "Lyon;Documents;Révision; u001 ;03/01/2024 08:15:00;a\n"
+    "Lyon;Documents;Approbation;U001;03/01/2024 17:40:00;b\n"
+    "Paris;CAPA;Création;u002;04/01/2024 09:00:00;c\n"
+)
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "c", "chunked"])
+def test_load_logs_df_engines(monkeypatch, export, engine):
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(user_behavior, "PYARROW_AVAILABLE", engine == "pyarrow")
+    monkeypatch.setattr(user_behavior, "LOGS_CHUNKED_MIN_MB", 0 if engine == "chunked" else 512)
+
+    df = user_behavior.load_logs_df(export)
+
+    assert list(df.columns) == user_behavior.REQUIRED_COLUMNS
+    assert len(df) == 3
+    assert df["User ID"].astype(str).tolist() == ["U001", "U001", "U002"]
+    assert df["Module"].astype(str).tolist() == ["Révision", "Approbation", "Création"]
+    assert df["Date"].tolist() == [pd.Timestamp("2024-01-03")] * 2 + [pd.Timestamp("2024-01-04")]
+
+
+def test_load_logs_cached_reports_cache_failures(tmp_path, export):
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("pas un dossier", encoding="utf-8")  # écriture du cache impossible
+    messages = []
+
+    df, sha = user_behavior.load_logs_cached(export, cache_dir=cache_dir, on_warning=messages.append)
+    assert len(df) == 3 and len(messages) == 1 and "Cache logs non écrit" in messages[0]
+
+    with pytest.warns(RuntimeWarning, match="Cache logs non écrit"):
+        user_behavior.load_logs_cached(export, cache_dir=cache_dir)